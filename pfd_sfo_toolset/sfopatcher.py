@@ -4,9 +4,19 @@ import asyncio
 
 class SFOPatcher:
     def __init__(self, binary_path="sfopatcher"):
+        """
+        With binary_path=None the SFOs are built in process with `SFO.build`, no sfopatcher needed
+        """
         self.binary_path = binary_path
 
     async def build(self, input_file, tpl_file, output_file, copy_title=False, copy_detail=False):
+        if self.binary_path is None:
+            # Only needed by the in process builder
+            from ps3_lib import SFO
+
+            SFO.build(input_file, tpl_file, output_file, copy_title=copy_title, copy_detail=copy_detail)
+            return "", ""
+
         command = [self.binary_path, "build", input_file, tpl_file, output_file]
         if copy_title:
             command.append("--copy-title")
@@ -1,4 +1,6 @@
 from .ps3 import *
 from .structs import *
 from .sfo import SFO
-from .xregistry import XRegistry
\ No newline at end of file
+from .sfo_catalogue import SFOCatalogue, scan_sfos
+from .xregistry import XRegistry
+from .remote_file import PS3RemoteFile
@@ -4,9 +4,13 @@ YES commands do actually break pep8 but have you seen the __new__ command ? its
 https://github.com/aldostools/webMAN-MOD/wiki/Web-Commands
 """
 import io
+import re
 import enum
+import codecs
 import zipfile
 import datetime
+from html.parser import HTMLParser
+from typing import Iterator
 
 
 import cv2
@@ -62,6 +66,7 @@ class Command:
     kwargs_validator: CommandKwargsModel | None = None
     args_separator: str = "&"
     args_prefix: str = "?"
+    kwargs_prefix: str | None = None  # Between args and kwargs, defaults to args_prefix
 
     def __new__(cls, url, *args, timeout=5, **kwargs):
         no_args_allowed = cls.available_args in (None, ())
@@ -89,7 +94,7 @@ class Command:
         if has_args:
             command_path += cls.args_prefix.join(args)
             if has_kwargs:
-                command_path += cls.args_prefix
+                command_path += cls.kwargs_prefix or cls.args_prefix
 
         if has_kwargs:
             command_path += str(kwargs)
@@ -213,6 +218,7 @@ class user_id(Command):
 class zip(Command):
     path = "/dozip.ps3"
     args_prefix = "/"
+    kwargs_prefix = "&"
     available_args = ("*",)
 
     class kwargs_validator(CommandKwargsModel):
@@ -221,7 +227,24 @@ class zip(Command):
 
         @field_validator("to")
         def validate_path(cls, path: PS3Path | str) -> str:
-            return str(PS3Path(path))
+            return PS3Path(path).resolve()
+
+    post_process = post_process_nullify
+
+
+class unzip(Command):
+    path = "/unzip.ps3"
+    args_prefix = "/"
+    kwargs_prefix = "&"
+    available_args = ("*",)
+
+    class kwargs_validator(CommandKwargsModel):
+        model_config = ConfigDict(arbitrary_types_allowed=True)
+        to: PS3Path | str
+
+        @field_validator("to")
+        def validate_path(cls, path: PS3Path | str) -> str:
+            return PS3Path(path).resolve()
 
     post_process = post_process_nullify
 
@@ -244,6 +267,51 @@ class mkdir(Command):
     post_process = post_process_nullify
 
 
+class copy(Command):
+    path = "/copy.ps3"
+    args_prefix = "/"
+    kwargs_prefix = "&"
+    available_args = ("*",)
+
+    class kwargs_validator(CommandKwargsModel):
+        model_config = ConfigDict(arbitrary_types_allowed=True)
+        to: PS3Path | str
+
+        @field_validator("to")
+        def validate_path(cls, path: PS3Path | str) -> str:
+            return PS3Path(path).resolve()
+
+    post_process = post_process_nullify
+
+
+class move(copy):
+    path = "/move.ps3"
+
+
+class delete(Command):
+    path = "/delete.ps3"
+    args_prefix = "/"
+    available_args = ("*",)
+    post_process = post_process_nullify
+
+
+MD5_PATTERN = re.compile(r"\b[0-9a-fA-F]{32}\b")
+
+
+class md5(Command):
+    path = "/md5.ps3"
+    args_prefix = "/"
+    available_args = ("*",)
+
+    @classmethod
+    def post_process(cls, response: requests.Response) -> str:
+        response.raise_for_status()
+        match = MD5_PATTERN.search(response.text)
+        if match is None:
+            raise ValueError("No MD5 in the response")
+        return match.group(0).lower()
+
+
 class mount(Command):
     path = "/mount.ps3"
     args_prefix = "/"
@@ -325,10 +393,180 @@ class listdir(Command):
         return [i.text for i in soup.select("table#files tr>td:first-child:not([colspan])>*:first-child:not([href='..'])")]
 
 
+LISTING_SIZE_UNITS = {"": 1, "B": 1, "KB": 1024, "MB": 1024**2, "GB": 1024**3, "TB": 1024**4}
+LISTING_SIZE_PATTERN = re.compile(r"^([\d.,]+)\s*([KMGT]?B)?$", re.IGNORECASE)
+LISTING_DATE_FORMATS = ("%d-%b-%Y %H:%M", "%Y-%m-%d %H:%M:%S", "%Y-%m-%d %H:%M", "%d-%m-%Y %H:%M")
+
+
+def parse_listing_size(text: str) -> tuple[int | None, bool]:
+    """
+    Returns the size in bytes and whether it is exact, webMAN rounds big files to KB/MB/GB
+    """
+    match = LISTING_SIZE_PATTERN.match(text.strip())
+    if not match:
+        return None, False
+    number, unit = match.groups()
+    unit = (unit or "").upper()
+    if unit in ("", "B"):
+        return int(number.replace(",", "").replace(".", "")), True
+    return int(float(number.replace(",", "")) * LISTING_SIZE_UNITS[unit]), False
+
+
+def parse_listing_date(text: str) -> datetime.datetime | None:
+    for date_format in LISTING_DATE_FORMATS:
+        try:
+            return datetime.datetime.strptime(text.strip(), date_format)
+        except ValueError:
+            pass
+    return None
+
+
+def parse_listing_row(cells: list[str], link_text: str) -> dict:
+    size_text = cells[1] if len(cells) > 1 else ""
+    is_dir = "<dir>" in size_text.lower()
+    size, size_exact = (None, False) if is_dir else parse_listing_size(size_text)
+    return {
+        "name": link_text,
+        "is_dir": is_dir,
+        "size": size,
+        "size_exact": size_exact,
+        "mtime": parse_listing_date(cells[2]) if len(cells) > 2 else None,
+    }
+
+
+class ListingParser(HTMLParser):
+    """
+    Incremental parser of webMAN file browser pages, it can be fed the page chunk by chunk
+    and hands out the rows completed so far with pop_entries(). The parent folder row is skipped
+    """
+
+    def __init__(self) -> None:
+        super().__init__(convert_charrefs=True)
+        self.decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+        self.entries: list[dict] = []
+        self.table_depth = 0  # Depth inside table#files, nested tables are ignored
+        self.row: list[dict] | None = None
+        self.cell: dict | None = None
+        self.link: dict | None = None
+
+    def feed(self, data: bytes | str) -> None:
+        if isinstance(data, bytes):
+            data = self.decoder.decode(data)
+        super().feed(data)
+
+    def close(self) -> None:
+        super().feed(self.decoder.decode(b"", final=True))
+        super().close()
+        self._close_row()
+
+    def pop_entries(self) -> list[dict]:
+        entries, self.entries = self.entries, []
+        return entries
+
+    def handle_starttag(self, tag: str, attrs: list) -> None:
+        if tag == "table":
+            if self.table_depth:
+                self.table_depth += 1
+            elif dict(attrs).get("id") == "files":
+                self.table_depth = 1
+            return
+        if self.table_depth != 1:
+            return
+        if tag == "tr":
+            self._close_row()
+            self.row = []
+        elif tag == "td":
+            self._close_cell()
+            if self.row is None:
+                self.row = []
+            self.cell = {"text": [], "colspan": "colspan" in dict(attrs)}
+        elif self.cell is not None and not self.row and self.link is None:
+            # The first element of the first cell holds the name
+            self.link = {"tag": tag, "href": dict(attrs).get("href"), "text": [], "open": True}
+
+    def handle_endtag(self, tag: str) -> None:
+        if tag == "table" and self.table_depth:
+            self.table_depth -= 1
+            if not self.table_depth:
+                self._close_row()
+            return
+        if self.table_depth != 1:
+            return
+        if tag == "td":
+            self._close_cell()
+        elif tag == "tr":
+            self._close_row()
+        elif self.link is not None and self.link["open"] and tag == self.link["tag"]:
+            self.link["open"] = False
+
+    def handle_data(self, data: str) -> None:
+        if self.cell is not None:
+            self.cell["text"].append(data)
+            if self.link is not None and self.link["open"]:
+                self.link["text"].append(data)
+
+    def _close_cell(self) -> None:
+        if self.cell is not None and self.row is not None:
+            self.row.append(self.cell)
+        self.cell = None
+
+    def _close_row(self) -> None:
+        self._close_cell()
+        row, link = self.row, self.link
+        self.row = self.link = None
+        if not row or row[0]["colspan"] or link is None or link["href"] == "..":
+            return
+        self.entries.append(
+            parse_listing_row(["".join(cell["text"]) for cell in row], "".join(link["text"]))
+        )
+
+
+def parse_listing(content: bytes | str) -> list[dict]:
+    """
+    Parses the rows of a webMAN file browser page, the parent folder row is skipped
+    """
+    parser = ListingParser()
+    parser.feed(content)
+    parser.close()
+    return parser.pop_entries()
+
+
+class listdir_entries(Command):
+    path = "/"
+    args_prefix = ""
+    available_args = ("*",)
+
+    @classmethod
+    def post_process(cls, response: requests.Response) -> list[dict]:
+        response.raise_for_status()
+        return parse_listing(response.content)
+
+
 
 ## Shortcuts and other higher level commands
 
 
+def iter_listing_batches(url, path, chunk_size=16 * 1024, timeout=5) -> Iterator[list[dict]]:
+    """
+    Streaming listdir_entries: the rows completed by every chunk of the page, as it arrives
+    """
+    with requests.get(f"{url}/{path}", stream=True, timeout=timeout) as response:
+        response.raise_for_status()
+        parser = ListingParser()
+        for chunk in response.iter_content(chunk_size):
+            parser.feed(chunk)
+            if entries := parser.pop_entries():
+                yield entries
+        parser.close()
+        if entries := parser.pop_entries():
+            yield entries
+
+
+def iter_listing(url, path, chunk_size=16 * 1024, timeout=5) -> Iterator[dict]:
+    for entries in iter_listing_batches(url, path, chunk_size=chunk_size, timeout=timeout):
+        yield from entries
+
+
 def very_fast_screenshot(url):
     raise ValueError("Very unstable and not working yet")
     very_fast_screenshot_root = PS3Path("dev_hdd0/tmp/very_fast_screenshot/")
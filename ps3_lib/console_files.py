@@ -0,0 +1,174 @@
+import asyncio
+import datetime
+from abc import ABC, abstractmethod
+from pathlib import PurePosixPath
+
+import requests
+
+from . import commands
+from .structs import PS3Path
+
+
+class RemoteEntry:
+    def __init__(
+        self,
+        path: PS3Path,
+        is_dir: bool,
+        size: int | None = None,
+        mtime: datetime.datetime | None = None,
+    ) -> None:
+        self.path = path
+        self.is_dir = is_dir
+        self.size = size  # None when unknown or not exact
+        self.mtime = mtime
+
+    def __repr__(self) -> str:
+        return f"<RemoteEntry {'dir' if self.is_dir else 'file'} {self.path} ({self.size} bytes)>"
+
+
+class ConsoleFileOperations(ABC):
+    """
+    Copy, move and recursive delete run by webMAN on the console itself, the data never leaves it.
+    webMAN answers once the operation is over or not at all, so completion is told by listings.
+
+    Subclasses implement `webman_url`, `_list_folder` (RemoteEntry with exact sizes or None,
+    FileNotFoundError for a missing folder) and `_file_size`
+    """
+
+    @property
+    @abstractmethod
+    def webman_url(self) -> str:
+        pass
+
+    @abstractmethod
+    async def _list_folder(self, path: PS3Path) -> list[RemoteEntry]:
+        pass
+
+    @abstractmethod
+    async def _file_size(self, path: PS3Path) -> int:
+        pass
+
+    def _forget_cached_stats(self) -> None:
+        """
+        Called when the console changed files on its own, implementations caching stats drop them here
+        """
+        pass
+
+    async def copy(self, from_path: PS3Path, to_path: PS3Path, timeout=600, poll_interval=1):
+        """
+        Copies a file or a folder to to_path on the console.
+        Returns once the copy has the same files and sizes as the source
+        """
+        source = await self._footprint(from_path)
+        if source is None:
+            raise FileNotFoundError(from_path)
+        await self._run_command(commands.copy, str(from_path), to=to_path)
+
+        async def done():
+            return await self._footprint(to_path) == source
+
+        await self._poll(done, timeout, poll_interval)
+
+    async def move(self, from_path: PS3Path, to_path: PS3Path, timeout=600, poll_interval=1):
+        """
+        Moves a file or a folder to to_path on the console, e.g. between dev_usb000 and dev_hdd0.
+        Returns once the source is gone and the destination is complete
+        """
+        source = await self._footprint(from_path)
+        if source is None:
+            raise FileNotFoundError(from_path)
+        await self._run_command(commands.move, str(from_path), to=to_path)
+
+        async def done():
+            return not await self._listed(from_path) and await self._footprint(to_path) == source
+
+        await self._poll(done, timeout, poll_interval)
+
+    async def delete_tree(self, path: PS3Path, timeout=600, poll_interval=1):
+        """
+        Deletes a file or a folder and everything in it, returns once it is gone
+        """
+        await self._run_command(commands.delete, str(path))
+
+        async def done():
+            return not await self._listed(path)
+
+        await self._poll(done, timeout, poll_interval)
+
+    async def _run_command(self, command, *args, **kwargs):
+        try:
+            await asyncio.to_thread(command, self.webman_url, *args, **kwargs)
+        except requests.Timeout:
+            # webMAN answers once big operations are over, completion is polled anyway
+            pass
+
+    async def _poll(self, done, timeout, poll_interval):
+        """
+        Waits until done() is true, a failing check (webMAN busy with the operation) is checked again
+        """
+        error = None
+
+        async def wait():
+            nonlocal error
+            while True:
+                self._forget_cached_stats()
+                try:
+                    if await done():
+                        return
+                except Exception as check_error:
+                    error = check_error
+                await asyncio.sleep(poll_interval)
+
+        try:
+            await asyncio.wait_for(wait(), timeout=timeout)
+        except asyncio.TimeoutError as timeout_error:
+            raise timeout_error from error
+
+    async def _listed(self, path: PS3Path) -> bool:
+        """
+        Whether path is listed in its folder, only a successful listing without it means it is missing
+        """
+        try:
+            siblings = await self._list_folder(path.parent)
+        except FileNotFoundError:
+            return False
+        return any(entry.path.name == path.name for entry in siblings)
+
+    async def _footprint(
+        self, path: PS3Path, max_concurrency=4
+    ) -> dict[str, int | None] | None:
+        """
+        Relative path -> exact size of everything under path (None for folders),
+        None if path does not exist
+        """
+        try:
+            siblings = await self._list_folder(path.parent)
+        except FileNotFoundError:
+            return None
+        entry = next((entry for entry in siblings if entry.path.name == path.name), None)
+        if entry is None:
+            return None
+        if not entry.is_dir:
+            return {"": entry.size if entry.size is not None else await self._file_size(path)}
+        semaphore = asyncio.Semaphore(max_concurrency)
+
+        async def list_folder(folder):
+            async with semaphore:
+                return await self._list_folder(folder)
+
+        footprint = {}
+        folders = [path]
+        while folders:
+            levels = await asyncio.gather(*(list_folder(folder) for folder in folders))
+            folders = []
+            for entry in (entry for level in levels for entry in level):
+                relative = str(PurePosixPath(str(entry.path)).relative_to(str(path)))
+                if entry.is_dir:
+                    footprint[relative] = None
+                    folders.append(entry.path)
+                elif entry.size is not None:
+                    footprint[relative] = entry.size
+                else:
+                    # Listed rounded, the comparison needs the exact size
+                    footprint[relative] = await self._file_size(entry.path)
+        return footprint
@@ -1,4 +1,6 @@
 from .ftp import PS3FTPFileTransfer
 from .http import PS3HTTPFileTransfer
-from .common import PS3AbstractFileTransfer
-from .ftp_robust import PS3RobustFTPFileTransfer
\ No newline at end of file
+from .common import PS3AbstractFileTransfer, RemoteEntry
+from .ftp_robust import PS3RobustFTPFileTransfer
+from .monitor import TransferMonitor, FileTransferRecord
+from .concurrency import AdaptiveLimiter, concurrency_levels
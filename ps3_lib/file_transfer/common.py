@@ -1,13 +1,56 @@
-from pathlib import Path
+import os
+import mmap
+import uuid
+import shutil
+import asyncio
+import hashlib
+import zipfile
+import datetime
+import tempfile
+from pathlib import Path, PurePosixPath
 from abc import abstractmethod, ABC
+from typing import AsyncIterator
 
-from ps3_lib import PS3Path
+import requests
 
-class PS3AbstractFileTransfer(ABC):
-    def __init__(self, ps3_host, ps3_port) -> None:
+from ps3_lib import PS3Path, commands
+from ps3_lib.console_files import ConsoleFileOperations, RemoteEntry
+
+from .monitor import TransferMonitor
+from .concurrency import AdaptiveLimiter, get_limiter
+from .zip_stream import ZipStreamExtractor, UnsupportedStream
+
+class PS3AbstractFileTransfer(ConsoleFileOperations, ABC):
+    def __init__(self, ps3_host, ps3_port, webman_port=80) -> None:
         self.ps3_host = ps3_host
         self.ps3_port = ps3_port
-    
+        self.webman_port = webman_port
+        self.monitor = TransferMonitor()
+        self.limiter: AdaptiveLimiter | None = None
+        self.webman_md5 = True  # Whether md5.ps3 answered so far
+
+    @property
+    def webman_url(self):
+        return f"http://{self.ps3_host}:{self.webman_port}"
+
+    def _use_adaptive_limiter(self, initial: int, minimum: int, maximum: int) -> AdaptiveLimiter:
+        """
+        Tunes the concurrency at runtime, the limiter is shared by the backends of the same kind
+        talking to the console
+        """
+        self.limiter = get_limiter(
+            self.ps3_host, type(self).__name__, initial=initial, minimum=minimum, maximum=maximum
+        )
+        self.limiter.watch(self.monitor)
+        return self.limiter
+
+    @property
+    def concurrency(self) -> int | None:
+        """
+        The amount of concurrent transfers currently allowed, None when not tuned
+        """
+        return self.limiter.limit if self.limiter else None
+
     @abstractmethod
     async def connect(self):
         pass
@@ -20,14 +63,207 @@ class PS3AbstractFileTransfer(ABC):
     async def send(self, from_path: Path, to_path: PS3Path):
         pass
 
+    async def send_batched(
+        self,
+        from_path: Path,
+        to_path: PS3Path,
+        staging_folder: PS3Path = PS3Path("dev_hdd0/tmp"),
+        min_files=16,
+        extract_timeout=300,
+    ) -> bool:
+        """
+        Uploads a folder as a single archive and lets webMAN extract it on the console,
+        falls back to a regular send if the folder is too small or the extraction fails.
+        Returns whether the archive path was used
+        """
+        from_path = Path(from_path)
+        files = [path for path in sorted(from_path.rglob("*")) if path.is_file()]
+        if not from_path.is_dir() or len(files) < min_files:
+            await self.send(from_path, to_path)
+            return False
+        remote_archive = staging_folder / f"{uuid.uuid4().hex}.zip"
+        with tempfile.TemporaryDirectory() as tmpdir:
+            archive = Path(tmpdir) / remote_archive.name
+            await asyncio.to_thread(self._pack, from_path, files, archive)
+            try:
+                await self.send(archive, remote_archive)
+                await self.mkdir(to_path)
+                await asyncio.to_thread(
+                    commands.unzip,
+                    self.webman_url,
+                    str(remote_archive),
+                    to=to_path,
+                    timeout=extract_timeout,
+                )
+                last_file = to_path / files[-1].relative_to(from_path).as_posix()
+                if not await self.exists(last_file):
+                    raise FileNotFoundError(f"{last_file} was not extracted")
+            except Exception:
+                await self.send(from_path, to_path)
+                return False
+            finally:
+                try:
+                    await self.delete(remote_archive)
+                except Exception:
+                    pass
+        return True
+
+    async def send_verified(self, from_path: Path, to_path: PS3Path, **kwargs) -> list[PS3Path]:
+        """
+        Sends then verifies, returns the remote files that are still wrong or could not be hashed
+        """
+        await self.send(from_path, to_path)
+        return await self.verify(from_path, to_path, **kwargs)
+
+    async def verify(
+        self,
+        from_path: Path,
+        to_path: PS3Path,
+        resend=True,
+        max_attempts=3,
+        max_concurrency=4,
+        download_fallback=True,
+    ) -> list[PS3Path]:
+        """
+        Checks that a sent file or folder matches its local copy: sizes first, then the MD5
+        computed by webMAN on the console against local hashes. Files that do not match are sent again.
+        Downloading a file to hash it is only done when webMAN cannot, and download_fallback is set.
+        Returns the remote files that are still wrong or that could not be hashed
+        """
+        from_path = Path(from_path)
+        if from_path.is_dir():
+            files = {
+                to_path / path.relative_to(from_path).as_posix(): path
+                for path in sorted(from_path.rglob("*"))
+                if path.is_file()
+            }
+        else:
+            files = {to_path: from_path}
+
+        # Hashed in threads while the console is queried, hashlib releases the GIL
+        local_hashes = {
+            remote: asyncio.ensure_future(asyncio.to_thread(self._local_md5, local))
+            for remote, local in files.items()
+        }
+        semaphore = asyncio.Semaphore(max_concurrency)
+
+        async def check(remote: PS3Path) -> bool | None:
+            # None when the file could not be hashed, it is neither right nor worth sending again
+            async with semaphore:
+                try:
+                    if await self.size(remote) != files[remote].stat().st_size:
+                        return False
+                    remote_hash = await self._remote_md5(remote, download_fallback)
+                except Exception:
+                    return False
+                if remote_hash is None:
+                    return None
+                return remote_hash == await local_hashes[remote]
+
+        try:
+            pending = list(files)
+            unverified = []
+            for attempt in range(max_attempts):
+                results = await asyncio.gather(*(check(remote) for remote in pending))
+                unverified += [remote for remote, ok in zip(pending, results) if ok is None]
+                pending = [remote for remote, ok in zip(pending, results) if ok is False]
+                if not pending or not resend or attempt == max_attempts - 1:
+                    break
+                for remote in pending:
+                    self.monitor.retried(ValueError(f"{remote} does not match its local copy"))
+                await asyncio.gather(*(self._resend(files[remote], remote) for remote in pending))
+        finally:
+            for future in local_hashes.values():
+                future.cancel()
+        return pending + unverified
+
+    async def _resend(self, from_path: Path, to_path: PS3Path):
+        try:
+            await self.delete(to_path)
+        except Exception:
+            pass
+        await self.send(from_path, to_path)
+
+    @staticmethod
+    def _local_md5(path: Path) -> str:
+        digest = hashlib.md5()
+        with open(path, "rb") as f:
+            if os.fstat(f.fileno()).st_size:
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                    digest.update(mapped)
+        return digest.hexdigest()
+
+    async def _remote_md5(self, path: PS3Path, download_fallback=True) -> str | None:
+        """
+        MD5 of a remote file, None when it cannot be computed without downloading it
+        """
+        if self.webman_md5:
+            try:
+                return await asyncio.to_thread(commands.md5, self.webman_url, str(path), timeout=60)
+            except requests.HTTPError as error:
+                # A 404 for a file that is there means md5.ps3 itself is missing, not asked again.
+                # Anything else (webMAN busy, 5xx) only skips it for this file
+                if (
+                    error.response is not None
+                    and error.response.status_code == 404
+                    and await self.exists(path)
+                ):
+                    self.webman_md5 = False
+            except ValueError:
+                # Answered without a hash, this webMAN does not compute them
+                self.webman_md5 = False
+            except requests.RequestException:
+                pass
+        if download_fallback:
+            return await self.checksum(path, "md5")
+        return None
+
+    @staticmethod
+    def _pack(root: Path, files: list[Path], archive: Path) -> None:
+        # Stored, most of the console data is already compressed or encrypted
+        with zipfile.ZipFile(archive, "w", compression=zipfile.ZIP_STORED) as zip_file:
+            for path in files:
+                zip_file.write(path, path.relative_to(root).as_posix())
+
     @abstractmethod
     async def get(self, from_path: PS3Path, to_path: Path):
         pass
 
     @abstractmethod
-    async def get_bytes(self, from_path: PS3Path):
+    def iter_chunks(self, from_path: PS3Path, chunk_size: int | None = None) -> AsyncIterator[bytes]:
+        """
+        Async generator over the content of a remote file, only a bounded amount
+        of chunks is ever buffered whatever the size of the file
+        """
         pass
 
+    async def get_bytes(self, from_path: PS3Path):
+        return b"".join([chunk async for chunk in self.iter_chunks(from_path)])
+
+    async def read_into(self, from_path: PS3Path, buffer, offset: int = 0) -> int:
+        """
+        Writes a remote file into a caller provided writable buffer
+        (bytearray, memoryview, mmap...) starting at offset, returns the amount of bytes read
+        """
+        view = memoryview(buffer).cast("B")
+        position = offset
+        try:
+            async for chunk in self.iter_chunks(from_path):
+                end = position + len(chunk)
+                if end > len(view):
+                    raise BufferError(f"{from_path} does not fit in the provided buffer")
+                view[position:end] = chunk
+                position = end
+        finally:
+            view.release()
+        return position - offset
+
+    async def checksum(self, path: PS3Path, algorithm: str = "md5") -> str:
+        digest = hashlib.new(algorithm)
+        async for chunk in self.iter_chunks(path):
+            digest.update(chunk)
+        return digest.hexdigest()
+
     @abstractmethod
     async def delete(self, path: PS3Path):
         pass
@@ -40,7 +276,215 @@ class PS3AbstractFileTransfer(ABC):
     async def exists(self, path: PS3Path):
         pass
 
+    @abstractmethod
+    async def size(self, path: PS3Path) -> int:
+        pass
+
     @abstractmethod
     async def mkdir(self, path: PS3Path):
         pass
-        
\ No newline at end of file
+
+    @abstractmethod
+    async def listdir(self, path: PS3Path) -> list[RemoteEntry]:
+        pass
+
+    async def _list_folder(self, path: PS3Path) -> list[RemoteEntry]:
+        try:
+            return await self.listdir(path)
+        except FileNotFoundError:
+            raise
+        except Exception as error:
+            # Backends raise their own errors for missing folders, only a confirmed miss is one
+            if not await self.exists(path):
+                raise FileNotFoundError(path) from error
+            raise
+
+    async def _file_size(self, path: PS3Path) -> int:
+        return await self.size(path)
+
+    async def list_tree(self, path: PS3Path, max_concurrency=4) -> list[RemoteEntry]:
+        """
+        Lists a remote tree recursively, folders of a same level are listed concurrently
+        """
+        semaphore = asyncio.Semaphore(max_concurrency)
+
+        async def listdir(folder):
+            async with semaphore:
+                return await self.listdir(folder)
+
+        entries = []
+        folders = [path]
+        while folders:
+            levels = await asyncio.gather(*(listdir(folder) for folder in folders))
+            level_entries = [entry for level in levels for entry in level]
+            entries += level_entries
+            folders = [entry.path for entry in level_entries if entry.is_dir]
+        return entries
+
+    async def get_tree(
+        self,
+        from_path: PS3Path,
+        to_path: Path,
+        max_concurrency=4,
+        skip_existing=True,
+        zip_min_files=200,
+        zip_max_mean_size=64 * 1024,
+    ) -> list[RemoteEntry]:
+        """
+        Mirrors a remote folder into a local one, keeping the structure and the timestamps.
+        Files already present locally with the same size are skipped.
+        When many small files are outdated, the tree is zipped on the console and fetched as one archive instead.
+        Returns the entries that were downloaded
+        """
+        to_path = Path(to_path)
+        entries = await self.list_tree(from_path, max_concurrency=max_concurrency)
+
+        def local_path(entry: RemoteEntry) -> Path:
+            relative = PurePosixPath(str(entry.path)).relative_to(str(from_path))
+            return to_path.joinpath(*relative.parts)
+
+        semaphore = asyncio.Semaphore(max_concurrency)
+
+        async def outdated(entry: RemoteEntry) -> bool:
+            local = local_path(entry)
+            if not skip_existing or not local.is_file():
+                return True
+            size = entry.size
+            if size is None:
+                async with semaphore:
+                    size = await self.size(entry.path)
+            return local.stat().st_size != size
+
+        files = [entry for entry in entries if not entry.is_dir]
+        checks = await asyncio.gather(*(outdated(entry) for entry in files))
+        # Only what has to be fetched decides between the archive and single files
+        files = [entry for entry, needed in zip(files, checks) if needed]
+        known_sizes = [entry.size for entry in files if entry.size is not None]
+        if (
+            zip_min_files
+            and len(files) >= zip_min_files
+            and known_sizes
+            and sum(known_sizes) / len(known_sizes) <= zip_max_mean_size
+        ):
+            if await self.get_tree_zipped(from_path, to_path):
+                return files
+
+        to_path.mkdir(parents=True, exist_ok=True)
+        for entry in entries:
+            if entry.is_dir:
+                local_path(entry).mkdir(parents=True, exist_ok=True)
+
+        downloaded = []
+
+        async def mirror_file(entry: RemoteEntry):
+            local = local_path(entry)
+            async with semaphore:
+                await self.get(entry.path, local)
+            downloaded.append(entry)
+            set_mtime(local, entry.mtime)
+
+        def set_mtime(local: Path, mtime: datetime.datetime | None):
+            if mtime is not None:
+                timestamp = mtime.timestamp()
+                os.utime(local, (timestamp, timestamp))
+
+        await asyncio.gather(*(mirror_file(entry) for entry in files))
+        # Deepest first, creating the files touched their parent folders
+        for entry in sorted(entries, key=lambda entry: -len(str(entry.path))):
+            if entry.is_dir:
+                set_mtime(local_path(entry), entry.mtime)
+        return downloaded
+
+    mirror = get_tree
+
+    async def get_tree_zipped(
+        self,
+        from_path: PS3Path,
+        to_path: Path,
+        staging_folder: PS3Path = PS3Path("dev_hdd0/tmp"),
+        zip_timeout=600,
+        poll_interval=1,
+    ) -> bool:
+        """
+        Zips a remote folder on the console and downloads it as a single stream,
+        the remote archive is always removed. Returns whether it succeeded
+        """
+        to_path = Path(to_path)
+        remote_archive = staging_folder / f"{uuid.uuid4().hex}.zip"
+        try:
+            await asyncio.to_thread(
+                commands.zip,
+                self.webman_url,
+                str(from_path),
+                to=remote_archive,
+                timeout=zip_timeout,
+            )
+            await asyncio.wait_for(
+                self._await_stable_size(remote_archive, poll_interval), timeout=zip_timeout
+            )
+            extractor = ZipStreamExtractor(to_path, self._archive_prefixes(from_path))
+            with tempfile.TemporaryFile() as archive:
+                try:
+                    # Also spooled to disk, in case a member can only be located from the central directory
+                    async for chunk in self.iter_chunks(remote_archive):
+                        archive.write(chunk)
+                        if extractor is not None:
+                            try:
+                                extractor.feed(chunk)
+                            except UnsupportedStream:
+                                extractor = None
+                finally:
+                    if extractor is not None and not extractor.done:
+                        extractor.abort()
+                if extractor is not None:
+                    extractor.close()
+                else:
+                    archive.seek(0)
+                    await asyncio.to_thread(self._extract, archive, from_path, to_path)
+        except Exception:
+            return False
+        finally:
+            try:
+                await self.delete(remote_archive)
+            except Exception:
+                pass
+        return True
+
+    async def _await_stable_size(self, path: PS3Path, poll_interval=1):
+        # webMAN may still be writing the archive when the command returns
+        previous_size = None
+        while True:
+            if await self.exists(path):
+                size = await self.size(path)
+                if size and size == previous_size:
+                    return size
+                previous_size = size
+            await asyncio.sleep(poll_interval)
+
+    @staticmethod
+    def _archive_prefixes(from_path: PS3Path) -> tuple[str, ...]:
+        # Depending on the webMAN version members are relative to the root, the parent or the folder
+        return (str(from_path).strip("/") + "/", from_path.name + "/")
+
+    @classmethod
+    def _extract(cls, archive, from_path: PS3Path, to_path: Path) -> None:
+        to_path = to_path.resolve()
+        with zipfile.ZipFile(archive) as zip_file:
+            members = [member for member in zip_file.infolist() if not member.is_dir()]
+            prefix = ""
+            for candidate in cls._archive_prefixes(from_path):
+                if members and members[0].filename.startswith(candidate):
+                    prefix = candidate
+                    break
+            for member in members:
+                if not member.filename.startswith(prefix):
+                    continue
+                target = (to_path / member.filename[len(prefix):]).resolve()
+                if not target.is_relative_to(to_path):
+                    raise ValueError(f"Unsafe path in archive: {member.filename}")
+                target.parent.mkdir(parents=True, exist_ok=True)
+                with zip_file.open(member) as source, open(target, "wb") as destination:
+                    shutil.copyfileobj(source, destination, 1024 * 1024)
+                timestamp = datetime.datetime(*member.date_time).timestamp()
+                os.utime(target, (timestamp, timestamp))
+
@@ -0,0 +1,189 @@
+import time
+import asyncio
+from collections import deque
+from contextlib import asynccontextmanager
+
+from .monitor import TransferMonitor, FileTransferRecord
+
+
+class AdaptiveLimiter:
+    """
+    AIMD controller for the amount of concurrent transfers to a console.
+    Every window (one completed transfer per slot) the limit grows by `increase`,
+    it steps back when the extra slots did not bring `tolerance` more throughput
+    and is multiplied by `decrease` as soon as a transfer fails, times out or reconnects.
+    Backends start it at their configured maximum, so it only ever lowers their concurrency
+    after failures and climbs back as transfers succeed again.
+    Backends sharing it pass themselves and their own maximum to `slot`,
+    so none of them holds more slots than it was configured for
+    """
+
+    def __init__(
+        self,
+        initial=2,
+        minimum=1,
+        maximum=16,
+        increase=1,
+        decrease=0.5,
+        tolerance=0.1,
+        min_window=4,
+    ) -> None:
+        assert 1 <= minimum <= maximum, "Invalid concurrency bounds"
+        self.minimum = minimum
+        self.maximum = maximum
+        self.limit = min(max(initial, minimum), maximum)
+        self.increase = increase
+        self.decrease = decrease
+        self.tolerance = tolerance
+        self.min_window = min_window
+        self.active = 0
+        self.active_by_owner: dict[object, int] = {}
+        # Future, owner and cap of every waiting acquire, in arrival order
+        self.waiters: deque[tuple[asyncio.Future, object, int | None]] = deque()
+        self.best_throughput = 0.0
+        self.best_limit = self.limit
+        self.monitors: set[TransferMonitor] = set()
+        self._start_window()
+
+    def __repr__(self) -> str:
+        return f"<AdaptiveLimiter {self.active}/{self.limit} in [{self.minimum}, {self.maximum}]>"
+
+    def widen(self, minimum: int, maximum: int) -> None:
+        """
+        Extends the bounds to cover another backend sharing the limiter,
+        each one still gets no more than its own maximum through the cap it passes to `slot`
+        """
+        self.minimum = min(self.minimum, minimum)
+        self.maximum = max(self.maximum, maximum)
+
+    def _start_window(self) -> None:
+        self.window_started = time.perf_counter()
+        self.window_bytes = 0
+        self.window_seconds = 0.0
+        self.window_active = 0
+        self.window_transfers = 0
+        self.window_decreased = False
+
+    def watch(self, monitor: TransferMonitor) -> None:
+        if monitor in self.monitors:
+            return
+        self.monitors.add(monitor)
+        monitor.on("file_end", self._on_file_end)
+        # A reconnect is reported once, not as a retry too
+        monitor.on("retry", self.record_failure)
+        monitor.on("reconnect", self.record_failure)
+
+    def _on_file_end(self, record: FileTransferRecord) -> None:
+        if record.error is None:
+            # Transfers started under the previous limit would blur the measure
+            if record.started_at >= self.window_started:
+                self.record_success(record.transferred, record.duration)
+        elif not isinstance(record.error, (asyncio.CancelledError, GeneratorExit)):
+            self.record_failure(record.error)
+
+    def record_success(self, size: int, duration: float) -> None:
+        self.window_bytes += size
+        self.window_seconds += duration
+        self.window_active += max(self.active, 1)
+        self.window_transfers += 1
+        if self.window_transfers >= max(self.limit, self.min_window):
+            self._close_window()
+
+    def record_failure(self, error: BaseException | None = None) -> None:
+        # Once per window, the transfers in flight fail together when the console chokes
+        if not self.window_decreased:
+            self._set_limit(int(self.limit * self.decrease))
+            self.best_throughput = 0.0
+            self.best_limit = self.limit
+            self._start_window()
+            self.window_decreased = True
+
+    def _close_window(self) -> None:
+        # Little's law, transfers finishing in bursts would skew a wall clock measure
+        concurrency = self.window_active / self.window_transfers
+        throughput = concurrency * self.window_bytes / self.window_seconds if self.window_seconds else 0.0
+        if self.limit > self.best_limit and throughput < self.best_throughput * (1 + self.tolerance):
+            # The extra slots did not pay off, the console or its disk is the bottleneck
+            self._set_limit(self.best_limit)
+        else:
+            self.best_throughput = throughput
+            self.best_limit = self.limit
+            self._set_limit(self.limit + self.increase)
+        self._start_window()
+
+    def _set_limit(self, limit: int) -> None:
+        self.limit = min(max(limit, self.minimum), self.maximum)
+        self._wake()
+
+    def _wake(self) -> None:
+        # In arrival order, skipping the waiters whose owner already holds its cap
+        free = self.limit - self.active
+        woken: dict[object, int] = {}
+        waiters = deque()
+        for entry in self.waiters:
+            waiter, owner, cap = entry
+            if waiter.done():
+                continue
+            held = self.active_by_owner.get(owner, 0) + woken.get(owner, 0)
+            if free > 0 and (cap is None or held < cap):
+                waiter.set_result(None)
+                woken[owner] = woken.get(owner, 0) + 1
+                free -= 1
+            else:
+                waiters.append(entry)
+        self.waiters = waiters
+
+    def _available(self, owner, cap: int | None) -> bool:
+        return self.active < self.limit and (cap is None or self.active_by_owner.get(owner, 0) < cap)
+
+    async def acquire(self, owner=None, cap: int | None = None) -> None:
+        while not self._available(owner, cap):
+            entry = (asyncio.get_running_loop().create_future(), owner, cap)
+            self.waiters.append(entry)
+            try:
+                await entry[0]
+            except asyncio.CancelledError:
+                if entry[0].done() and not entry[0].cancelled():
+                    # Woken up but leaving, the slot goes to the next one
+                    self._wake()
+                raise
+            finally:
+                if entry in self.waiters:
+                    self.waiters.remove(entry)
+        self.active += 1
+        self.active_by_owner[owner] = self.active_by_owner.get(owner, 0) + 1
+
+    def release(self, owner=None) -> None:
+        self.active -= 1
+        self.active_by_owner[owner] -= 1
+        if not self.active_by_owner[owner]:
+            del self.active_by_owner[owner]
+        self._wake()
+
+    @asynccontextmanager
+    async def slot(self, owner=None, cap: int | None = None):
+        """
+        Holds one slot, `owner` (a backend) gets at most `cap` of them at once
+        """
+        await self.acquire(owner, cap)
+        try:
+            yield
+        finally:
+            self.release(owner)
+
+
+# One limiter per console and backend kind, FTP sessions and HTTP pushes do not cost the same
+limiters: dict[tuple[str, str], AdaptiveLimiter] = {}
+
+
+def get_limiter(host: str, kind: str, minimum=1, maximum=16, **kwargs) -> AdaptiveLimiter:
+    key = (host, kind)
+    if key not in limiters:
+        limiters[key] = AdaptiveLimiter(minimum=minimum, maximum=maximum, **kwargs)
+    else:
+        limiters[key].widen(minimum, maximum)
+    return limiters[key]
+
+
+def concurrency_levels() -> dict[tuple[str, str], int]:
+    return {key: limiter.limit for key, limiter in limiters.items()}
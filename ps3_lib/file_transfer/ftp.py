@@ -1,19 +1,43 @@
+import os
+import asyncio
+import datetime
 from pathlib import Path
 
 import aioftp
 
 from ps3_lib import PS3Path
 
-from .common import PS3AbstractFileTransfer
+from .common import PS3AbstractFileTransfer, RemoteEntry
+from .pool import ConnectionPool
 
 class PS3FTPFileTransfer(PS3AbstractFileTransfer):
-    def __init__(self, ps3_host, ps3_port = 21, username = None, password = None) -> None:
-        super().__init__(ps3_host, ps3_port)
-        self.client = None
+    def __init__(
+        self,
+        ps3_host,
+        ps3_port=21,
+        username=None,
+        password=None,
+        webman_port=80,
+        block_size=64 * 1024,
+        max_connections=4,
+        min_connections=1,
+        adaptive=True,
+    ) -> None:
+        super().__init__(ps3_host, ps3_port, webman_port)
+        self.pool = None
         self.username = username
         self.password = password
+        self.block_size = block_size
+        self.max_connections = max_connections
+        if adaptive:
+            # The pool holds max_connections sessions, the limiter decides how many are used
+            self._use_adaptive_limiter(
+                initial=max_connections,
+                minimum=min_connections,
+                maximum=max_connections,
+            )
     
-    async def connect(self):
+    async def _open_client(self):
         client = aioftp.Client()
         await client.connect(self.ps3_host, self.ps3_port)
         if self.username:
@@ -23,43 +47,140 @@ class PS3FTPFileTransfer(PS3AbstractFileTransfer):
                 await client.login(self.username)
         else:
             await client.login()
-        self.client = client
+        return client
+
+    async def _close_client(self, client):
+        try:
+            await asyncio.wait_for(client.quit(), timeout=5)
+        except Exception:
+            client.close()
+
+    async def connect(self):
+        pool = ConnectionPool(
+            self._open_client,
+            self._close_client,
+            self.max_connections,
+            on_reconnect=self.monitor.reconnected,
+            limiter=self.limiter,
+        )
+        await pool.open()
+        self.pool = pool
     
     async def disconnect(self):
-        await self.client.quit()
-        self.client = None
+        await self.pool.close()
+        self.pool = None
     
     async def send(self, from_path: Path, to_path: PS3Path, write_into=True):
-        assert self.client, "Not connected"
-        await self.client.upload(from_path, str(to_path), write_into=write_into)
-    
+        assert self.pool, "Not connected"
+        from_path = Path(from_path)
+        if not write_into:
+            to_path /= from_path.name
+        if from_path.is_dir():
+            await self._send_dir(from_path, to_path)
+        else:
+            if str(to_path.parent) not in ("", "."):
+                await self.mkdir(to_path.parent)
+            await self._send_file(from_path, to_path)
+
+    async def _send_dir(self, from_path: Path, to_path: PS3Path):
+        folders_by_depth: dict[int, list[PS3Path]] = {}
+        files = []
+        for folder, folder_names, file_names in os.walk(from_path):
+            relative = Path(folder).relative_to(from_path)
+            remote_folder = to_path / relative.as_posix() if relative.parts else to_path
+            for name in folder_names:
+                folders_by_depth.setdefault(len(relative.parts), []).append(remote_folder / name)
+            files += [(Path(folder) / name, remote_folder / name) for name in file_names]
+
+        # The tree is created ahead, one level at a time, so uploads never wait on it
+        await self.mkdir(to_path)
+        for depth in sorted(folders_by_depth):
+            await asyncio.gather(*(self._make_child_directory(path) for path in folders_by_depth[depth]))
+        # The pool bounds the concurrency
+        await asyncio.gather(*(self._send_file(local, remote) for local, remote in files))
+
+    async def _make_child_directory(self, path: PS3Path):
+        async with self.pool.acquire() as client:
+            try:
+                await client.command("MKD " + path.resolve(), "257")
+            except aioftp.StatusCodeError:
+                if not await client.is_dir(path.resolve()):
+                    raise
+
+    async def _send_file(self, from_path: Path, to_path: PS3Path):
+        async with self.pool.acquire() as client:
+            with self.monitor.track(to_path, "send", from_path.stat().st_size) as record:
+                async with client.upload_stream(str(to_path)) as stream:
+                    with open(from_path, "rb") as f:
+                        while block := f.read(self.block_size):
+                            await stream.write(block)
+                            self.monitor.progress(record, len(block))
+
     async def get(self, from_path: PS3Path, to_path: Path, write_into=True):
-        assert self.client, "Not connected"
-        await self.client.download(str(from_path), to_path, write_into=write_into)
-    
-    async def get_bytes(self, from_path: PS3Path):
-        assert self.client, "Not connected"
-        async with self.client.download_stream(str(from_path)) as stream:
-            return await stream.read()
+        assert self.pool, "Not connected"
+        to_path = Path(to_path)
+        if not write_into:
+            to_path /= from_path.name
+        to_path.parent.mkdir(parents=True, exist_ok=True)
+        async with self.pool.acquire() as client:
+            with self.monitor.track(from_path, "get") as record:
+                async with client.download_stream(str(from_path)) as stream:
+                    with open(to_path, "wb") as f:
+                        async for block in stream.iter_by_block(self.block_size):
+                            f.write(block)
+                            self.monitor.progress(record, len(block))
+
+    async def iter_chunks(self, from_path: PS3Path, chunk_size: int | None = None):
+        assert self.pool, "Not connected"
+        async with self.pool.acquire() as client:
+            with self.monitor.track(from_path, "get") as record:
+                async with client.download_stream(str(from_path)) as stream:
+                    async for block in stream.iter_by_block(chunk_size or self.block_size):
+                        self.monitor.progress(record, len(block))
+                        yield block
     
     async def delete(self, path: PS3Path):
-        assert self.client, "Not connected"
-        await self.client.remove(str(path))
+        assert self.pool, "Not connected"
+        async with self.pool.acquire() as client:
+            await client.remove(str(path))
 
     async def stat(self, path: PS3Path):
-        assert self.client, "Not connected"
-        return await self.client.stat(str(path))
+        assert self.pool, "Not connected"
+        async with self.pool.acquire() as client:
+            return await client.stat(str(path))
     
+    async def size(self, path: PS3Path):
+        return int((await self.stat(path))["size"])
+
     async def exists(self, path: PS3Path):
-        assert self.client, "Not connected"
-        try:
-            await self.client.stat(str(path))
-            return True
-        except aioftp.PathIOError:
-            return False
+        assert self.pool, "Not connected"
+        async with self.pool.acquire() as client:
+            try:
+                await client.stat(str(path))
+                return True
+            except (aioftp.StatusCodeError, aioftp.PathIOError):
+                return False
     
     async def mkdir(self, path: PS3Path):
-        assert self.client, "Not connected"
-        await self.client.make_directory("/"+str(path).strip("/"))
-    
+        assert self.pool, "Not connected"
+        async with self.pool.acquire() as client:
+            await client.make_directory("/"+str(path).strip("/"))
 
+    async def listdir(self, path: PS3Path):
+        assert self.pool, "Not connected"
+        async with self.pool.acquire() as client:
+            listing = await client.list(str(path))
+        entries = []
+        for name, info in listing:
+            if info["type"] not in ("file", "dir"):
+                continue
+            modify = info.get("modify")
+            entries.append(
+                RemoteEntry(
+                    path / name.name,
+                    is_dir=info["type"] == "dir",
+                    size=int(info["size"]) if info["type"] == "file" and "size" in info else None,
+                    mtime=datetime.datetime.strptime(modify[:14], "%Y%m%d%H%M%S") if modify else None,
+                )
+            )
+        return entries
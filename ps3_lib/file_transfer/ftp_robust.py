@@ -1,14 +1,18 @@
 from pathlib import Path
 
+import stat
 import asyncio
+import datetime
+import threading
 
 import ftputil
+import ftputil.session
 
 from concurrent.futures import ThreadPoolExecutor
 
 from ps3_lib import PS3Path
 
-from .common import PS3AbstractFileTransfer
+from .common import PS3AbstractFileTransfer, RemoteEntry
 
 def reconnect_on_error(func):
     async def wrapper(self, *args, **kwargs):
@@ -19,6 +23,7 @@ def reconnect_on_error(func):
                 await self.disconnect()
             finally:
                 await self.connect()
+            self.monitor.reconnected(e)
             return await func(self, *args, **kwargs)
     return wrapper
 
@@ -32,19 +37,25 @@ def reconnect_on_timeout(timeout=10):
                     await self.disconnect()
                 finally:
                     await self.connect()
+                self.monitor.reconnected(e)
                 return await asyncio.wait_for(func(self, *args, **kwargs), timeout=timeout)
         return wrapper
     return decorator
 
 class PS3RobustFTPFileTransfer(PS3AbstractFileTransfer):    
-    def __init__(self, ps3_host, ps3_port=21, username=None, password=None):
-        super().__init__(ps3_host, ps3_port)
+    def __init__(self, ps3_host, ps3_port=21, username=None, password=None, webman_port=80):
+        super().__init__(ps3_host, ps3_port, webman_port)
         self.host = None
         self.username = username or "anonymous"
         self.password = password or ""
 
     async def connect(self):
-        self.host = ftputil.FTPHost(self.ps3_host, self.username, self.password)
+        self.host = ftputil.FTPHost(
+            self.ps3_host,
+            self.username,
+            self.password,
+            session_factory=ftputil.session.session_factory(port=self.ps3_port),
+        )
 
     async def disconnect(self):
         if self.host:
@@ -72,13 +83,23 @@ class PS3RobustFTPFileTransfer(PS3AbstractFileTransfer):
         assert self.host, "Not connected"
         if to_path.is_dir():
             to_path /= from_path.name
-        self.host.upload(str(from_path), to_path.resolve())        
+        with self.monitor.track(to_path, "send", from_path.stat().st_size) as record:
+            self.host.upload(
+                str(from_path),
+                to_path.resolve(),
+                callback=lambda chunk: self.monitor.progress(record, len(chunk)),
+            )
 
     @reconnect_on_error
     @reconnect_on_timeout(timeout=10)
     async def get(self, from_path: PS3Path, to_path: Path):
         assert self.host, "Not connected"
-        self.host.download(str(from_path), to_path.resolve())
+        with self.monitor.track(from_path, "get") as record:
+            self.host.download(
+                str(from_path),
+                to_path.resolve(),
+                callback=lambda chunk: self.monitor.progress(record, len(chunk)),
+            )
 
     @reconnect_on_error
     @reconnect_on_timeout(timeout=10)
@@ -92,12 +113,43 @@ class PS3RobustFTPFileTransfer(PS3AbstractFileTransfer):
         assert self.host, "Not connected"
         return self.host.stat(path.resolve())
 
+    @reconnect_on_error
+    @reconnect_on_timeout(timeout=10)
+    async def size(self, path: PS3Path):
+        assert self.host, "Not connected"
+        return self.host.stat(path.resolve()).st_size
+
+    @reconnect_on_error
+    @reconnect_on_timeout(timeout=10)
+    async def listdir(self, path: PS3Path):
+        assert self.host, "Not connected"
+        entries = []
+        for name in self.host.listdir(path.resolve()):
+            # Served from the stat cache filled by listdir
+            stat_result = self.host.lstat((path / name).resolve())
+            is_dir = stat.S_ISDIR(stat_result.st_mode)
+            entries.append(
+                RemoteEntry(
+                    path / name,
+                    is_dir=is_dir,
+                    size=None if is_dir else stat_result.st_size,
+                    mtime=datetime.datetime.fromtimestamp(stat_result.st_mtime)
+                    if stat_result.st_mtime
+                    else None,
+                )
+            )
+        return entries
+
     @reconnect_on_error
     @reconnect_on_timeout(timeout=10)
     async def exists(self, path: PS3Path):
         assert self.host, "Not connected"
         return self.host.path.exists(path.resolve())
 
+    def _forget_cached_stats(self) -> None:
+        if self.host:
+            self.host.stat_cache.clear()
+
     @reconnect_on_error
     @reconnect_on_timeout(timeout=10)
     async def mkdir(self, path: PS3Path):
@@ -105,8 +157,42 @@ class PS3RobustFTPFileTransfer(PS3AbstractFileTransfer):
         if not await self.exists(path):
             self.host.mkdir(path.resolve())
 
-    @reconnect_on_error
-    @reconnect_on_timeout(timeout=10)
-    async def get_bytes(self, path: PS3Path):
+    async def iter_chunks(self, path: PS3Path, chunk_size: int | None = None, buffer_chunks=4):
         assert self.host, "Not connected"
-        return self.host.download_as_bytes(path.resolve())
\ No newline at end of file
+        chunk_size = chunk_size or 64 * 1024
+        loop = asyncio.get_running_loop()
+        queue = asyncio.Queue(maxsize=buffer_chunks)
+        stop = threading.Event()
+        # ftputil transfers files over a child session, only the reads leave the event loop
+        remote_file = self.host.open(path.resolve(), "rb")
+
+        def produce():
+            try:
+                while not stop.is_set():
+                    chunk = remote_file.read(chunk_size)
+                    asyncio.run_coroutine_threadsafe(queue.put(chunk), loop).result()
+                    if not chunk:
+                        return
+            except BaseException as e:
+                asyncio.run_coroutine_threadsafe(queue.put(e), loop).result()
+
+        producer = loop.run_in_executor(None, produce)
+        try:
+            with self.monitor.track(path, "get") as record:
+                while True:
+                    chunk = await queue.get()
+                    if isinstance(chunk, BaseException):
+                        raise chunk
+                    if not chunk:
+                        break
+                    self.monitor.progress(record, len(chunk))
+                    yield chunk
+        finally:
+            stop.set()
+            # Unblocks the producer if it is waiting on a full queue
+            while not producer.done():
+                try:
+                    queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    await asyncio.sleep(0.01)
+            remote_file.close()
@@ -1,68 +1,118 @@
+import os
+import uuid
+import socket
 import asyncio
 
 from pathlib import Path
-from functools import lru_cache
+from urllib.parse import quote
 
 import aiohttp
 
-from ps3_lib import PS3Path
+from ps3_lib import PS3Path, commands
+
+from .common import PS3AbstractFileTransfer, RemoteEntry
+from .http_server import FileRoute, add_route, remove_route, get_server
+
+
+def get_local_address(remote_host: str) -> str:
+    # No packet is sent, this only asks the OS which interface routes to the console
+    with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sock:
+        sock.connect((remote_host, 80))
+        return sock.getsockname()[0]
 
-from .common import PS3AbstractFileTransfer
-from .http_server import get_server
 
 class TempRouteContextManager:
-    def __init__(self, path, port) -> None:
-        self.path = path
-        self.port = port
-        self.session = aiohttp.ClientSession()
+    def __init__(self, path, public_url, on_served=None) -> None:
+        self.path = Path(path)
+        self.public_url = public_url
+        self.on_served = on_served
+        self.route = None
+
+    def url(self, filename: str) -> str:
+        return f"{self.public_url}/{self.route.route_id}/{filename}"
+
+    async def wait(self, timeout=None):
+        await asyncio.wait_for(self.route.done.wait(), timeout=timeout)
 
     async def __aenter__(self):
-        with open(self.path, "rb") as f:
-            url = f"http://127.0.0.1:{self.port}/{hash(self)}"
-            async with self.session.put(url = url, data=f.read()) as response:
-                response.raise_for_status()
+        self.route = FileRoute(uuid.uuid4().hex, self.path, self.on_served)
+        add_route(self.route)
         return self
 
     async def __aexit__(self, exc_type, exc_value, traceback):
-        async with self.session.delete(url = f"http://127.0.0.1:{self.port}/{hash(self)}") as response:
-            response.raise_for_status()
-        await self.session.close()
-
-    # @lru_cache(maxsize=1)
-    def __hash__(self) -> int:
-        return abs(int(hash(self.path)))
+        remove_route(self.route)
 
 
 class PS3HTTPFileTransfer(PS3AbstractFileTransfer):
     def __init__(
-        self, ps3_host, ps3_port=80, server_host="0.0.0.0", server_port=9898
+        self,
+        ps3_host,
+        ps3_port=80,
+        server_host="0.0.0.0",
+        server_port=9898,
+        public_host=None,
+        max_concurrent_downloads=4,
+        download_timeout=600,
+        chunk_size=256 * 1024,
+        parallel_parts=4,
+        min_part_size=8 * 1024 * 1024,
+        adaptive=True,
     ) -> None:
-        super().__init__(ps3_host, ps3_port)
+        super().__init__(ps3_host, ps3_port, webman_port=ps3_port)
         self.session = None
         self.server = None
+        self.server_task = None
         self.server_host = server_host
         self.server_port = server_port
+        self.public_host = public_host
+        self.download_timeout = download_timeout
+        self.max_concurrent_downloads = max_concurrent_downloads
+        # A single gate for pushes: the tuned limiter, or a fixed semaphore without it
+        self.downloads_semaphore = None
+        if adaptive:
+            self._use_adaptive_limiter(
+                initial=max_concurrent_downloads,
+                minimum=1,
+                maximum=max_concurrent_downloads,
+            )
+        else:
+            self.downloads_semaphore = asyncio.Semaphore(max_concurrent_downloads)
+        self.chunk_size = chunk_size
+        self.parallel_parts = parallel_parts
+        self.min_part_size = min_part_size
+
+    @property
+    def public_url(self):
+        return f"http://{self.public_host}:{self.server_port}"
 
-    def temp_route(self, path: Path):
-        return TempRouteContextManager(path, self.server_port)
+    def temp_route(self, path: Path, on_served=None):
+        return TempRouteContextManager(path, self.public_url, on_served)
 
     async def connect(self):
         self.session = aiohttp.ClientSession(connector=aiohttp.TCPConnector(limit=5))
-        async with self.session.get(
-            f"http://{self.ps3_host}:{self.ps3_port}/"
-        ) as response:
+        async with self.session.get(f"{self.webman_url}/") as response:
             response.raise_for_status()
-        server = get_server(self.server_port)
-        self.server = asyncio.create_task(server.serve())
+        if self.public_host is None:
+            self.public_host = get_local_address(self.ps3_host)
+        self.server = get_server(self.server_port, self.server_host)
+        self.server_task = asyncio.create_task(self.server.serve())
+        while not self.server.started:
+            if self.server_task.done():
+                # Surfaces the startup error (port already in use...)
+                await self.server_task
+                raise RuntimeError("The file server stopped during startup")
+            await asyncio.sleep(0.05)
 
     async def disconnect(self):
         await self.session.close()
         self.session = None
-        self.server.cancel()
-        await self.server
+        self.server.should_exit = True
+        await self.server_task
         self.server = None
+        self.server_task = None
 
     async def send(self, from_path: Path, to_path: PS3Path):
+        assert self.session, "Not connected"
         if from_path.is_dir():
             await self._send_dir(from_path, to_path)
         else:
@@ -79,34 +129,163 @@ class PS3HTTPFileTransfer(PS3AbstractFileTransfer):
         if to_path.is_dir():
             to_path /= from_path.name
 
-        async with self.temp_route(from_path) as route:
-            file_url = (
-                f"http://{self.server_host}:{self.server_port}/{hash(route)}"
-            )
-            print(f"http://{self.ps3_host}:{self.ps3_port}/xmb.ps3/download.ps3?{file_url}")
-            await asyncio.sleep(float("inf"))
-            async with self.session.get(
-                f"http://{self.ps3_host}:{self.ps3_port}/xmb.ps3/download.ps3?to={to_path}&url={file_url}"
-            ) as response:
-                response.raise_for_status()
+        if self.limiter:
+            # Capped to this backend's maximum, the limiter may be shared with bigger ones
+            gate = self.limiter.slot(self, self.max_concurrent_downloads)
+        else:
+            gate = self.downloads_semaphore
+        async with gate:
+            with self.monitor.track(to_path, "send", from_path.stat().st_size) as record:
+                async with self.temp_route(
+                    from_path, on_served=lambda size: self.monitor.progress(record, size)
+                ) as route:
+                    # webMAN names the downloaded file after the last segment of the url
+                    file_url = route.url(to_path.name)
+                    # Both values are encoded, the url carries its own query separators
+                    query = f"to={quote(to_path.parent.resolve(), safe='/')}&url={quote(file_url, safe='')}"
+                    async with self.session.get(f"{self.webman_url}/download.ps3?{query}") as response:
+                        response.raise_for_status()
+                    await route.wait(timeout=self.download_timeout)
 
     async def get(self, from_path: PS3Path, to_path: Path):
-        raise NotImplementedError
+        assert self.session, "Not connected"
+        to_path = Path(to_path)
+        if to_path.is_dir():
+            to_path /= from_path.name
+        stat = await self.stat(from_path)
+        assert stat["type"] == "file", f"{from_path} is not a file"
+        size = stat["size"]
+        to_path.parent.mkdir(parents=True, exist_ok=True)
+        # Written next to the target and renamed once complete, a failed download never
+        # leaves a file of the right size that a later mirror would take as up to date
+        part_path = to_path.with_name(to_path.name + ".part")
+        with open(part_path, "wb") as f:
+            f.truncate(size or 0)
+        try:
+            with self.monitor.track(from_path, "get", size) as record:
+                if stat["accept_ranges"] and size and size >= 2 * self.min_part_size:
+                    part_count = min(self.parallel_parts, size // self.min_part_size)
+                    part_size = -(-size // part_count)
+                    parts = [
+                        asyncio.ensure_future(
+                            self._get_part(
+                                from_path, part_path, record, start, min(start + part_size, size)
+                            )
+                        )
+                        for start in range(0, size, part_size)
+                    ]
+                    try:
+                        await asyncio.gather(*parts)
+                    except BaseException:
+                        # The other ranges must stop writing before the part file goes
+                        for part in parts:
+                            part.cancel()
+                        await asyncio.gather(*parts, return_exceptions=True)
+                        raise
+                else:
+                    await self._get_part(from_path, part_path, record, 0)
+            os.replace(part_path, to_path)
+        except BaseException:
+            part_path.unlink(missing_ok=True)
+            raise
 
-    async def get_bytes(self, from_path: PS3Path):
-        raise NotImplementedError
+    async def _get_part(
+        self,
+        from_path: PS3Path,
+        to_path: Path,
+        record,
+        start: int,
+        end: int | None = None,
+    ):
+        headers = {"Range": f"bytes={start}-{end - 1}"} if end is not None else {}
+        async with self.session.get(
+            f"{self.webman_url}{from_path.resolve()}", headers=headers
+        ) as response:
+            response.raise_for_status()
+            if start and response.status != 206:
+                raise RuntimeError(f"The console ignored the range request for {from_path}")
+            with open(to_path, "r+b") as f:
+                f.seek(start)
+                async for chunk in response.content.iter_chunked(self.chunk_size):
+                    f.write(chunk)
+                    self.monitor.progress(record, len(chunk))
+
+    async def iter_chunks(self, from_path: PS3Path, chunk_size: int | None = None):
+        assert self.session, "Not connected"
+        async with self.session.get(f"{self.webman_url}{from_path.resolve()}") as response:
+            if response.status == 404:
+                raise FileNotFoundError(str(from_path))
+            response.raise_for_status()
+            with self.monitor.track(from_path, "get", response.content_length) as record:
+                async for chunk in response.content.iter_chunked(chunk_size or self.chunk_size):
+                    self.monitor.progress(record, len(chunk))
+                    yield chunk
 
     async def delete(self, path: PS3Path):
-        raise NotImplementedError
+        assert self.session, "Not connected"
+        async with self.session.get(
+            f"{self.webman_url}/delete.ps3{path.resolve()}"
+        ) as response:
+            response.raise_for_status()
 
     async def stat(self, path: PS3Path):
-        raise NotImplementedError
+        assert self.session, "Not connected"
+        # A one byte range tells both the size and whether ranges are honoured
+        async with self.session.get(
+            f"{self.webman_url}{path.resolve()}", headers={"Range": "bytes=0-0"}
+        ) as response:
+            if response.status == 404:
+                raise FileNotFoundError(str(path))
+            if response.status == 416:
+                # Empty files cannot satisfy any range
+                return {"type": "file", "size": 0, "accept_ranges": True}
+            response.raise_for_status()
+            if response.status == 206:
+                size = int(response.headers["Content-Range"].rsplit("/", 1)[-1])
+            else:
+                size = response.content_length
+            # webMAN answers directories with its html file browser
+            is_dir = response.content_type == "text/html" and not path.name.lower().endswith(
+                (".htm", ".html")
+            )
+            return {
+                "type": "dir" if is_dir else "file",
+                "size": None if is_dir else size,
+                "accept_ranges": response.status == 206,
+            }
+
+    async def size(self, path: PS3Path):
+        return (await self.stat(path))["size"]
+
+    async def listdir(self, path: PS3Path):
+        assert self.session, "Not connected"
+        async with self.session.get(f"{self.webman_url}{path.resolve()}") as response:
+            if response.status == 404:
+                raise FileNotFoundError(str(path))
+            response.raise_for_status()
+            # Parsed as it arrives, big folders are never held as a whole page
+            parser = commands.ListingParser()
+            async for chunk in response.content.iter_chunked(self.chunk_size):
+                parser.feed(chunk)
+            parser.close()
+        return [
+            RemoteEntry(
+                path / row["name"],
+                is_dir=row["is_dir"],
+                # Rounded sizes are left unknown so callers stat the file when it matters
+                size=row["size"] if row["size_exact"] else None,
+                mtime=row["mtime"],
+            )
+            for row in parser.pop_entries()
+        ]
 
     async def exists(self, path: PS3Path):
-        raise NotImplementedError
+        try:
+            await self.stat(path)
+            return True
+        except FileNotFoundError:
+            return False
 
     async def mkdir(self, path: PS3Path):
-        async with self.session.get(
-            f"http://{self.ps3_host}:{self.ps3_port}/mkdir.ps3/{path}"
-        ) as response:
+        async with self.session.get(f"{self.webman_url}/mkdir.ps3/{path}") as response:
             response.raise_for_status()
@@ -1,32 +1,133 @@
+import asyncio
+from pathlib import Path
+
 import fastapi
-from fastapi import Request, Response
+from fastapi import HTTPException
+from fastapi.responses import FileResponse
 import uvicorn
 
+
+class FileRoute:
+    """
+    A local file exposed to the console, it is never loaded in memory,
+    the console pulls it straight from the disk (with Range support)
+    """
+
+    def __init__(self, route_id: str, path: Path, on_served=None) -> None:
+        self.route_id = route_id
+        self.path = Path(path)
+        self.size = self.path.stat().st_size
+        self.served = 0
+        # Merged [start, end) byte ranges that a response sent completely
+        self.completed: list[tuple[int, int]] = []
+        self.done = asyncio.Event()
+        self.on_served = on_served
+
+    def add_served(self, size: int) -> None:
+        """
+        Progress only, aborted responses and ranges asked twice are counted as well
+        """
+        self.served += size
+        if self.on_served:
+            self.on_served(size)
+
+    def add_completed(self, start: int, end: int) -> None:
+        """
+        A response sent [start, end) entirely, the route is done once every byte was sent
+        """
+        merged = []
+        for range_start, range_end in sorted([*self.completed, (start, end)]):
+            if merged and range_start <= merged[-1][1]:
+                merged[-1] = (merged[-1][0], max(merged[-1][1], range_end))
+            else:
+                merged.append((range_start, range_end))
+        self.completed = merged
+        if self.completed[0][0] <= 0 and self.completed[0][1] >= self.size:
+            self.done.set()
+
+
+class FileRouteResponse(FileResponse):
+    def __init__(self, route: FileRoute, **kwargs) -> None:
+        super().__init__(route.path, **kwargs)
+        self.route = route
+
+    async def __call__(self, scope, receive, send):
+        status = None
+        content_range = None
+        sent = 0
+
+        async def tracking_send(message):
+            nonlocal status, content_range, sent
+            await send(message)
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                headers = {key.lower(): value for key, value in message.get("headers", [])}
+                content_range = headers.get(b"content-range")
+            elif message["type"] == "http.response.body":
+                size = len(message.get("body", b""))
+                sent += size
+                self.route.add_served(size)
+                if not message.get("more_body", False):
+                    self._completed(scope, status, content_range, sent)
+            elif message["type"] == "http.response.pathsend":
+                self.route.add_served(self.route.size)
+                self._completed(scope, status, content_range, None)
+
+        await super().__call__(scope, receive, tracking_send)
+
+    def _completed(self, scope, status, content_range, sent: int | None) -> None:
+        """
+        Records the ranges of a finished response, sent is None when the server sent the file itself
+        """
+        if status == 200:
+            if sent is None or sent == self.route.size:
+                self.route.add_completed(0, self.route.size)
+        elif status == 206 and content_range is not None:
+            # bytes start-end/size, end included
+            start, end = content_range.decode().split(" ", 1)[1].split("/", 1)[0].split("-")
+            if sent is None or sent == int(end) - int(start) + 1:
+                self.route.add_completed(int(start), int(end) + 1)
+        elif status == 206:
+            # multipart/byteranges, sent holds the part headers too, the response went through
+            headers = {key.lower(): value for key, value in scope.get("headers", [])}
+            for start, end in self._parse_range_header(
+                headers[b"range"].decode("latin-1"), self.route.size
+            ):
+                self.route.add_completed(start, end)
+
+
 app = fastapi.FastAPI()
 
-files:dict[str, bytes] = {}
+routes: dict[str, FileRoute] = {}
+
+
+def add_route(route: FileRoute) -> None:
+    routes[route.route_id] = route
+
+
+def remove_route(route: FileRoute) -> None:
+    routes.pop(route.route_id, None)
 
-@app.get("/{file_id}")
-async def get_file(file_id: str):
-    return Response(content=files[file_id], media_type="application/octet-stream")
 
-@app.put("/{file_id}")
-async def put_file(file_id: str, request: Request):
-    files[file_id] = await request.body()
-    return {"status": "ok"}
+@app.get("/{route_id}/{filename}")
+async def get_file(route_id: str, filename: str):
+    try:
+        route = routes[route_id]
+    except KeyError:
+        raise HTTPException(status_code=404)
+    return FileRouteResponse(
+        route, filename=filename, media_type="application/octet-stream"
+    )
 
-@app.delete("/{file_id}")
-async def delete_file(file_id: str):
-    del files[file_id]
-    return {"status": "ok"}
 
-def get_server(port):
+def get_server(port, host="0.0.0.0"):
     return uvicorn.Server(
         uvicorn.Config(
             app,
+            host=host,
             port=port,
             log_level="warning",
             access_log=False,
             lifespan="off",
         )
-    )
\ No newline at end of file
+    )
@@ -0,0 +1,123 @@
+import time
+from contextlib import contextmanager
+from typing import Callable
+
+
+class FileTransferRecord:
+    def __init__(self, path, direction: str, size: int | None = None) -> None:
+        self.path = path
+        self.direction = direction
+        self.size = size
+        self.transferred = 0
+        self.started_at = time.perf_counter()
+        self.ended_at = None
+        self.error = None
+
+    @property
+    def duration(self) -> float:
+        return (self.ended_at or time.perf_counter()) - self.started_at
+
+    @property
+    def throughput(self) -> float:
+        duration = self.duration
+        return self.transferred / duration if duration else 0.0
+
+    def __repr__(self) -> str:
+        return f"<FileTransfer {self.direction} {self.path}: {self.transferred}/{self.size} bytes in {self.duration:.3f}s>"
+
+
+class TransferMonitor:
+    """
+    Collects what the transfer backends are doing, callbacks are registered per event:
+    - file_start(record), file_end(record): record.error is set if the transfer failed
+    - progress(record, size): size is the amount of bytes moved since the last call
+    - retry(error): an operation is run again on the same connection
+    - reconnect(error): the connection was replaced, the operation is run again on the new one
+    """
+
+    EVENTS = ("file_start", "file_end", "progress", "retry", "reconnect")
+
+    def __init__(self) -> None:
+        self.callbacks: dict[str, list[Callable]] = {event: [] for event in self.EVENTS}
+        self.reset()
+
+    def reset(self) -> None:
+        self.started_at = None
+        self.bytes_transferred = 0
+        self.files_transferred = 0
+        self.files_failed = 0
+        self.retries = 0
+        self.reconnects = 0
+        self.active: set[FileTransferRecord] = set()
+
+    def on(self, event: str, callback: Callable) -> Callable:
+        assert event in self.EVENTS, f"Unknown event {event}, available events are: {self.EVENTS}"
+        self.callbacks[event].append(callback)
+        return callback
+
+    def emit(self, event: str, *args) -> None:
+        for callback in self.callbacks[event]:
+            callback(*args)
+
+    @property
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.started_at if self.started_at else 0.0
+
+    @property
+    def throughput(self) -> float:
+        elapsed = self.elapsed
+        return self.bytes_transferred / elapsed if elapsed else 0.0
+
+    def file_started(self, path, direction: str, size: int | None = None) -> FileTransferRecord:
+        if self.started_at is None:
+            self.started_at = time.perf_counter()
+        record = FileTransferRecord(path, direction, size)
+        self.active.add(record)
+        self.emit("file_start", record)
+        return record
+
+    def progress(self, record: FileTransferRecord, size: int) -> None:
+        record.transferred += size
+        self.bytes_transferred += size
+        self.emit("progress", record, size)
+
+    def file_finished(self, record: FileTransferRecord, error: BaseException | None = None) -> None:
+        record.ended_at = time.perf_counter()
+        record.error = error
+        self.active.discard(record)
+        if error is None:
+            self.files_transferred += 1
+        else:
+            self.files_failed += 1
+        self.emit("file_end", record)
+
+    @contextmanager
+    def track(self, path, direction: str, size: int | None = None):
+        record = self.file_started(path, direction, size)
+        try:
+            yield record
+        except BaseException as error:
+            self.file_finished(record, error)
+            raise
+        else:
+            self.file_finished(record)
+
+    def retried(self, error: BaseException | None = None) -> None:
+        self.retries += 1
+        self.emit("retry", error)
+
+    def reconnected(self, error: BaseException | None = None) -> None:
+        self.reconnects += 1
+        self.emit("reconnect", error)
+
+    def summary(self) -> dict:
+        return {
+            "files": self.files_transferred,
+            "failed": self.files_failed,
+            "bytes": self.bytes_transferred,
+            "seconds": self.elapsed,
+            "throughput": self.throughput,
+            # Every reconnect is followed by a retry
+            "retries": self.retries + self.reconnects,
+            "reconnects": self.reconnects,
+        }
@@ -0,0 +1,97 @@
+import asyncio
+from contextlib import asynccontextmanager
+from typing import Any, Awaitable, Callable
+
+
+class ConnectionPool:
+    """
+    A fixed set of authenticated sessions handed out one coroutine at a time,
+    a session that fails with a connection error is replaced by a fresh one
+    """
+
+    def __init__(
+        self,
+        open_connection: Callable[[], Awaitable[Any]],
+        close_connection: Callable[[Any], Awaitable[None]],
+        size: int,
+        broken_errors: tuple[type[BaseException], ...] = (OSError, asyncio.TimeoutError),
+        on_reconnect: Callable[[BaseException], None] | None = None,
+        limiter=None,
+    ) -> None:
+        assert size >= 1, "A pool needs at least one connection"
+        self.open_connection = open_connection
+        self.close_connection = close_connection
+        self.size = size
+        self.broken_errors = broken_errors
+        self.on_reconnect = on_reconnect
+        self.limiter = limiter  # Hands out fewer sessions than the pool holds when set
+        self.connections = []
+        self.idle: asyncio.Queue = asyncio.Queue()
+        self.recycling: set[asyncio.Task] = set()
+
+    async def open(self) -> None:
+        self.connections = list(
+            await asyncio.gather(*(self.open_connection() for _ in range(self.size)))
+        )
+        for connection in self.connections:
+            self.idle.put_nowait(connection)
+
+    async def close(self) -> None:
+        await asyncio.gather(*self.recycling, return_exceptions=True)
+        connections, self.connections = self.connections, []
+        self.idle = asyncio.Queue()
+        await asyncio.gather(
+            *(self.close_connection(connection) for connection in connections),
+            return_exceptions=True,
+        )
+
+    def __bool__(self) -> bool:
+        return bool(self.connections)
+
+    async def _replace(self, connection, error: BaseException):
+        try:
+            await self.close_connection(connection)
+        except Exception:
+            pass
+        try:
+            new_connection = await self.open_connection()
+        except Exception:
+            # Kept so the pool does not shrink, the next user will try again
+            return connection
+        if connection in self.connections:
+            self.connections[self.connections.index(connection)] = new_connection
+        if self.on_reconnect:
+            self.on_reconnect(error)
+        return new_connection
+
+    async def _recycle(self, connection, error: BaseException):
+        self.idle.put_nowait(await self._replace(connection, error))
+
+    @asynccontextmanager
+    async def acquire(self):
+        if self.limiter is None:
+            async with self._acquire() as connection:
+                yield connection
+        else:
+            # Capped to the pool size, the limiter may be shared with bigger pools
+            async with self.limiter.slot(self, self.size), self._acquire() as connection:
+                yield connection
+
+    @asynccontextmanager
+    async def _acquire(self):
+        connection = await self.idle.get()
+        try:
+            yield connection
+        except self.broken_errors as error:
+            connection = await self._replace(connection, error)
+            raise
+        except (asyncio.CancelledError, GeneratorExit) as error:
+            # An interrupted transfer leaves the session in an unknown state
+            task = asyncio.ensure_future(self._recycle(connection, error))
+            self.recycling.add(task)
+            task.add_done_callback(self.recycling.discard)
+            connection = None
+            raise
+        finally:
+            if connection is not None:
+                self.idle.put_nowait(connection)
@@ -0,0 +1,217 @@
+import os
+import zlib
+import struct
+import datetime
+from pathlib import Path
+
+
+LOCAL_HEADER = struct.Struct("<4sHHHHHIIIHH")
+LOCAL_HEADER_SIGNATURE = b"PK\x03\x04"
+CENTRAL_DIRECTORY_SIGNATURES = (b"PK\x01\x02", b"PK\x05\x06", b"PK\x06\x06")
+DATA_DESCRIPTOR_SIGNATURE = b"PK\x07\x08"
+
+FLAG_DATA_DESCRIPTOR = 0x08
+METHOD_STORED = 0
+METHOD_DEFLATED = 8
+
+
+class UnsupportedStream(Exception):
+    """The archive can be extracted, but not before it is fully received"""
+
+
+class ZipStreamExtractor:
+    """
+    Extracts a zip archive while it is being received, reading the local headers
+    instead of the central directory, only the current chunk is kept in memory.
+    Members are written relative to root, minus strip_prefix when they start with it
+    """
+
+    def __init__(self, root: Path, strip_prefixes: tuple[str, ...] = ()) -> None:
+        self.root = Path(root).resolve()
+        self.strip_prefixes = strip_prefixes
+        self.prefix = None  # Picked from the first member, applied to all of them
+        self.buffer = bytearray()
+        self.member = None
+        self.done = False
+        self.extracted: list[Path] = []
+
+    def feed(self, data: bytes) -> None:
+        self.buffer += data
+        try:
+            while not self.done and self._step():
+                pass
+        except BaseException:
+            self.abort()
+            raise
+
+    def close(self) -> None:
+        if not self.done:
+            self.abort()
+            raise EOFError("Truncated archive")
+
+    def abort(self) -> None:
+        """
+        Closes and removes the member being written, the members already extracted are kept
+        """
+        member, self.member = self.member, None
+        if member is not None and member["file"] is not None:
+            member["file"].close()
+            member["target"].unlink(missing_ok=True)
+
+    def _step(self) -> bool:
+        if self.member is None:
+            return self._read_header()
+        if self.member["descriptor_pending"]:
+            return self._read_descriptor()
+        return self._read_data()
+
+    def _read_header(self) -> bool:
+        if len(self.buffer) < 4:
+            return False
+        signature = bytes(self.buffer[:4])
+        if signature in CENTRAL_DIRECTORY_SIGNATURES:
+            self.done = True
+            return False
+        if signature != LOCAL_HEADER_SIGNATURE:
+            raise ValueError(f"Bad local header signature {signature!r}")
+        if len(self.buffer) < LOCAL_HEADER.size:
+            return False
+        (
+            _,
+            _,
+            flags,
+            method,
+            dos_time,
+            dos_date,
+            crc,
+            compressed_size,
+            _,
+            name_length,
+            extra_length,
+        ) = LOCAL_HEADER.unpack_from(self.buffer)
+        header_size = LOCAL_HEADER.size + name_length + extra_length
+        if len(self.buffer) < header_size:
+            return False
+        name = bytes(self.buffer[LOCAL_HEADER.size : LOCAL_HEADER.size + name_length]).decode(
+            "utf-8" if flags & 0x800 else "cp437"
+        )
+        del self.buffer[:header_size]
+
+        has_descriptor = bool(flags & FLAG_DATA_DESCRIPTOR)
+        if method not in (METHOD_STORED, METHOD_DEFLATED):
+            raise UnsupportedStream(f"Compression method {method} of {name}")
+        if has_descriptor and method == METHOD_STORED:
+            raise UnsupportedStream(f"{name} is stored with a trailing size")
+        if compressed_size == 0xFFFFFFFF:
+            raise UnsupportedStream(f"{name} is a zip64 member")
+
+        target = self._target(name)
+        file = None
+        if target is not None and not name.endswith("/"):
+            target.parent.mkdir(parents=True, exist_ok=True)
+            file = open(target, "wb")
+        elif target is not None:
+            target.mkdir(parents=True, exist_ok=True)
+        self.member = {
+            "name": name,
+            "target": target,
+            "file": file,
+            "remaining": None if has_descriptor else compressed_size,
+            "decompressor": zlib.decompressobj(-15) if method == METHOD_DEFLATED else None,
+            "crc": 0,
+            "expected_crc": None if has_descriptor else crc,
+            "descriptor_pending": False,
+            "has_descriptor": has_descriptor,
+            "timestamp": self._dos_timestamp(dos_date, dos_time),
+        }
+        return True
+
+    def _target(self, name: str) -> Path | None:
+        if self.prefix is None:
+            self.prefix = next(
+                (prefix for prefix in self.strip_prefixes if name.startswith(prefix)), ""
+            )
+        if name.startswith(self.prefix):
+            name = name[len(self.prefix) :]
+        if not name.strip("/"):
+            return None
+        target = (self.root / name).resolve()
+        if not target.is_relative_to(self.root):
+            raise ValueError(f"Unsafe path in archive: {name}")
+        return target
+
+    def _read_data(self) -> bool:
+        member = self.member
+        if member["remaining"] is not None:
+            size = min(len(self.buffer), member["remaining"])
+            if member["remaining"] and not size:
+                return False
+            data = bytes(self.buffer[:size])
+            del self.buffer[:size]
+            member["remaining"] -= size
+            self._write(member["decompressor"].decompress(data) if member["decompressor"] else data)
+            if member["remaining"]:
+                return False
+            if member["decompressor"]:
+                self._write(member["decompressor"].flush())
+            self._finish()
+            return True
+
+        # Deflated with a data descriptor: the end is found by the decompressor itself
+        if not self.buffer:
+            return False
+        decompressor = member["decompressor"]
+        data = bytes(self.buffer)
+        self.buffer.clear()
+        self._write(decompressor.decompress(data))
+        if not decompressor.eof:
+            return False
+        self.buffer[:0] = decompressor.unused_data
+        member["descriptor_pending"] = True
+        return True
+
+    def _read_descriptor(self) -> bool:
+        has_signature = self.buffer[:4] == DATA_DESCRIPTOR_SIGNATURE
+        size = 16 if has_signature else 12
+        if len(self.buffer) < size:
+            return False
+        offset = 4 if has_signature else 0
+        (self.member["expected_crc"],) = struct.unpack_from("<I", self.buffer, offset)
+        del self.buffer[:size]
+        self._finish()
+        return True
+
+    def _write(self, data: bytes) -> None:
+        if not data:
+            return
+        self.member["crc"] = zlib.crc32(data, self.member["crc"])
+        if self.member["file"] is not None:
+            self.member["file"].write(data)
+
+    def _finish(self) -> None:
+        member = self.member
+        if member["file"] is None:
+            self.member = None
+            return
+        if member["crc"] != member["expected_crc"]:
+            # Left to abort, the corrupt file is removed with it
+            raise zlib.error(f"CRC mismatch for {member['name']}")
+        self.member = None
+        member["file"].close()
+        if member["timestamp"] is not None:
+            os.utime(member["target"], (member["timestamp"], member["timestamp"]))
+        self.extracted.append(member["target"])
+
+    @staticmethod
+    def _dos_timestamp(dos_date: int, dos_time: int) -> float | None:
+        try:
+            return datetime.datetime(
+                (dos_date >> 9) + 1980,
+                (dos_date >> 5) & 0xF,
+                dos_date & 0x1F,
+                dos_time >> 11,
+                (dos_time >> 5) & 0x3F,
+                (dos_time & 0x1F) * 2,
+            ).timestamp()
+        except ValueError:
+            return None
@@ -1,10 +1,20 @@
+import time
+import hashlib
 import asyncio
+import threading
 
-from typing import TYPE_CHECKING
+from pathlib import Path
+from typing import TYPE_CHECKING, AsyncIterator
 from collections import OrderedDict
+from urllib.parse import urlparse
+
+import requests
 
 from . import commands
 from .user import User
+from .remote_file import PS3RemoteFile
+from .console_files import ConsoleFileOperations, RemoteEntry
+from .xregistry import XRegistry
 from .xmb.item_factory import XMBFactory
 
 from .structs import (
@@ -23,9 +33,28 @@ if TYPE_CHECKING:
     from .xmb.xmb import XMB
 
 
-class PS3:
-    def __init__(self, url) -> None:
+XREGISTRY_PATH = PS3Path("dev_flash2/etc/xRegistry.sys")
+ACCOUNT_ID_KEY = "/setting/user/{user_id}/npaccount/accountid"
+
+
+class PS3(ConsoleFileOperations):
+    def __init__(
+        self,
+        url,
+        cache_ttl: float | None = None,
+        registry_cache_folder: Path | str | None = None,
+    ) -> None:
         self.url = url.rstrip("/")
+        # Directory listings are kept cache_ttl seconds when set
+        self.cache_ttl = cache_ttl
+        self.listing_cache: dict[str, tuple[float, list[dict]]] = {}
+        # One folder per console, the registry is only downloaded again once it changed
+        self.registry_cache_folder = (
+            Path(registry_cache_folder)
+            if registry_cache_folder is not None
+            else Path.home() / ".cache" / "ps3_lib"
+        ) / urlparse(self.url).netloc.replace(":", "_")
+        self.registry: tuple[str | None, XRegistry] | None = None
 
     def set_led_color(
         self, color: PS3_LED_COLORS, mode: PS3_LED_MODES, clean: bool = True
@@ -92,6 +121,12 @@ class PS3:
         response = commands.get(self.url, str(PS3Path(path)))
         return response.content
 
+    def open_file(self, path: str | PS3Path, **kwargs) -> PS3RemoteFile:
+        """
+        Random access to a file without downloading it, e.g. SFO.from_buffer(ps3.open_file(path))
+        """
+        return PS3RemoteFile.from_http(self.url, path, **kwargs)
+
     def get_uptime(self):
         return commands.uptime(self.url)
 
@@ -208,8 +243,246 @@ class PS3:
         )
 
     def listdir(self, path: PS3Path):
-        for file in commands.listdir(self.url, str(path)):
-            yield path / file
+        # Streamed, entries are yielded while the page is still loading
+        for entry in commands.iter_listing(self.url, str(path)):
+            yield self._listed_path(path, entry)
+
+    @staticmethod
+    def _listed_path(folder: PS3Path, entry: dict) -> PS3Path:
+        # Rounded sizes are left unknown, as in the transfer backends
+        size = entry["size"] if entry["size_exact"] else None
+        return PS3Path(folder / entry["name"], is_directory=entry["is_dir"], size=size)
+
+    async def iter_listdir(
+        self, path: str | PS3Path, chunk_size=16 * 1024, buffer_batches=16
+    ) -> AsyncIterator[PS3Path]:
+        """
+        Async listdir, entries are yielded as the page is parsed, with their type and listed size
+        (None when webMAN rounded it)
+        """
+        path = PS3Path(path)
+        key = str(path)
+        if self.cache_ttl is not None and key in self.listing_cache:
+            cached_at, entries = self.listing_cache[key]
+            if time.monotonic() - cached_at < self.cache_ttl:
+                for entry in entries:
+                    yield self._listed_path(path, entry)
+                return
+
+        loop = asyncio.get_running_loop()
+        queue: asyncio.Queue = asyncio.Queue(buffer_batches)
+        stop = threading.Event()
+        end = object()
+
+        def produce():
+            # The queue is bounded, a slow consumer pauses the download
+            item = end
+            try:
+                for batch in commands.iter_listing_batches(self.url, key, chunk_size=chunk_size):
+                    if stop.is_set():
+                        return
+                    asyncio.run_coroutine_threadsafe(queue.put(batch), loop).result()
+            except Exception as error:
+                item = error
+            asyncio.run_coroutine_threadsafe(queue.put(item), loop).result()
+
+        producer = loop.run_in_executor(None, produce)
+        entries = []
+        try:
+            while (batch := await queue.get()) is not end:
+                if isinstance(batch, Exception):
+                    raise batch
+                entries += batch
+                for entry in batch:
+                    yield self._listed_path(path, entry)
+            if self.cache_ttl is not None:
+                self.listing_cache[key] = (time.monotonic(), entries)
+        finally:
+            stop.set()
+            while not producer.done():
+                while not queue.empty():
+                    queue.get_nowait()
+                await asyncio.wait([producer], timeout=0.05)
+
+    def clear_cache(self) -> None:
+        self.listing_cache.clear()
+
+    async def list_entries(self, path: str | PS3Path) -> list[dict]:
+        """
+        Parsed rows of a folder listing (name, is_dir, size, size_exact, mtime),
+        served from the listing cache when it is enabled and fresh
+        """
+        key = str(PS3Path(path))
+        if self.cache_ttl is not None and key in self.listing_cache:
+            cached_at, entries = self.listing_cache[key]
+            if time.monotonic() - cached_at < self.cache_ttl:
+                return entries
+        entries = await asyncio.to_thread(commands.listdir_entries, self.url, key)
+        if self.cache_ttl is not None:
+            self.listing_cache[key] = (time.monotonic(), entries)
+        return entries
+
+    async def walk(
+        self, top: str | PS3Path, max_concurrency=8, onerror=None
+    ) -> AsyncIterator[tuple[PS3Path, list[str], list[str]]]:
+        """
+        Async os.walk: yields (folder, folder names, file names) as listings arrive,
+        up to max_concurrency folders are listed at once so the order is not deterministic.
+        Like os.walk, removing names from the yielded folder names prunes the walk,
+        and folders that cannot be listed are skipped after passing the error to onerror
+        """
+        semaphore = asyncio.Semaphore(max_concurrency)
+
+        async def list_folder(folder: PS3Path):
+            async with semaphore:
+                return folder, await self.list_entries(folder)
+
+        pending = {asyncio.ensure_future(list_folder(PS3Path(top)))}
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    try:
+                        folder, entries = task.result()
+                    except Exception as error:
+                        # Unreachable folder or unreadable listing, like os.walk the rest goes on
+                        if onerror is not None:
+                            onerror(error)
+                        continue
+                    folder_names = [entry["name"] for entry in entries if entry["is_dir"]]
+                    file_names = [entry["name"] for entry in entries if not entry["is_dir"]]
+                    yield folder, folder_names, file_names
+                    pending |= {
+                        asyncio.ensure_future(list_folder(folder / name)) for name in folder_names
+                    }
+        finally:
+            for task in pending:
+                task.cancel()
+
+    @property
+    def webman_url(self) -> str:
+        return self.url
+
+    async def _list_folder(self, path: PS3Path) -> list[RemoteEntry]:
+        try:
+            entries = await self.list_entries(path)
+        except requests.HTTPError as error:
+            if error.response is not None and error.response.status_code == 404:
+                raise FileNotFoundError(path) from error
+            raise
+        return [
+            RemoteEntry(
+                path / entry["name"],
+                is_dir=entry["is_dir"],
+                size=entry["size"] if entry["size_exact"] else None,
+                mtime=entry["mtime"],
+            )
+            for entry in entries
+        ]
+
+    async def _file_size(self, path: PS3Path) -> int:
+        return await asyncio.to_thread(lambda: self.open_file(path).size)
+
+    def _forget_cached_stats(self) -> None:
+        self.clear_cache()
+
+    def exists(self, path: str | PS3Path) -> bool:
+        """
+        Whether webMAN lists path in its folder, failing listings are raised instead of telling
+        """
+        path = PS3Path(path)
+        try:
+            siblings = commands.listdir_entries(self.url, str(path.parent))
+        except requests.HTTPError as error:
+            if error.response is not None and error.response.status_code == 404:
+                return False
+            raise
+        return any(entry["name"] == path.name for entry in siblings)
+
+    async def copy(
+        self, from_path: str | PS3Path, to_path: str | PS3Path, timeout=600, poll_interval=1
+    ):
+        await super().copy(PS3Path(from_path), PS3Path(to_path), timeout, poll_interval)
+
+    async def move(
+        self, from_path: str | PS3Path, to_path: str | PS3Path, timeout=600, poll_interval=1
+    ):
+        await super().move(PS3Path(from_path), PS3Path(to_path), timeout, poll_interval)
+
+    async def delete(self, path: str | PS3Path, timeout=600, poll_interval=1):
+        """
+        Deletes a file or a folder recursively, returns once it is gone
+        """
+        await self.delete_tree(PS3Path(path), timeout, poll_interval)
+
+    def _registry_signature(self) -> str | None:
+        """
+        MD5 of the console registry computed by webMAN, None when webMAN cannot hash files.
+        The registry has a fixed size and a minute precise mtime, only its content tells a change
+        """
+        try:
+            return commands.md5(self.url, str(XREGISTRY_PATH), timeout=60)
+        except (requests.HTTPError, ValueError):
+            return None
+
+    def _load_cached_registry(self, signature: str) -> XRegistry | None:
+        try:
+            data = (self.registry_cache_folder / XREGISTRY_PATH.name).read_bytes()
+        except OSError:
+            return None
+        if hashlib.md5(data).hexdigest() != signature:
+            return None
+        return XRegistry.from_bytes(data)
+
+    def _store_cached_registry(self, data: bytes) -> None:
+        self.registry_cache_folder.mkdir(parents=True, exist_ok=True)
+        (self.registry_cache_folder / XREGISTRY_PATH.name).write_bytes(data)
+
+    def get_registry(self, refresh=False) -> XRegistry:
+        """
+        The console xRegistry.sys, kept in memory and on disk and only downloaded again
+        when the MD5 webMAN computes on the console no longer matches.
+        Without md5.ps3 the cache cannot be trusted and it is always downloaded
+        """
+        signature = self._registry_signature()
+        trusted = not refresh and signature is not None
+        if trusted and self.registry is not None and self.registry[0] == signature:
+            return self.registry[1]
+        registry = self._load_cached_registry(signature) if trusted else None
+        if registry is None:
+            data = self.get_file(XREGISTRY_PATH)
+            registry = XRegistry.from_bytes(data)
+            self._store_cached_registry(data)
+        self.registry = (signature, registry)
+        return registry
+
+    def get_registry_value(self, key: str, default=None, cache=True):
+        """
+        One registry value, from the cached registry (refreshed if needed) or,
+        with cache=False, read from the console only as far as the key
+        """
+        if cache:
+            return self.get_registry().get_value(key, default)
+        with self.open_file(XREGISTRY_PATH) as f:
+            return XRegistry.find_values(f, [key]).get(key, default)
+
+    def get_account_ids(self) -> dict[str, bytes]:
+        """
+        User id -> account id of every user of the console, blank for users never signed in to PSN
+        """
+        prefix, _, suffix = ACCOUNT_ID_KEY.partition("{user_id}")
+        return {
+            key[len(prefix) : -len(suffix)]: value
+            for key, value in self.get_registry().query(prefix).items()
+            if key.endswith(suffix)
+        }
+
+    def get_account_id(self, user_id: str | None = None, cache=True) -> bytes | None:
+        """
+        Account id of a user, the current one by default, None if the registry has none
+        """
+        user_id = user_id or self.get_current_user_id()
+        return self.get_registry_value(ACCOUNT_ID_KEY.format(user_id=user_id), cache=cache)
 
     @property
     def users(self):
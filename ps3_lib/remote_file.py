@@ -0,0 +1,228 @@
+import io
+import ftplib
+from collections import OrderedDict
+from typing import Callable
+
+import requests
+
+from .structs import PS3Path
+
+
+class PS3RemoteFile(io.RawIOBase):
+    """
+    Read only, seekable view of a file on the console, only the blocks that are read are fetched.
+    Blocks are kept in a fixed size LRU cache, sequential reads grow a readahead window
+    so a parser walking the file costs a few requests instead of one per read
+    """
+
+    def __init__(
+        self,
+        read_range: Callable[[int, int], bytes],
+        size: int,
+        name: str = "",
+        block_size=16 * 1024,
+        cache_blocks=64,
+        max_readahead_blocks=16,
+        on_close: Callable[[], None] | None = None,
+    ) -> None:
+        super().__init__()
+        self.read_range = read_range
+        self.size = size
+        self.name = name
+        self.block_size = block_size
+        self.cache_blocks = cache_blocks
+        self.max_readahead_blocks = max_readahead_blocks
+        self.on_close = on_close
+        self.position = 0
+        self.blocks: OrderedDict[int, bytes] = OrderedDict()
+        self.readahead_blocks = 0
+        self.last_fetched_block = None
+        self.requests = 0
+        self.bytes_fetched = 0
+
+    def __repr__(self) -> str:
+        return f"<PS3RemoteFile {self.name} ({self.size} bytes, {len(self.blocks)} blocks cached)>"
+
+    @classmethod
+    def from_http(cls, url: str, path: PS3Path | str, timeout=10, **kwargs) -> "PS3RemoteFile":
+        """
+        Reads through webMAN with Range requests
+        """
+        session = requests.Session()
+        file_url = f"{url.rstrip('/')}{PS3Path(path).resolve()}"
+
+        def get(start: int, end: int) -> requests.Response:
+            response = session.get(file_url, headers={"Range": f"bytes={start}-{end}"}, timeout=timeout)
+            if response.status_code == 404:
+                raise FileNotFoundError(path)
+            return response
+
+        # Set when the server ignores ranges, the whole file came back and reads are served from it
+        body = None
+        response = get(0, 0)
+        if response.status_code == 416:
+            size = 0
+        else:
+            response.raise_for_status()
+            if response.status_code == 206:
+                size = int(response.headers["Content-Range"].rpartition("/")[2])
+            else:
+                body = response.content
+                size = len(body)
+
+        def read_range(offset: int, size: int) -> bytes:
+            nonlocal body
+            if body is None:
+                response = get(offset, offset + size - 1)
+                response.raise_for_status()
+                if response.status_code == 206:
+                    return response.content
+                body = response.content
+            return body[offset : offset + size]
+
+        return cls(read_range, size, name=str(path), on_close=session.close, **kwargs)
+
+    @classmethod
+    def from_ftp(
+        cls, host: str, path: PS3Path | str, port=21, username=None, password=None, timeout=10, **kwargs
+    ) -> "PS3RemoteFile":
+        """
+        Reads over FTP, every range is a RETR resumed at its offset with REST
+        """
+        remote_path = PS3Path(path).resolve()
+        session: dict[str, ftplib.FTP | None] = {"ftp": None}
+
+        def open_session() -> ftplib.FTP:
+            ftp = ftplib.FTP()
+            ftp.connect(host, port, timeout=timeout)
+            ftp.login(username or "anonymous", password or "")
+            ftp.voidcmd("TYPE I")
+            session["ftp"] = ftp
+            return ftp
+
+        ftp = open_session()
+        try:
+            size = cls._ftp_size(ftp, remote_path)
+        except ftplib.error_perm as e:
+            ftp.close()
+            raise FileNotFoundError(path) from e
+
+        def read_range(offset: int, size: int) -> bytes:
+            ftp = session["ftp"] or open_session()
+            data = bytearray()
+            with ftp.transfercmd(f"RETR {remote_path}", rest=offset) as connection:
+                while len(data) < size:
+                    chunk = connection.recv(min(size - len(data), 64 * 1024))
+                    if not chunk:
+                        break
+                    data += chunk
+            try:
+                ftp.voidresp()
+            except (ftplib.error_temp, ftplib.error_perm):
+                # The transfer was cut before the end of the file
+                pass
+            except (EOFError, OSError):
+                # Some servers drop the whole session instead, the next read opens a new one
+                ftp.close()
+                session["ftp"] = None
+            return bytes(data)
+
+        def close():
+            ftp = session["ftp"]
+            if ftp is None:
+                return
+            try:
+                ftp.quit()
+            except (OSError, EOFError, ftplib.Error):
+                ftp.close()
+
+        return cls(read_range, size, name=str(path), on_close=close, **kwargs)
+
+    @staticmethod
+    def _ftp_size(ftp: ftplib.FTP, path: str) -> int:
+        try:
+            return ftp.size(path)
+        except ftplib.error_perm as e:
+            if not str(e).startswith(("500", "502")):
+                raise
+        # SIZE is not implemented by every server, MLST tells it as well
+        facts = ftp.sendcmd(f"MLST {path}").splitlines()[1].strip().split(";")
+        return int(next(fact for fact in facts if fact.lower().startswith("size=")).partition("=")[2])
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def tell(self) -> int:
+        return self.position
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        if whence == io.SEEK_SET:
+            position = offset
+        elif whence == io.SEEK_CUR:
+            position = self.position + offset
+        elif whence == io.SEEK_END:
+            position = self.size + offset
+        else:
+            raise ValueError(f"Invalid whence ({whence})")
+        if position < 0:
+            raise ValueError(f"Negative seek position {position}")
+        self.position = position
+        return position
+
+    def readinto(self, buffer) -> int:
+        view = memoryview(buffer).cast("B")
+        size = min(len(view), max(self.size - self.position, 0))
+        written = 0
+        last_needed = (self.position + size - 1) // self.block_size
+        while written < size:
+            index, offset = divmod(self.position, self.block_size)
+            block = self._block(index, last_needed)
+            chunk = block[offset : offset + size - written]
+            if not chunk:
+                # The file shrank since its size was read
+                break
+            view[written : written + len(chunk)] = chunk
+            written += len(chunk)
+            self.position += len(chunk)
+        return written
+
+    def _block(self, index: int, last_needed: int) -> bytes:
+        if index in self.blocks:
+            self.blocks.move_to_end(index)
+            return self.blocks[index]
+        if self.last_fetched_block is not None and index == self.last_fetched_block + 1:
+            self.readahead_blocks = min(max(self.readahead_blocks * 2, 1), self.max_readahead_blocks)
+        else:
+            self.readahead_blocks = 0
+        # What the read needs in one request, then the readahead earned by sequential reads
+        last_block = min(
+            last_needed + self.readahead_blocks,
+            (self.size - 1) // self.block_size,
+            index + self.cache_blocks - 1,
+        )
+        count = 1
+        while index + count <= last_block and index + count not in self.blocks:
+            count += 1
+        self._fetch(index, count)
+        return self.blocks[index]
+
+    def _fetch(self, index: int, count: int) -> None:
+        offset = index * self.block_size
+        data = self.read_range(offset, min(count * self.block_size, self.size - offset))
+        self.requests += 1
+        self.bytes_fetched += len(data)
+        for i in range(count):
+            self.blocks[index + i] = data[i * self.block_size : (i + 1) * self.block_size]
+            self.blocks.move_to_end(index + i)
+        self.last_fetched_block = index + count - 1
+        while len(self.blocks) > self.cache_blocks:
+            self.blocks.popitem(last=False)
+
+    def close(self) -> None:
+        if not self.closed and self.on_close:
+            self.on_close()
+        self.blocks.clear()
+        super().close()
@@ -1,22 +1,65 @@
 import io
+import mmap
+import struct
 from pathlib import Path
 from typing import Iterable
 
-from pydantic import BaseModel, ConfigDict
-
 SFO_MAGIC = 0x46535000
 SFO_VERSION = 0x0101  # Version 1.1
 
 SFO_ACCOUNT_ID_SIZE = 16
 SFO_PSID_SIZE = 16
 
+SFO_FORMAT_UTF8_SPECIAL = 0x0004  # Raw bytes
+SFO_FORMAT_UTF8 = 0x0204  # NUL terminated string
+SFO_FORMAT_INT32 = 0x0404
+
+# Bound to the account the SFO was made for, what a template provides
+SFO_ACCOUNT_KEYS = ("ACCOUNT_ID", "ACCOUNTID", "PARAMS")
+SFO_TITLE_KEYS = ("TITLE", "SUB_TITLE")
+SFO_DETAIL_KEYS = ("DETAIL",)
+
+# The version is read on 2 bytes but written on 4, the 2 bytes after it are padding
+SFO_HEADER_READ_STRUCT = struct.Struct("<IH2xIII")
+SFO_HEADER_STRUCT = struct.Struct("<IIIII")
+SFO_INDEX_TABLE_ENTRY_STRUCT = struct.Struct("<HHIII")
+
+SFO_PARAM_LENGTH_STRUCT = struct.Struct("<I")
+SFO_PARAM_LENGTH_OFFSET = 4  # Within an index table entry
+
+SFO_HEADER_SIZE = SFO_HEADER_STRUCT.size
+SFO_INDEX_TABLE_ENTRY_SIZE = SFO_INDEX_TABLE_ENTRY_STRUCT.size
+
+
+def _align(value: int, alignment=4) -> int:
+    return -(-value // alignment) * alignment
+
+
+class SFOHeader:
+    __slots__ = (
+        "magic",
+        "version",
+        "key_table_offset",
+        "data_table_offset",
+        "num_entries",
+    )
+
+    def __init__(
+        self,
+        magic: int,
+        version: int,
+        key_table_offset: int,
+        data_table_offset: int,
+        num_entries: int,
+    ):
+        self.magic = magic
+        self.version = version
+        self.key_table_offset = key_table_offset
+        self.data_table_offset = data_table_offset
+        self.num_entries = num_entries
 
-class SFOHeader(BaseModel):
-    magic: int
-    version: int
-    key_table_offset: int
-    data_table_offset: int
-    num_entries: int
+    def __repr__(self) -> str:
+        return f"<SFOHeader V{hex(self.version)}: {self.num_entries} entries>"
 
     @classmethod
     def from_bytes(cls, data: bytes) -> "SFOHeader":
@@ -34,25 +77,34 @@ class SFOHeader(BaseModel):
     @staticmethod
     def _unpack(data: bytes) -> tuple[int, int, int, int, int]:
         # Unpack the bytes according to the SFO header structure
-        return (
-            int.from_bytes(data[0:4], "little"),
-            int.from_bytes(data[4:6], "little"),
-            int.from_bytes(data[8:12], "little"),
-            int.from_bytes(data[12:16], "little"),
-            int.from_bytes(data[16:20], "little"),
+        return SFO_HEADER_READ_STRUCT.unpack_from(data)
+
+    def pack_into(self, buffer: bytearray, offset=0) -> None:
+        SFO_HEADER_STRUCT.pack_into(
+            buffer,
+            offset,
+            self.magic,
+            self.version,
+            self.key_table_offset,
+            self.data_table_offset,
+            self.num_entries,
         )
 
     def __bytes__(self) -> bytes:
-        return (
-            self.magic.to_bytes(4, "little")
-            + self.version.to_bytes(4, "little")
-            + self.key_table_offset.to_bytes(4, "little")
-            + self.data_table_offset.to_bytes(4, "little")
-            + self.num_entries.to_bytes(4, "little")
-        )
+        buffer = bytearray(SFO_HEADER_SIZE)
+        self.pack_into(buffer)
+        return bytes(buffer)
 
 
 class SFOIndexTableEntry:
+    __slots__ = (
+        "key_offset",
+        "param_format",
+        "param_length",
+        "param_max_length",
+        "data_offset",
+    )
+
     def __init__(
         self,
         key_offset: int,
@@ -82,29 +134,46 @@ class SFOIndexTableEntry:
 
     @staticmethod
     def _unpack(data: bytes) -> tuple[int, int, int, int, int]:
-        # Unpack the bytes according to the SFO index table entry structure
-        return (
-            int.from_bytes(data[0:2], "little"),  # key_offset
-            int.from_bytes(data[2:4], "little"),  # param_format
-            int.from_bytes(data[4:8], "little"),  # param_length
-            int.from_bytes(data[8:12], "little"),  # param_max_length
-            int.from_bytes(data[12:16], "little"),  # data_offset
+        # key_offset, param_format, param_length, param_max_length, data_offset
+        return SFO_INDEX_TABLE_ENTRY_STRUCT.unpack_from(data)
+
+    def pack_into(self, buffer: bytearray, offset=0) -> None:
+        SFO_INDEX_TABLE_ENTRY_STRUCT.pack_into(
+            buffer,
+            offset,
+            self.key_offset,
+            self.param_format,
+            self.param_length,
+            self.param_max_length,
+            self.data_offset,
         )
 
     def __bytes__(self) -> bytes:
-        return (
-            self.key_offset.to_bytes(2, "little")
-            + self.param_format.to_bytes(2, "little")
-            + self.param_length.to_bytes(4, "little")
-            + self.param_max_length.to_bytes(4, "little")
-            + self.data_offset.to_bytes(4, "little")
-        )
+        buffer = bytearray(SFO_INDEX_TABLE_ENTRY_SIZE)
+        self.pack_into(buffer)
+        return bytes(buffer)
 
 
-class SFOIndexTable(BaseModel):
-    model_config = ConfigDict(arbitrary_types_allowed=True)
+class SFOIndexTable:
+    __slots__ = ("entries",)
 
-    entries: list[SFOIndexTableEntry]
+    def __init__(self, entries: list[SFOIndexTableEntry]):
+        self.entries = entries
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "SFOIndexTable":
+        # The whole table in a single pass
+        return cls(
+            entries=[
+                SFOIndexTableEntry(*fields)
+                for fields in SFO_INDEX_TABLE_ENTRY_STRUCT.iter_unpack(data)
+            ]
+        )
+
+    def pack_into(self, buffer: bytearray, offset=0) -> None:
+        for entry in self.entries:
+            entry.pack_into(buffer, offset)
+            offset += SFO_INDEX_TABLE_ENTRY_SIZE
 
     def __iter__(self):
         return iter(self.entries)
@@ -113,22 +182,85 @@ class SFOIndexTable(BaseModel):
         return len(self.entries)
 
     def __bytes__(self) -> bytes:
-        return b"".join(bytes(entry) for entry in self.entries)
+        buffer = bytearray(SFO_INDEX_TABLE_ENTRY_SIZE * len(self.entries))
+        self.pack_into(buffer)
+        return bytes(buffer)
 
     def __getitem__(self, index: int) -> SFOIndexTableEntry:
         return self.entries[index]
 
 
-class SFOEntry(BaseModel):
-    model_config = ConfigDict(arbitrary_types_allowed=True)
+class SFOEntry:
+    """
+    A parameter of an SFO, only offsets are kept when parsing,
+    the key and the value are read from the SFO data the first time they are accessed
+    """
+
+    __slots__ = (
+        "related_index_table_entry",
+        "_data",
+        "_key_start",
+        "_key_end",
+        "_value_start",
+        "_key",
+        "_value",
+    )
+
+    def __init__(
+        self,
+        key: str | None = None,
+        value: bytes | None = None,
+        related_index_table_entry: SFOIndexTableEntry | None = None,
+        data: memoryview | None = None,
+        key_start=0,
+        key_end=0,
+        value_start=0,
+    ):
+        self.related_index_table_entry = related_index_table_entry
+        self._data = data
+        self._key_start = key_start
+        self._key_end = key_end
+        self._value_start = value_start
+        self._key = key
+        self._value = value
+
+    @property
+    def key(self) -> str:
+        if self._key is None:
+            # Keys are NUL terminated, the key table end bounds the search
+            key = bytes(self._data[self._key_start : self._key_end])
+            self._key = key.partition(b"\x00")[0].decode("utf-8")
+        return self._key
+
+    @property
+    def value(self) -> bytes:
+        if self._value is None:
+            end = self._value_start + self.related_index_table_entry.param_length
+            self._value = bytes(self._data[self._value_start : end])
+        return self._value
 
-    key: str
-    value: bytes
-    format: int = None
-    length: int = None
-    max_length: int = None
-    actual_length: int = None
-    related_index_table_entry: SFOIndexTableEntry = None
+    @value.setter
+    def value(self, value: bytes) -> None:
+        self._value = bytes(value)
+
+    @property
+    def format(self) -> int | None:
+        entry = self.related_index_table_entry
+        return entry.param_format if entry else None
+
+    @property
+    def length(self) -> int | None:
+        entry = self.related_index_table_entry
+        return entry.param_length if entry else None
+
+    @property
+    def max_length(self) -> int | None:
+        entry = self.related_index_table_entry
+        return entry.param_max_length if entry else None
+
+    @property
+    def actual_length(self) -> int:
+        return len(self.value)
 
     def __repr__(self) -> str:
         return f"<SFOParam: {self.key}={self.value}>"
@@ -139,11 +271,26 @@ class SFOEntry(BaseModel):
 
 class SFO:
     def __init__(
-        self, header: SFOHeader, index_table: SFOIndexTable, params: list[SFOEntry]
+        self,
+        header: SFOHeader,
+        index_table: SFOIndexTable,
+        params: list[SFOEntry] | None = None,
+        data: memoryview | None = None,
     ) -> None:
         self.header = header
         self.index_table = index_table
-        self.params = params
+        self._params = params
+        self._data = data
+        self._index: dict[str, SFOEntry] | None = None
+
+    @classmethod
+    def new(cls, version=SFO_VERSION) -> "SFO":
+        key_table_offset = SFO_HEADER_SIZE
+        return cls(
+            SFOHeader(SFO_MAGIC, version, key_table_offset, key_table_offset, 0),
+            SFOIndexTable(entries=[]),
+            params=[],
+        )
 
     @classmethod
     def read(cls, value) -> "SFO":
@@ -151,55 +298,121 @@ class SFO:
             return cls.from_bytes(value)
         elif isinstance(value, Path) or isinstance(value, str):
             return cls.from_file(value)
-        elif isinstance(value, io.BytesIO):
+        elif isinstance(value, io.IOBase):
             return cls.from_buffer(value)
+        elif isinstance(value, (bytearray, memoryview)):
+            return cls.from_view(value)
         else:
             raise TypeError(f"Invalid type: {type(value)}")
 
     @classmethod
     def from_bytes(cls, data: bytes) -> "SFO":
-        return cls.from_buffer(io.BytesIO(data))
+        return cls.from_view(data)
 
     @classmethod
     def from_file(cls, file: Path | str) -> "SFO":
+        # Read whole rather than mapped, the file is usually rewritten in place right after
         with open(file, "rb") as f:
-            return cls.from_buffer(f)
+            return cls.from_view(f.read())
 
     from_path = from_file
 
     @classmethod
-    def from_buffer(cls, buffer: io.BytesIO) -> "SFO":
-        header = SFOHeader.from_bytes(buffer.read(20))
-        index_table = SFOIndexTable(
-            entries=[
-                SFOIndexTableEntry.from_bytes(buffer.read(16))
-                for _ in range(header.num_entries)
-            ]
+    def from_buffer(cls, buffer: io.IOBase) -> "SFO":
+        """
+        Reads the header, the index table, the key table and the values the index points to,
+        value padding is left zeroed (e.g. a PS3RemoteFile only fetches the blocks holding them).
+        Unseekable buffers are read whole
+        """
+        if not buffer.seekable():
+            return cls.from_view(buffer.read())
+        start = buffer.tell()
+
+        def read(offset: int, size: int) -> bytes:
+            buffer.seek(start + offset)
+            return buffer.read(size)
+
+        head = read(0, SFO_HEADER_SIZE)
+        if len(head) < SFO_HEADER_SIZE:
+            raise ValueError(f"Truncated SFO header ({len(head)} bytes)")
+        header = SFOHeader.from_bytes(head)
+        if header.magic != SFO_MAGIC:
+            raise ValueError(f"Invalid SFO magic ({hex(header.magic)})")
+        table_size = SFO_INDEX_TABLE_ENTRY_SIZE * header.num_entries
+        table = read(SFO_HEADER_SIZE, table_size)
+        if len(table) < table_size:
+            raise ValueError(f"Truncated SFO index table ({SFO_HEADER_SIZE + len(table)} bytes)")
+        index_table = SFOIndexTable.from_bytes(table)
+        size = max(
+            (
+                header.data_table_offset + entry.data_offset + entry.param_length
+                for entry in index_table
+            ),
+            default=header.data_table_offset,
         )
-        content_offset = 20 + 16 * header.num_entries
-        key_offset = header.key_table_offset - content_offset
-        value_offset = header.data_table_offset - content_offset
-        content = buffer.read()
-        params = []
+        data = bytearray(max(size, header.data_table_offset))
+        data[:SFO_HEADER_SIZE] = head
+        data[SFO_HEADER_SIZE : SFO_HEADER_SIZE + table_size] = table
+        keys = read(header.key_table_offset, header.data_table_offset - header.key_table_offset)
+        data[header.key_table_offset : header.key_table_offset + len(keys)] = keys
         for entry in index_table:
-            key_start = entry.key_offset + key_offset
-            key_end = content.find(b"\x00", key_start)
-            key = content[key_start:key_end].decode("utf-8")
-            value_start = entry.data_offset + value_offset
-            value_end = value_start + entry.param_length
-            value = content[value_start:value_end]
-            params.append(
+            value_start = header.data_table_offset + entry.data_offset
+            value = read(value_start, entry.param_length)
+            data[value_start : value_start + len(value)] = value
+        # Read only like the bytes it replaces, patching a copy would not reach the file
+        return cls(header, index_table, data=memoryview(data).toreadonly())
+
+    @classmethod
+    def from_view(cls, data) -> "SFO":
+        """
+        Parses the SFO without copying it, `data` is anything exposing the buffer protocol
+        (bytes, bytearray, mmap, memoryview...), it must outlive the SFO and not change under it.
+        Only the header and the index table are decoded here
+        """
+        view = memoryview(data).cast("B")
+        if len(view) < SFO_HEADER_SIZE:
+            raise ValueError(f"Truncated SFO header ({len(view)} bytes)")
+        header = SFOHeader.from_bytes(view[:SFO_HEADER_SIZE])
+        if header.magic != SFO_MAGIC:
+            raise ValueError(f"Invalid SFO magic ({hex(header.magic)})")
+        index_table_end = SFO_HEADER_SIZE + SFO_INDEX_TABLE_ENTRY_SIZE * header.num_entries
+        if len(view) < index_table_end:
+            raise ValueError(f"Truncated SFO index table ({len(view)} bytes)")
+        index_table = SFOIndexTable.from_bytes(view[SFO_HEADER_SIZE:index_table_end])
+        return cls(header, index_table, data=view)
+
+    @property
+    def params(self) -> list[SFOEntry]:
+        if self._params is None:
+            key_table_end = self.header.data_table_offset
+            self._params = [
                 SFOEntry(
-                    key=key,
-                    value=value,
-                    format=entry.param_format,
-                    length=entry.param_length,
-                    max_length=entry.param_max_length,
-                    actual_length=len(value),
                     related_index_table_entry=entry,
+                    data=self._data,
+                    key_start=self.header.key_table_offset + entry.key_offset,
+                    key_end=key_table_end,
+                    value_start=self.header.data_table_offset + entry.data_offset,
                 )
-            )
-        return cls(header, index_table, params)
+                for entry in self.index_table
+            ]
+        return self._params
+
+    @params.setter
+    def params(self, params: list[SFOEntry]) -> None:
+        self._params = params
+        self._index = None
+
+    @property
+    def index(self) -> dict[str, SFOEntry]:
+        """
+        Key to entry mapping, built once, the first parameter wins when a key is duplicated
+        """
+        if self._index is None:
+            index = {}
+            for param in self.params:
+                index.setdefault(param.key, param)
+            self._index = index
+        return self._index
 
     def __repr__(self) -> str:
         return f"<SFO V{hex(self.header.version)}: {self.params}>"
@@ -209,17 +422,21 @@ class SFO:
         return [param.key for param in self.params]
 
     def __contains__(self, key: str) -> bool:
-        return key in self.keys
+        return key in self.index
 
     def __getitem__(self, key: str) -> SFOEntry:
-        for param in self.params:
-            if param.key == key:
-                return param
-        raise KeyError(f"{key} not found in SFO")
+        try:
+            return self.index[key]
+        except KeyError:
+            raise KeyError(f"{key} not found in SFO") from None
+
+    def get(self, key: str, default=None) -> SFOEntry | None:
+        return self.index.get(key, default)
 
     def __setitem__(self, key: str, value: bytes) -> None:
-        if key in self:
-            self._update_item(self[key], value)
+        item = self.index.get(key)
+        if item is not None:
+            self._update_item(item, value)
         else:
             self._add_item(key, value)
 
@@ -230,42 +447,173 @@ class SFO:
             value_length <= index_table_entry.param_max_length
         ), f"Value length ({value_length}) is greater than the maximum length ({index_table_entry.param_max_length})"
         item.value = value
-        item.actual_length = value_length
-        item.length = value_length
         index_table_entry.param_length = value_length
 
-    def _add_item(self, key: str, value: bytes, format: int) -> None:
-        raise NotImplementedError
+    def _add_item(
+        self,
+        key: str,
+        value: bytes,
+        format: int | None = None,
+        max_length: int | None = None,
+    ) -> None:
+        if format is None:
+            format = SFO_FORMAT_UTF8 if value.endswith(b"\x00") else SFO_FORMAT_UTF8_SPECIAL
+        max_length = max_length or _align(max(len(value), 4))
+        assert (
+            len(value) <= max_length
+        ), f"Value length ({len(value)}) is greater than the maximum length ({max_length})"
+        # Placed by the relayout
+        entry = SFOIndexTableEntry(0, format, len(value), max_length, 0)
+        item = SFOEntry(key=key, value=bytes(value), related_index_table_entry=entry)
+        self.index_table.entries.append(entry)
+        self.params.append(item)
+        self.index.setdefault(key, item)
+        self._relayout()
+
+    def add(
+        self,
+        key: str,
+        value: bytes,
+        format: int | None = None,
+        max_length: int | None = None,
+    ) -> None:
+        """
+        Adds a parameter, the format defaults to a string when the value is NUL terminated,
+        the maximum length to the value length rounded to 4 bytes
+        """
+        if key in self:
+            raise KeyError(f"{key} already in SFO")
+        self._add_item(key, value, format, max_length)
 
-    def __bytes__(self) -> bytes:
-        header_bytes = bytes(self.header)
-        index_table_bytes = b"".join(bytes(entry) for entry in self.index_table.entries)
-        content_offset = 20 + 16 * self.header.num_entries
-        key_offset = self.header.key_table_offset - content_offset
-        value_offset = self.header.data_table_offset - content_offset
-        assert content_offset == len(header_bytes) + len(index_table_bytes)
-        last_index_table_entry = max(
-            self.index_table.entries, key=lambda entry: entry.data_offset
-        )
-        content_size = (
-            value_offset
-            + last_index_table_entry.data_offset
-            + last_index_table_entry.param_max_length
+    def _detach(self) -> None:
+        # Every key and value is read now, the offsets they come from are about to change
+        for param in self.params:
+            param.key, param.value
+            param._data = None
+        self._data = None
+
+    def _relayout(self) -> None:
+        """
+        Rebuilds the key and data tables like the console writes them:
+        keys sorted and NUL terminated, tables and values aligned on 4 bytes
+        """
+        self._detach()
+        params = sorted(self.params, key=lambda param: param.key)
+        key_offset = 0
+        data_offset = 0
+        for param in params:
+            entry = param.related_index_table_entry
+            entry.key_offset = key_offset
+            key_offset += len(param.key.encode("utf-8")) + 1
+            entry.param_max_length = _align(entry.param_max_length)
+            entry.data_offset = data_offset
+            data_offset += entry.param_max_length
+        self.header.num_entries = len(params)
+        self.header.key_table_offset = SFO_HEADER_SIZE + SFO_INDEX_TABLE_ENTRY_SIZE * len(params)
+        self.header.data_table_offset = self.header.key_table_offset + _align(key_offset)
+        self.index_table.entries = [param.related_index_table_entry for param in params]
+        self._params = params
+
+    def patch(self, values: dict[str, bytes]) -> list[str]:
+        """
+        Overwrites values in the buffer the SFO was parsed from (a bytearray or a writable mmap),
+        only the value bytes and their length in the index table are written.
+        Every value is checked against its maximum length before anything is written,
+        returns the keys that actually changed
+        """
+        if self._data is None or self._data.readonly:
+            raise TypeError("The SFO is not backed by a writable buffer")
+        items = []
+        for key, value in values.items():
+            item = self[key]
+            max_length = item.related_index_table_entry.param_max_length
+            if len(value) > max_length:
+                raise ValueError(
+                    f"Value length of {key} ({len(value)}) is greater than the maximum length ({max_length})"
+                )
+            if item.value != value:
+                items.append((item, bytes(value)))
+        entry_positions = {id(entry): i for i, entry in enumerate(self.index_table)}
+        for item, value in items:
+            entry = item.related_index_table_entry
+            value_start = self.header.data_table_offset + entry.data_offset
+            self._data[value_start : value_start + len(value)] = value
+            if len(value) < entry.param_length:
+                # Stale bytes of the previous, longer value
+                self._data[value_start + len(value) : value_start + entry.param_length] = bytes(
+                    entry.param_length - len(value)
+                )
+            SFO_PARAM_LENGTH_STRUCT.pack_into(
+                self._data,
+                SFO_HEADER_SIZE
+                + SFO_INDEX_TABLE_ENTRY_SIZE * entry_positions[id(entry)]
+                + SFO_PARAM_LENGTH_OFFSET,
+                len(value),
+            )
+            entry.param_length = len(value)
+            item.value = value
+        return [item.key for item, _ in items]
+
+    @classmethod
+    def patch_file(cls, file: Path | str, values: dict[str, bytes]) -> list[str]:
+        """
+        Patches the file in place through a memory map, see `patch`
+        """
+        with open(file, "r+b") as f, mmap.mmap(f.fileno(), 0) as mapped:
+            sfo = cls.from_view(mapped)
+            try:
+                # Shared pages, no msync needed to be seen by readers, like a plain write
+                return sfo.patch(values)
+            finally:
+                # The map cannot be closed while a view on it is alive
+                sfo.release()
+
+    def release(self) -> None:
+        """
+        Drops the view on the parsed data (e.g. so a map can be closed),
+        every key and value is read first so the SFO stays usable
+        """
+        data = self._data
+        if data is not None:
+            self._detach()
+            data.release()
+
+    def _serialize(self) -> bytearray:
+        header = self.header
+        index_table_end = SFO_HEADER_SIZE + SFO_INDEX_TABLE_ENTRY_SIZE * header.num_entries
+        assert len(self.index_table) == header.num_entries, "The header and the index table disagree"
+        size = max(
+            (
+                header.data_table_offset + entry.data_offset + entry.param_max_length
+                for entry in self.index_table
+            ),
+            default=index_table_end,
         )
-        content = bytearray(b"\x00" * content_size)
+        # Zero filled, padding and unused value space included
+        buffer = bytearray(size)
+        header.pack_into(buffer)
+        self.index_table.pack_into(buffer, SFO_HEADER_SIZE)
         for param in self.params:
-            key_start = param.related_index_table_entry.key_offset + key_offset
-            content[key_start : key_start + len(param.key)] = param.key.encode("utf-8")
-            value_start = param.related_index_table_entry.data_offset + value_offset
-            content[value_start : value_start + param.actual_length] = param.value
-        return header_bytes + index_table_bytes + bytes(content)
+            entry = param.related_index_table_entry
+            key_start = header.key_table_offset + entry.key_offset
+            key = param.key.encode("utf-8")
+            buffer[key_start : key_start + len(key)] = key
+            value_start = header.data_table_offset + entry.data_offset
+            value = param.value
+            buffer[value_start : value_start + len(value)] = value
+        return buffer
+
+    def __bytes__(self) -> bytes:
+        return bytes(self._serialize())
 
     def write_to_buffer(self, buffer: io.BytesIO) -> None:
-        buffer.write(bytes(self))
+        buffer.write(self._serialize())
 
     def write_to_file(self, file: Path | str) -> None:
+        # Serialized first, the SFO may still be reading from the file being replaced
+        data = self._serialize()
         with open(file, "wb") as f:
-            self.write_to_buffer(f)
+            f.write(data)
 
     def to_buffer(self, buffer: io.BytesIO = io.BytesIO()) -> io.BytesIO:
         self.write_to_buffer(buffer)
@@ -286,8 +634,94 @@ class SFO:
     ) -> None:
         subset = subset or other.keys
         for key in subset:
-            if key in self or add_new:
-                self[key] = other[key].value
+            item = self.index.get(key)
+            if item is not None:
+                self._update_item(item, other[key].value)
+            elif add_new:
+                source = other[key]
+                self._add_item(key, source.value, source.format, source.max_length)
+
+    def merge(
+        self,
+        template: "SFO",
+        copy_title=False,
+        copy_detail=False,
+        keys: Iterable[str] = SFO_ACCOUNT_KEYS,
+    ) -> "SFO":
+        """
+        In process equivalent of `sfopatcher build`: a copy of this SFO carrying the account
+        bound parameters of `template`, plus its title and detail when asked.
+        Parameters missing from this SFO are added, values too long for their slot grow it
+        """
+        keys = list(keys)
+        if copy_title:
+            keys += SFO_TITLE_KEYS
+        if copy_detail:
+            keys += SFO_DETAIL_KEYS
+        merged = self.copy()
+        grown = False
+        for key in keys:
+            source = template.get(key)
+            if source is None:
+                continue
+            item = merged.get(key)
+            if item is None:
+                merged._add_item(key, source.value, source.format, source.max_length)
+                continue
+            entry = item.related_index_table_entry
+            if len(source.value) > entry.param_max_length:
+                entry.param_max_length = _align(len(source.value))
+                grown = True
+            merged._update_item(item, source.value)
+        if grown:
+            merged._relayout()
+        return merged
+
+    @classmethod
+    def build(
+        cls,
+        input_file: Path | str,
+        tpl_file: Path | str,
+        output_file: Path | str,
+        copy_title=False,
+        copy_detail=False,
+    ) -> "SFO":
+        built = cls.from_file(input_file).merge(
+            cls.from_file(tpl_file), copy_title=copy_title, copy_detail=copy_detail
+        )
+        built.to_file(output_file)
+        return built
+
+    def copy(self) -> "SFO":
+        header = self.header
+        entries = {
+            id(entry): SFOIndexTableEntry(
+                entry.key_offset,
+                entry.param_format,
+                entry.param_length,
+                entry.param_max_length,
+                entry.data_offset,
+            )
+            for entry in self.index_table
+        }
+        return SFO(
+            SFOHeader(
+                header.magic,
+                header.version,
+                header.key_table_offset,
+                header.data_table_offset,
+                header.num_entries,
+            ),
+            SFOIndexTable(entries=[entries[id(entry)] for entry in self.index_table]),
+            params=[
+                SFOEntry(
+                    key=param.key,
+                    value=param.value,
+                    related_index_table_entry=entries[id(param.related_index_table_entry)],
+                )
+                for param in self.params
+            ],
+        )
 
 
 if __name__ == "__main__":
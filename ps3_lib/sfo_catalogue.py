@@ -0,0 +1,163 @@
+import csv
+import os
+import fnmatch
+import itertools
+from pathlib import Path
+from typing import Iterable, Iterator
+from concurrent.futures import Executor, ProcessPoolExecutor
+
+import numpy as np
+
+from .sfo import SFO
+
+# Games, trophy sets and saves do not name their parameters the same way
+CATALOGUE_KEYS = {
+    "title_id": ("TITLE_ID", "TITLEID000"),
+    "title": ("TITLE",),
+    "version": ("APP_VER", "VERSION"),
+    "category": ("CATEGORY",),
+    "account_id": ("ACCOUNTID", "ACCOUNT_ID"),
+}
+
+CATALOGUE_COLUMNS = ("path", *CATALOGUE_KEYS, "error")
+
+
+def _decode(value: bytes) -> str:
+    return value.partition(b"\x00")[0].decode("utf-8", "replace")
+
+
+def scan_sfo(path: str) -> tuple[str, ...]:
+    """
+    One catalogue row, a file that cannot be parsed gets empty fields and its error
+    """
+    try:
+        sfo = SFO.from_file(path)
+        fields = []
+        for keys in CATALOGUE_KEYS.values():
+            param = next((sfo[key] for key in keys if key in sfo), None)
+            fields.append(_decode(param.value) if param is not None else "")
+        return (path, *fields, "")
+    except Exception as e:
+        return (path, *("" for _ in CATALOGUE_KEYS), f"{type(e).__name__}: {e}")
+
+
+def _scan_batch(paths: list[str]) -> list[tuple[str, ...]]:
+    return [scan_sfo(path) for path in paths]
+
+
+def _batched(items: Iterable, size: int) -> Iterator[list]:
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def find_sfos(roots: Iterable[Path | str] | Path | str, pattern="PARAM.SFO") -> Iterator[str]:
+    if isinstance(roots, (str, Path)):
+        roots = (roots,)
+    for root in roots:
+        root = Path(root)
+        if root.is_file():
+            yield str(root)
+            continue
+        for directory, _, files in os.walk(root):
+            for name in files:
+                if fnmatch.fnmatch(name, pattern):
+                    yield os.path.join(directory, name)
+
+
+class SFOCatalogue:
+    """
+    Columnar view of a set of SFOs, one NumPy string array per column
+    """
+
+    def __init__(self, columns: dict[str, np.ndarray]) -> None:
+        self.columns = columns
+
+    @classmethod
+    def from_rows(cls, rows: list[tuple[str, ...]]) -> "SFOCatalogue":
+        if rows:
+            values = zip(*rows)
+        else:
+            values = ([] for _ in CATALOGUE_COLUMNS)
+        return cls(
+            {name: np.array(column, dtype=str) for name, column in zip(CATALOGUE_COLUMNS, values)}
+        )
+
+    def __repr__(self) -> str:
+        return f"<SFOCatalogue: {len(self)} SFOs, {len(self.errors)} unreadable>"
+
+    def __len__(self) -> int:
+        return len(self.columns["path"])
+
+    def __getitem__(self, column: str) -> np.ndarray:
+        return self.columns[column]
+
+    def select(self, mask: np.ndarray) -> "SFOCatalogue":
+        return SFOCatalogue({name: column[mask] for name, column in self.columns.items()})
+
+    @property
+    def errors(self) -> "SFOCatalogue":
+        return self.select(self.columns["error"] != "")
+
+    @property
+    def valid(self) -> "SFOCatalogue":
+        return self.select(self.columns["error"] == "")
+
+    def rows(self) -> Iterator[dict[str, str]]:
+        for values in zip(*self.columns.values()):
+            yield dict(zip(self.columns, values))
+
+    def to_records(self) -> np.ndarray:
+        return np.rec.fromarrays(list(self.columns.values()), names=list(self.columns))
+
+    def to_csv(self, path: Path | str) -> None:
+        with open(path, "w", newline="", encoding="utf-8") as f:
+            writer = csv.writer(f)
+            writer.writerow(self.columns)
+            writer.writerows(zip(*(column.tolist() for column in self.columns.values())))
+
+    def to_parquet(self, path: Path | str) -> None:
+        try:
+            import pyarrow
+            import pyarrow.parquet
+        except ImportError as e:
+            raise ImportError("Parquet export needs pyarrow (pip install pyarrow)") from e
+        table = pyarrow.table({name: column.tolist() for name, column in self.columns.items()})
+        pyarrow.parquet.write_table(table, path)
+
+
+def scan_sfos(
+    roots: Iterable[Path | str] | Path | str,
+    pattern="PARAM.SFO",
+    max_workers: int | None = None,
+    batch_size=256,
+    executor: Executor | None = None,
+) -> SFOCatalogue:
+    """
+    Catalogues every SFO matching `pattern` under `roots`.
+    Files are parsed in batches over a process pool, `max_workers=0` parses them in this process
+    """
+    batches = _batched(find_sfos(roots, pattern), batch_size)
+    rows = []
+    if executor is not None:
+        for batch_rows in executor.map(_scan_batch, batches):
+            rows.extend(batch_rows)
+    elif max_workers == 0:
+        for batch in batches:
+            rows.extend(_scan_batch(batch))
+    else:
+        first = next(batches, [])
+        if len(first) < batch_size:
+            # A single batch is not worth starting processes for
+            rows.extend(_scan_batch(first))
+        else:
+            with ProcessPoolExecutor(max_workers=max_workers) as pool:
+                for batch_rows in pool.map(_scan_batch, itertools.chain([first], batches)):
+                    rows.extend(batch_rows)
+    return SFOCatalogue.from_rows(rows)
+
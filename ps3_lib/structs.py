@@ -3,11 +3,18 @@ from pathlib import Path
 
 
 class PS3Path:
-    def __init__(self, path: Path | None) -> None:
+    def __init__(
+        self, path: Path | None, is_directory: bool | None = None, size: int | None = None
+    ) -> None:
         if isinstance(path, PS3Path):
             self._path = path._path
+            is_directory = path.is_directory if is_directory is None else is_directory
+            size = path.size if size is None else size
         else:
             self._path = Path(path)
+        # Known when the path comes from a listing
+        self.is_directory = is_directory
+        self.size = size
 
     def __str__(self) -> str:
         return str(self._path).replace("\\", "/")
@@ -19,8 +26,10 @@ class PS3Path:
     
     def is_dir(self) -> bool:
         """
-        TODO: Find a better way
+        TODO: Find a better way when the path does not come from a listing
         """
+        if self.is_directory is not None:
+            return self.is_directory
         return "." not in self.name
 
     @property
@@ -1,8 +1,22 @@
 import io
+import array
+import bisect
+import struct
 from pathlib import Path
-from typing import Iterable
+from typing import Iterable, Iterator
 
-from pydantic import BaseModel, ConfigDict, validator
+from pydantic import BaseModel, validator
+
+XREG_HEADER_SIZE = 0x10
+XREG_KEYS_OFFSET = XREG_HEADER_SIZE
+XREG_VALUES_OFFSET = 0x10000
+XREG_VALUES_END = XREG_VALUES_OFFSET + 0x10000
+
+# unknown1, key_length, key_type, then the key and its terminator
+XREG_KEY_STRUCT = struct.Struct(">2sHB")
+# unknown1, key_offset, unknown2, value_length, value_type, then the value and its terminator
+XREG_VALUE_STRUCT = struct.Struct(">2sH2sHB")
+XREG_KEY_LENGTH_STRUCT = struct.Struct(">H")
 
 
 class XRegHeader(BaseModel):
@@ -41,76 +55,95 @@ class XRegHeader(BaseModel):
         )
 
 
-class XRegKey(BaseModel):
-    unknown1: bytes
-    key_length: int
-    key_type: int
-    key: str
-    terminator: bytes
+class XRegKey:
+    __slots__ = ("unknown1", "key_length", "key_type", "key", "terminator")
+
+    def __init__(
+        self,
+        unknown1: bytes,
+        key_length: int,
+        key_type: int,
+        key: str,
+        terminator: bytes,
+    ):
+        self.unknown1 = unknown1
+        self.key_length = key_length
+        self.key_type = key_type
+        self.key = key
+        self.terminator = terminator
+
+    def __repr__(self) -> str:
+        return f"<XRegKey {self.key}>"
 
     @classmethod
     def from_bytes(cls, data: bytes) -> "XRegKey":
-        unknown1, key_length, key_type, key, terminator = cls._unpack(data)
-        return cls(
-            unknown1=unknown1,
-            key_length=key_length,
-            key_type=key_type,
-            key=key,
-            terminator=terminator,
-        )
+        return cls(*cls._unpack(data))
 
     @staticmethod
-    def _unpack(data: bytes) -> tuple[int, int, int, str, bytes]:
-        unknown1 = data[0:2]
-        key_length = int.from_bytes(data[2:4], "big")
-        key_type = int.from_bytes(data[4:5], "big")
-        key = data[5 : 5 + key_length].decode(encoding="utf-8")
-        terminator = data[5 + key_length : 6 + key_length]
+    def _unpack(data: bytes) -> tuple[bytes, int, int, str, bytes]:
+        unknown1, key_length, key_type = XREG_KEY_STRUCT.unpack_from(data)
+        start = XREG_KEY_STRUCT.size
+        key = str(data[start : start + key_length], "utf-8")
+        terminator = bytes(data[start + key_length : start + key_length + 1])
         return (unknown1, key_length, key_type, key, terminator)
 
     def __len__(self) -> int:
         return self.key_length + 6
 
 
-class XRegValue(BaseModel):
-    unknown1: bytes
-    key_offset: int
-    unknown2: bytes
-    value_length: int
-    value_type: int
-    value: bytes
-    terminator: bytes
+def process_value(value_type: int, value: bytes) -> bool | int | str | bytes:
+    if value_type == 0:
+        return bool(value)
+    elif value_type == 1:
+        return int.from_bytes(value, "big")
+    elif value_type == 2:
+        return value.strip(b"\x00")
+    else:
+        raise ValueError(f"Unknown value type {value_type}")
+
+
+class XRegValue:
+    __slots__ = (
+        "unknown1",
+        "key_offset",
+        "unknown2",
+        "value_length",
+        "value_type",
+        "value",
+        "terminator",
+    )
+
+    def __init__(
+        self,
+        unknown1: bytes,
+        key_offset: int,
+        unknown2: bytes,
+        value_length: int,
+        value_type: int,
+        value: bytes,
+        terminator: bytes,
+    ):
+        self.unknown1 = unknown1
+        self.key_offset = key_offset
+        self.unknown2 = unknown2
+        self.value_length = value_length
+        self.value_type = value_type
+        self.value = value
+        self.terminator = terminator
+
+    def __repr__(self) -> str:
+        return f"<XRegValue {self.value!r}>"
 
     @classmethod
     def from_bytes(cls, data: bytes) -> "XRegValue":
-        (
-            unknown1,
-            key_offset,
-            unknown2,
-            value_length,
-            value_type,
-            value,
-            terminator,
-        ) = cls._unpack(data)
-        return cls(
-            unknown1=unknown1,
-            key_offset=key_offset,
-            unknown2=unknown2,
-            value_length=value_length,
-            value_type=value_type,
-            value=value,
-            terminator=terminator,
-        )
+        return cls(*cls._unpack(data))
 
     @staticmethod
-    def _unpack(data: bytes) -> tuple[bytes, int, int, int, int, bytes, bytes]:
-        unknown1 = data[0:2]
-        key_offset = int.from_bytes(data[2:4], "big")
-        unknown2 = data[4:6]
-        value_length = int.from_bytes(data[6:8], "big")
-        value_type = int.from_bytes(data[8:9], "big")
-        value = data[9 : 9 + value_length]
-        terminator = data[9 + value_length : 10 + value_length]
+    def _unpack(data: bytes) -> tuple[bytes, int, bytes, int, int, bytes, bytes]:
+        unknown1, key_offset, unknown2, value_length, value_type = XREG_VALUE_STRUCT.unpack_from(data)
+        start = XREG_VALUE_STRUCT.size
+        value = bytes(data[start : start + value_length])
+        terminator = bytes(data[start + value_length : start + value_length + 1])
         return (
             unknown1,
             key_offset,
@@ -126,54 +159,319 @@ class XRegValue(BaseModel):
 
     @property
     def processed_value(self) -> bool | int | str | bytes:
-        if self.value_type == 0:
-            return bool(self.value)
-        elif self.value_type == 1:
-            return int.from_bytes(self.value, "big")
-        elif self.value_type == 2:
-            return self.value.strip(b"\x00")
-        else:
-            raise ValueError(f"Unknown value type {self.value_type}")
+        return process_value(self.value_type, self.value)
+
+
+class XRegEntry:
+    __slots__ = ("key", "value")
+
+    def __init__(self, key: XRegKey, value: XRegValue):
+        self.key = key
+        self.value = value
+
+    def __repr__(self) -> str:
+        return f"<XRegEntry {self.key.key}={self.value.processed_value!r}>"
+
+
+class XRegEntryList(list):
+    """
+    Materialized entries of a registry, the registry reads from it once it exists.
+    Changing the list drops the lookups built from it, changing an entry in place does not
+    """
+
+    __slots__ = ("_on_change",)
 
+    def __init__(self, entries: Iterable[XRegEntry], on_change) -> None:
+        super().__init__(entries)
+        self._on_change = on_change
 
-class XRegEntry(BaseModel):
-    model_config = ConfigDict(arbitrary_types_allowed=True)
-    key: XRegKey
-    value: XRegValue
+
+def _changing(name: str):
+    method = getattr(list, name)
+
+    def change(self, *args):
+        result = method(self, *args)
+        self._on_change()
+        return result
+
+    change.__name__ = name
+    return change
+
+
+for _name in (
+    "__setitem__",
+    "__delitem__",
+    "__iadd__",
+    "__imul__",
+    "append",
+    "extend",
+    "insert",
+    "pop",
+    "remove",
+    "clear",
+    "sort",
+    "reverse",
+):
+    setattr(XRegEntryList, _name, _changing(_name))
 
 
 class XRegistry:
-    def __init__(self, header: XRegHeader, entries: Iterable[XRegEntry]) -> None:
+    """
+    Entries are stored as the offsets of their key and value records in the registry data,
+    `XRegEntry` objects are only built when asked for
+    """
+
+    def __init__(
+        self,
+        header: XRegHeader,
+        entries: Iterable[XRegEntry] | None = None,
+        data: memoryview | None = None,
+        key_records: array.array | None = None,
+        value_records: array.array | None = None,
+    ) -> None:
         self.header = header
-        self.entries = entries
+        if entries is not None:
+            self.entries = entries
+        else:
+            self._set_records(data, key_records, value_records)
+
+    def _set_records(
+        self,
+        data: memoryview | None,
+        key_records: array.array | None,
+        value_records: array.array | None,
+        entries: list[XRegEntry] | None = None,
+    ) -> None:
+        self._data = data
+        self._key_records = key_records if key_records is not None else array.array("I")
+        self._value_records = value_records if value_records is not None else array.array("I")
+        # Set when the registry is built from entries, or once they were asked for
+        self._entries = (
+            XRegEntryList(entries, self._forget_lookups) if entries is not None else None
+        )
+        self._forget_lookups()
+
+    def _forget_lookups(self) -> None:
+        # Built on first use
+        self._index: dict[str, int] | None = None
+        self._sorted_keys: list[str] | None = None
+        self._hierarchy: dict | None = None
+
+    @property
+    def entries(self) -> list[XRegEntry]:
+        """
+        Materialized on first access, then the registry reads from that list so changes to it
+        are seen by the lookups. Prefer iterating or the lookups on big registries
+        """
+        if self._entries is None:
+            self._entries = XRegEntryList(self, self._forget_lookups)
+        return self._entries
+
+    @entries.setter
+    def entries(self, entries: Iterable[XRegEntry]) -> None:
+        self._set_records(None, None, None, list(entries))
+
+    def __len__(self) -> int:
+        if self._entries is not None:
+            return len(self._entries)
+        return len(self._value_records)
+
+    def __iter__(self) -> Iterator[XRegEntry]:
+        return (self._entry(position) for position in range(len(self)))
+
+    def _entry(self, position: int) -> XRegEntry:
+        if self._entries is not None:
+            return self._entries[position]
+        return XRegEntry(
+            key=XRegKey.from_bytes(self._data[self._key_records[position] :]),
+            value=XRegValue.from_bytes(self._data[self._value_records[position] :]),
+        )
+
+    def _key(self, position: int) -> str:
+        if self._entries is not None:
+            return self._entries[position].key.key
+        offset = self._key_records[position]
+        _, key_length, _ = XREG_KEY_STRUCT.unpack_from(self._data, offset)
+        start = offset + XREG_KEY_STRUCT.size
+        return str(self._data[start : start + key_length], "utf-8")
+
+    def _processed_value(self, position: int) -> bool | int | str | bytes:
+        if self._entries is not None:
+            return self._entries[position].value.processed_value
+        offset = self._value_records[position]
+        _, _, _, value_length, value_type = XREG_VALUE_STRUCT.unpack_from(self._data, offset)
+        start = offset + XREG_VALUE_STRUCT.size
+        return process_value(value_type, bytes(self._data[start : start + value_length]))
 
     @classmethod
-    def from_buffer(cls, buffer: io.BytesIO) -> None:
-        header = XRegHeader.from_bytes(buffer.read(0x10))
-        key_part = buffer.read(0xFFF0)
-        value_part = buffer.read(0x10000)
-        entries = []
-        while True:
-            value = XRegValue.from_bytes(value_part)
-            value_part = value_part[len(value) :]
-            key = XRegKey.from_bytes(key_part[value.key_offset :])
-            if key.key == "":
+    def from_buffer(cls, buffer: io.IOBase) -> "XRegistry":
+        """
+        Reads the header, the value records in order and the key records they point to,
+        the unused parts of both regions are left zeroed (e.g. a PS3RemoteFile only fetches
+        the blocks holding records). Unseekable buffers are read up to the end of the value region
+        """
+        if not buffer.seekable():
+            return cls.from_view(buffer.read(XREG_VALUES_END))
+        data = bytearray(XREG_VALUES_END)
+        read = cls._buffer_reader(buffer, data)
+        header = XRegHeader.from_bytes(bytes(read(0, XREG_HEADER_SIZE)))
+        key_records = array.array("I")
+        value_records = array.array("I")
+        for key_record, key_length, value_record, value_length, _ in cls._records(read):
+            read(key_record + XREG_KEY_STRUCT.size, key_length + 1)
+            read(value_record + XREG_VALUE_STRUCT.size, value_length + 1)
+            key_records.append(key_record)
+            value_records.append(value_record)
+        return cls(
+            header,
+            data=memoryview(data).toreadonly(),
+            key_records=key_records,
+            value_records=value_records,
+        )
+
+    @staticmethod
+    def _buffer_reader(buffer: io.IOBase, data: bytearray, chunk_size=4 * 1024):
+        """
+        `read(offset, size)` over a seekable buffer, shorter past its end. Everything read
+        is copied to the same offset of `data`. The value region is walked in order so it is
+        read ahead by chunks, key records are read one at a time where they are
+        """
+        start = buffer.tell()
+        values_read = XREG_VALUES_OFFSET
+        values_ended = False
+
+        def read(offset: int, size: int) -> memoryview:
+            nonlocal values_read, values_ended
+            end = min(offset + size, XREG_VALUES_END)
+            if offset < XREG_VALUES_OFFSET:
+                buffer.seek(start + offset)
+                chunk = buffer.read(min(end, XREG_VALUES_OFFSET) - offset)
+                data[offset : offset + len(chunk)] = chunk
+                return memoryview(data)[offset : offset + len(chunk)]
+            while values_read < end and not values_ended:
+                buffer.seek(start + values_read)
+                chunk = buffer.read(min(max(chunk_size, end - values_read), XREG_VALUES_END - values_read))
+                data[values_read : values_read + len(chunk)] = chunk
+                values_read += len(chunk)
+                values_ended = not chunk
+            return memoryview(data)[offset : min(end, values_read)]
+
+        return read
+
+    @staticmethod
+    def _records(read) -> Iterator[tuple[int, int, int, int, int]]:
+        """
+        Key record offset, key length, value record offset, value length and value type
+        of every entry, in order. `read(offset, size)` returns the registry bytes at offset,
+        shorter past the end of the data
+        """
+        cursor = XREG_VALUES_OFFSET
+        while cursor + XREG_VALUE_STRUCT.size <= XREG_VALUES_END:
+            record = read(cursor, XREG_VALUE_STRUCT.size)
+            if len(record) < XREG_VALUE_STRUCT.size:
                 break
-            entry = XRegEntry(key=key, value=value)
-            entries.append(entry)
-        return cls(header=header, entries=entries)
+            _, key_offset, _, value_length, value_type = XREG_VALUE_STRUCT.unpack_from(record)
+            key_record = XREG_KEYS_OFFSET + key_offset
+            if key_record + XREG_KEY_STRUCT.size > XREG_VALUES_OFFSET:
+                # Past the key region, read as the empty end key
+                break
+            key_header = read(key_record, XREG_KEY_STRUCT.size)
+            if len(key_header) < XREG_KEY_STRUCT.size:
+                break
+            (key_length,) = XREG_KEY_LENGTH_STRUCT.unpack_from(key_header, 2)
+            if key_length == 0:
+                break
+            yield key_record, key_length, cursor, value_length, value_type
+            cursor += XREG_VALUE_STRUCT.size + value_length + 1
 
     @classmethod
-    def from_file(cls, file: Path) -> None:
-        with file.open("rb") as f:
-            return cls.from_buffer(f)
+    def from_view(cls, data) -> "XRegistry":
+        """
+        Walks the value region once with a cursor, `data` is anything exposing the buffer protocol,
+        it must outlive the registry and not change under it.
+        Only the offsets of the key and value records are kept
+        """
+        view = memoryview(data).cast("B")
+        header = XRegHeader.from_bytes(bytes(view[:XREG_HEADER_SIZE]))
+        values_end = min(len(view), XREG_VALUES_END)
+        key_records = array.array("I")
+        value_records = array.array("I")
+        cursor = XREG_VALUES_OFFSET
+        while cursor + XREG_VALUE_STRUCT.size <= values_end:
+            _, key_offset, _, value_length, _ = XREG_VALUE_STRUCT.unpack_from(view, cursor)
+            key_record = XREG_KEYS_OFFSET + key_offset
+            if key_record + XREG_KEY_STRUCT.size > XREG_VALUES_OFFSET:
+                # Past the key region, read as the empty end key
+                break
+            (key_length,) = XREG_KEY_LENGTH_STRUCT.unpack_from(view, key_record + 2)
+            if key_length == 0:
+                break
+            key_records.append(key_record)
+            value_records.append(cursor)
+            cursor += XREG_VALUE_STRUCT.size + value_length + 1
+        return cls(header, data=view, key_records=key_records, value_records=value_records)
+
+    @classmethod
+    def find_values(
+        cls, source, keys: Iterable[str], chunk_size=4 * 1024
+    ) -> dict[str, bool | int | str | bytes]:
+        """
+        Processed values of `keys`, parsing stops as soon as they are all found.
+        `source` is the registry data or a readable file (e.g. a PS3RemoteFile),
+        a file is read by chunks as far into the value region as needed
+        and only the key records the values point to are read from the key region
+        """
+        wanted = set(keys)
+        found = {}
+        if isinstance(source, io.IOBase):
+            if source.seekable():
+                read = cls._buffer_reader(source, bytearray(XREG_VALUES_END), chunk_size)
+            else:
+                source = source.read(XREG_VALUES_END)
+        if not isinstance(source, io.IOBase):
+            view = memoryview(source).cast("B")
+
+            def read(offset: int, size: int) -> memoryview:
+                return view[offset : min(offset + size, XREG_VALUES_END)]
+
+        XRegHeader.from_bytes(bytes(read(0, XREG_HEADER_SIZE)))
+        if not wanted:
+            return found
+        for key_record, key_length, value_record, value_length, value_type in cls._records(read):
+            key = str(read(key_record + XREG_KEY_STRUCT.size, key_length), "utf-8")
+            if key in wanted:
+                value = read(value_record + XREG_VALUE_STRUCT.size, value_length)
+                if len(value) < value_length:
+                    break
+                found[key] = process_value(value_type, bytes(value))
+                wanted.discard(key)
+                if not wanted:
+                    break
+        return found
 
     @classmethod
-    def from_bytes(cls, data: bytes) -> None:
-        with io.BytesIO(data) as f:
-            return cls.from_buffer(f)
+    def from_file(cls, file: Path | str) -> "XRegistry":
+        # Read whole, one read of a local file is cheaper than a seek per record
+        with open(file, "rb") as f:
+            return cls.from_view(f.read(XREG_VALUES_END))
 
-    def __getitem__(self, key: str | XRegKey) -> XRegEntry:
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "XRegistry":
+        return cls.from_view(data)
+
+    @property
+    def index(self) -> dict[str, int]:
+        """
+        Key to entry position, the first entry wins when a key is duplicated
+        """
+        if self._index is None:
+            index = {}
+            for position in range(len(self)):
+                index.setdefault(self._key(position), position)
+            self._index = index
+        return self._index
+
+    def __getitem__(self, key: str | XRegKey) -> XRegValue:
         if isinstance(key, str):
             return self.get_entry(key).value
         elif isinstance(key, XRegKey):
@@ -181,14 +479,58 @@ class XRegistry:
         else:
             raise TypeError("Key must be str or XRegKey")
 
+    def __contains__(self, key: str) -> bool:
+        return key in self.index
+
     def get_entry(self, key: str) -> XRegEntry:
-        for entry in self.entries:
-            if entry.key.key == key:
-                return entry
-        raise KeyError(f"Key {key} not found")
+        try:
+            return self._entry(self.index[key])
+        except KeyError:
+            raise KeyError(f"Key {key} not found") from None
+
+    def get_value(self, key: str, default=None) -> bool | int | str | bytes | None:
+        position = self.index.get(key)
+        return self._processed_value(position) if position is not None else default
+
+    def keys(self, prefix="") -> list[str]:
+        """
+        Sorted keys starting with `prefix`, found by bisection
+        """
+        if self._sorted_keys is None:
+            self._sorted_keys = sorted(self.index)
+        start = bisect.bisect_left(self._sorted_keys, prefix)
+        end = start
+        while end < len(self._sorted_keys) and self._sorted_keys[end].startswith(prefix):
+            end += 1
+        return self._sorted_keys[start:end]
+
+    def query(self, prefix: str) -> dict[str, bool | int | str | bytes]:
+        """
+        Processed values of every key under `prefix`, e.g. "/setting/user/00000001/"
+        """
+        return {key: self._processed_value(self.index[key]) for key in self.keys(prefix)}
+
+    def subtree(self, path: str) -> dict | bool | int | str | bytes:
+        """
+        The part of the hierarchy at `path`, e.g. "/setting/user/00000001/npaccount"
+        """
+        node = self.hierarchy
+        for part in filter(None, path.split("/")):
+            if not isinstance(node, dict) or part not in node:
+                raise KeyError(f"Key {path} not found")
+            node = node[part]
+        return node
 
     @property
     def hierarchy(self):
+        """
+        Built once then shared, copy it before changing it
+        """
+        if self._hierarchy is None:
+            self._hierarchy = self._build_hierarchy()
+        return self._hierarchy
+
+    def _build_hierarchy(self) -> dict:
         def add_to_hierarchy(hierarchy, key_path, value):
             parts = key_path.strip("/").split("/")
             current_dict = hierarchy
@@ -199,8 +541,8 @@ class XRegistry:
             current_dict[parts[-1]] = value
 
         hierarchy_dict = {}
-        for entry in self.entries:
-            add_to_hierarchy(hierarchy_dict, entry.key.key, entry.value.processed_value)
+        for position in range(len(self)):
+            add_to_hierarchy(hierarchy_dict, self._key(position), self._processed_value(position))
 
         return hierarchy_dict
 
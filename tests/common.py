@@ -1,8 +1,15 @@
 import random
+import socket
+import asyncio
 import configparser
 from pathlib import Path
 from functools import lru_cache
 
+from ps3_lib.file_transfer import PS3FTPFileTransfer, PS3HTTPFileTransfer, PS3RobustFTPFileTransfer
+
+# Shared with the benchmarks
+from tools.common import make_registry, make_sfo  # noqa: F401
+
 @lru_cache(maxsize=1)
 def get_npuserid():
     # Makes easy to use the git-ignored custom_config.ini file if you are a contributor
@@ -17,4 +24,32 @@ def get_npuserid():
 
 @lru_cache(maxsize=1)
 def get_dummy_npuserid():
-    return format(random.getrandbits(64), '016x')
\ No newline at end of file
+    return format(random.getrandbits(64), '016x')
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def open_backend(kind, standins, **kwargs):
+    # Like the benchmark ones, with a free port for the files served by the HTTP backend
+    if kind == "ftp":
+        return PS3FTPFileTransfer("127.0.0.1", standins.ftp_port, webman_port=standins.http_port, **kwargs)
+    elif kind == "robust":
+        return PS3RobustFTPFileTransfer("127.0.0.1", standins.ftp_port, webman_port=standins.http_port, **kwargs)
+    elif kind == "http":
+        return PS3HTTPFileTransfer(
+            "127.0.0.1", standins.http_port, server_host="127.0.0.1", server_port=free_port(), **kwargs
+        )
+    raise ValueError(f"Unknown backend {kind}")
+
+def run_connected(backend, test):
+    # test(backend) runs on its own event loop, between connect and disconnect
+    async def run():
+        await backend.connect()
+        try:
+            return await test(backend)
+        finally:
+            await backend.disconnect()
+
+    return asyncio.run(run())
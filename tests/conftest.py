@@ -0,0 +1,24 @@
+import logging
+
+import pytest
+from ps3_lib.file_transfer import concurrency
+
+from tools.benchmark_transfers import Standins
+
+from .common import free_port
+
+@pytest.fixture
+def standins(tmp_path):
+    # Local aioftp and webMAN stand-ins serving tmp_path / "console"
+    root = tmp_path / "console"
+    # Always there on a console, the staging folder of the archives
+    (root / "dev_hdd0" / "tmp").mkdir(parents=True)
+    # The FTP stand-in logs every client hanging up without QUIT
+    logging.getLogger("aioftp").setLevel(logging.CRITICAL)
+    with Standins(root, ftp_port=free_port(), http_port=free_port()) as standins:
+        yield standins
+
+@pytest.fixture(autouse=True)
+def fresh_limiters(monkeypatch):
+    # get_limiter keeps limiters for the process, a test must not tune the next one
+    monkeypatch.setattr(concurrency, "limiters", {})
@@ -0,0 +1,34 @@
+import datetime
+
+from ps3_lib import commands
+
+# A webMAN file browser page, the last rows are left unclosed like webMAN does
+LISTING = """<html><body><div id="content"><table id="files">
+<tr><td><a class="f" href="..">..</a></td><td> <a href="/">&lt;dir&gt;</a></td><td>01-Jan-2023 10:00</td></tr>
+<tr><td><a class="d" href="/dev_hdd0/game">game</a></td><td> <a href="/x">&lt;dir&gt;</a></td><td>22-Feb-2023 10:11</td></tr>
+<tr><td><a class="w" href="/dev_hdd0/a.bin">a.bin</a></td><td>1,234</td><td>22-Feb-2023 10:11</td></tr>
+<tr><td><a href="/dev_hdd0/b.bin">b.bin</a></td><td>12 KB</td><td>22-Feb-2023 10:11</td></tr>
+<tr><td><a href="/dev_hdd0/café.bin">café.bin</a></td><td>1.5 MB<td>22-Feb-2023 10:11
+<tr><td colspan=3>footer</td></tr>
+</table></div></body></html>""".encode()
+
+def test_parse_listing():
+    entries = commands.parse_listing(LISTING)
+    assert [entry["name"] for entry in entries] == ["game", "a.bin", "b.bin", "café.bin"]
+    game, a, b, cafe = entries
+    assert game["is_dir"] and not a["is_dir"]
+    assert (a["size"], a["size_exact"]) == (1234, True)
+    assert (b["size"], b["size_exact"]) == (12 * 1024, False)
+    assert not cafe["size_exact"]
+    assert a["mtime"] == datetime.datetime(2023, 2, 22, 10, 11)
+
+def test_listing_parser_byte_by_byte():
+    # Chunks split tags, entities and multi-byte characters
+    parser = commands.ListingParser()
+    entries = []
+    for i in range(len(LISTING)):
+        parser.feed(LISTING[i : i + 1])
+        entries += parser.pop_entries()
+    parser.close()
+    entries += parser.pop_entries()
+    assert entries == commands.parse_listing(LISTING)
@@ -0,0 +1,78 @@
+import asyncio
+
+from ps3_lib.file_transfer.concurrency import AdaptiveLimiter, get_limiter
+
+def run_window(limiter, throughput_per_slot, size=1000):
+    # Every slot busy, each transfer moving `size` bytes
+    limiter.active = limiter.limit
+    for _ in range(max(limiter.limit, limiter.min_window)):
+        limiter.record_success(size, size / throughput_per_slot)
+    limiter.active = 0
+
+def test_increase_while_it_pays_off():
+    limiter = AdaptiveLimiter(initial=2, minimum=1, maximum=8)
+    for limit in (3, 4, 5):
+        run_window(limiter, 100)
+        assert limiter.limit == limit
+    assert limiter.best_limit == 4
+
+def test_step_back_without_gain():
+    limiter = AdaptiveLimiter(initial=2, minimum=1, maximum=8)
+    run_window(limiter, 100)
+    assert limiter.limit == 3
+    # Three slots moving what two did
+    run_window(limiter, 100 * 2 / 3)
+    assert limiter.limit == 2
+
+def test_decrease_on_failure():
+    limiter = AdaptiveLimiter(initial=8, minimum=1, maximum=8)
+    limiter.record_failure(TimeoutError())
+    assert limiter.limit == 4
+    # The transfers in flight fail together, once per window
+    limiter.record_failure(TimeoutError())
+    assert limiter.limit == 4
+    run_window(limiter, 100)
+    limiter.record_failure(TimeoutError())
+    assert limiter.limit == 2
+    for _ in range(4):
+        run_window(limiter, 100)
+        limiter.record_failure(TimeoutError())
+    assert limiter.limit == 1
+
+def test_bounds():
+    limiter = AdaptiveLimiter(initial=16, minimum=2, maximum=4)
+    assert limiter.limit == 4
+    for _ in range(3):
+        run_window(limiter, 100)
+    assert limiter.limit == 4
+
+def test_limiters_per_backend_kind():
+    ftp = get_limiter("test-console", "FTP", initial=4, minimum=1, maximum=4)
+    assert get_limiter("test-console", "FTP", initial=8, minimum=1, maximum=8) is ftp
+    assert ftp.maximum == 8
+    assert get_limiter("test-console", "HTTP", initial=2, maximum=2) is not ftp
+
+def test_owner_cap():
+    limiter = AdaptiveLimiter(initial=4, minimum=1, maximum=4)
+    small, big = object(), object()
+
+    async def hold(owner, cap, held, release):
+        async with limiter.slot(owner, cap):
+            held.append(owner)
+            await release.wait()
+
+    async def run():
+        release = asyncio.Event()
+        held = []
+        tasks = [asyncio.create_task(hold(small, 1, held, release)) for _ in range(2)]
+        tasks += [asyncio.create_task(hold(big, 4, held, release)) for _ in range(4)]
+        await asyncio.sleep(0)
+        # The second small one waits for its owner, not for the limit
+        assert held.count(small) == 1 and held.count(big) == 3
+        assert limiter.active_by_owner == {small: 1, big: 3}
+        release.set()
+        await asyncio.gather(*tasks)
+        assert held.count(small) == 2 and held.count(big) == 4
+        assert limiter.active == 0 and not limiter.active_by_owner and not limiter.waiters
+
+    asyncio.run(run())
@@ -0,0 +1,71 @@
+import asyncio
+
+import pytest
+from ps3_lib import PS3, PS3Path, commands
+from ps3_lib.console_files import ConsoleFileOperations
+
+from tools.benchmark_transfers import make_files
+
+from .common import open_backend, run_connected
+
+def run_on(kind, standins, test):
+    # Server side operations are shared by the backends and PS3
+    if kind == "ps3":
+        return asyncio.run(test(PS3(f"http://127.0.0.1:{standins.http_port}")))
+    return run_connected(open_backend(kind, standins), test)
+
+def tree(root):
+    return {
+        str(path.relative_to(root)): path.stat().st_size if path.is_file() else None
+        for path in root.rglob("*")
+    }
+
+@pytest.mark.parametrize("kind", ["ftp", "robust", "http", "ps3"])
+def test_copy_move_delete(standins, kind):
+    source = make_files(
+        standins.root / "dev_hdd0/home/00000001/trophy/NPWR00001_00",
+        {f"FILE{i}.DAT": 1000 + i for i in range(5)} | {"SUB/FILE.DAT": 5},
+    )
+    expected = tree(source)
+    polling = {"timeout": 10, "poll_interval": 0.05}
+
+    async def operate(console):
+        await console.copy(PS3Path("dev_hdd0/home/00000001/trophy/NPWR00001_00"), PS3Path("dev_hdd0/copy"), **polling)
+        await console.copy(PS3Path("dev_hdd0/copy/FILE1.DAT"), PS3Path("dev_hdd0/single.dat"), **polling)
+        await console.move(PS3Path("dev_hdd0/copy"), PS3Path("dev_usb000/moved"), **polling)
+        await console.delete_tree(PS3Path("dev_usb000/moved/SUB"), **polling)
+        with pytest.raises(FileNotFoundError):
+            await console.copy(PS3Path("dev_hdd0/missing"), PS3Path("dev_hdd0/other"), **polling)
+
+    run_on(kind, standins, operate)
+    assert tree(source) == expected
+    assert (standins.root / "dev_hdd0/single.dat").stat().st_size == 1001
+    assert not (standins.root / "dev_hdd0/copy").exists()
+    assert tree(standins.root / "dev_usb000/moved") == {
+        name: size for name, size in expected.items() if not name.startswith("SUB")
+    }
+
+@pytest.mark.parametrize("kind", ["ftp", "ps3"])
+def test_poll_times_out(standins, monkeypatch, kind):
+    make_files(standins.root / "dev_hdd0/source", {"FILE.DAT": 10})
+    # webMAN accepts the command and never does it
+    monkeypatch.setattr(commands, "copy", lambda *args, **kwargs: None)
+    monkeypatch.setattr(commands, "delete", lambda *args, **kwargs: None)
+
+    async def operate(console):
+        with pytest.raises(asyncio.TimeoutError):
+            await console.copy(PS3Path("dev_hdd0/source"), PS3Path("dev_hdd0/copy"), timeout=0.3, poll_interval=0.05)
+        with pytest.raises(asyncio.TimeoutError):
+            await console.delete_tree(PS3Path("dev_hdd0/source"), timeout=0.3, poll_interval=0.05)
+
+    run_on(kind, standins, operate)
+    assert (standins.root / "dev_hdd0/source/FILE.DAT").exists()
+
+def test_hooks_are_abstract():
+    class Incomplete(ConsoleFileOperations):
+        @property
+        def webman_url(self):
+            return "http://127.0.0.1"
+
+    with pytest.raises(TypeError):
+        Incomplete()
@@ -0,0 +1,236 @@
+import filecmp
+
+import ftputil.error
+import pytest
+import requests
+from ps3_lib import PS3Path, commands
+
+from tools.benchmark_transfers import deep_tree_workload, make_files
+
+from .common import open_backend, run_connected
+
+BACKENDS = ("ftp", "robust", "http")
+
+def same_tree(left, right):
+    comparison = filecmp.dircmp(left, right)
+
+    def differences(comparison):
+        return comparison.left_only + comparison.right_only + comparison.diff_files + [
+            difference
+            for subdirectory in comparison.subdirs.values()
+            for difference in differences(subdirectory)
+        ]
+
+    return not differences(comparison)
+
+@pytest.mark.parametrize("kind", BACKENDS)
+def test_send_batched(standins, tmp_path, kind):
+    local = make_files(tmp_path / "local", {f"DIR{i % 3}/FILE{i}.DAT": 100 + i for i in range(20)})
+    destination = PS3Path("dev_hdd0/batched")
+    assert run_connected(open_backend(kind, standins), lambda backend: backend.send_batched(local, destination))
+    assert same_tree(local, standins.root / "dev_hdd0/batched")
+    # The staged archive is gone
+    assert not list((standins.root / "dev_hdd0/tmp").iterdir())
+
+@pytest.mark.parametrize("kind", BACKENDS)
+def test_send_batched_falls_back(standins, tmp_path, monkeypatch, kind):
+    local = make_files(tmp_path / "local", {f"FILE{i}.DAT": 100 + i for i in range(20)})
+    small = make_files(tmp_path / "small", {"FILE.DAT": 10})
+
+    def failing_unzip(*args, **kwargs):
+        raise requests.HTTPError("unzip.ps3 failed")
+
+    monkeypatch.setattr(commands, "unzip", failing_unzip)
+
+    async def send(backend):
+        return [
+            await backend.send_batched(local, PS3Path("dev_hdd0/fallback")),
+            await backend.send_batched(small, PS3Path("dev_hdd0/small")),
+        ]
+
+    # Sent file by file, the extraction failed or the folder is too small
+    assert run_connected(open_backend(kind, standins), send) == [False, False]
+    assert same_tree(local, standins.root / "dev_hdd0/fallback")
+    assert same_tree(small, standins.root / "dev_hdd0/small")
+    assert not list((standins.root / "dev_hdd0/tmp").iterdir())
+
+def test_send_tree_level_by_level(standins, tmp_path):
+    local = make_files(tmp_path / "local", deep_tree_workload(0.01, depth=4))
+    folders = [path for path in local.rglob("*") if path.is_dir()]
+    backend = open_backend("ftp", standins)
+    created = []
+    make_child_directory = backend._make_child_directory
+
+    async def record(path):
+        created.append(str(path))
+        await make_child_directory(path)
+
+    backend._make_child_directory = record
+
+    async def send(backend):
+        await backend.send(local, PS3Path("dev_hdd0/tree"))
+        # Folders already there are fine
+        await backend.send(local, PS3Path("dev_hdd0/tree"))
+
+    run_connected(backend, send)
+    assert same_tree(local, standins.root / "dev_hdd0/tree")
+    assert len(created) == 2 * len(folders)
+    # Parents before children, a whole level at a time
+    depths = [path.count("/") for path in created[: len(folders)]]
+    assert depths == sorted(depths)
+
+@pytest.mark.parametrize("kind", BACKENDS)
+def test_get_tree(standins, tmp_path, kind):
+    remote = PS3Path("dev_hdd0/home/00000001/trophy")
+    source = make_files(standins.root / str(remote), deep_tree_workload(0.01, depth=3))
+    files = sorted(path for path in source.rglob("*") if path.is_file())
+    local = tmp_path / "local"
+    backend = open_backend(kind, standins)
+    zipped = []
+    get_tree_zipped = backend.get_tree_zipped
+
+    async def record(*args, **kwargs):
+        zipped.append(args)
+        return await get_tree_zipped(*args, **kwargs)
+
+    backend.get_tree_zipped = record
+
+    async def mirror(backend):
+        first = await backend.get_tree(remote, local, zip_min_files=0)
+        second = await backend.get_tree(remote, local, zip_min_files=0)
+        (local / "FILE0_0.DAT").write_bytes(b"stale")
+        third = await backend.get_tree(remote, local, zip_min_files=0)
+        zip_all = await backend.get_tree(remote, tmp_path / "zipped", zip_min_files=len(files))
+        return first, second, third, zip_all
+
+    first, second, third, zip_all = run_connected(backend, mirror)
+    assert len(first) == len(files)
+    # Up to date files are skipped
+    assert second == []
+    assert [str(entry.path) for entry in third] == [f"{remote}/FILE0_0.DAT"]
+    assert same_tree(source, local)
+    # Listed timestamps are minute precise
+    assert abs((local / "FILE0_0.DAT").stat().st_mtime - (source / "FILE0_0.DAT").stat().st_mtime) < 60
+    assert len(zipped) == 1 and len(zip_all) == len(files)
+    assert same_tree(source, tmp_path / "zipped")
+
+@pytest.mark.parametrize("kind", BACKENDS)
+def test_verify(standins, tmp_path, monkeypatch, kind):
+    local = make_files(tmp_path / "local", {f"DIR{i % 2}/FILE{i}.DAT": 5000 + i for i in range(6)})
+    remote = standins.root / "dev_hdd0/verified"
+    destination = PS3Path("dev_hdd0/verified")
+
+    def damage():
+        truncated = remote / "DIR1/FILE1.DAT"
+        truncated.write_bytes(truncated.read_bytes()[:100])
+        # Same size, only the hash tells
+        corrupt = remote / "DIR0/FILE2.DAT"
+        data = bytearray(corrupt.read_bytes())
+        data[10] ^= 0xFF
+        corrupt.write_bytes(data)
+
+    async def verify(backend):
+        results = [await backend.send_verified(local, destination)]
+        damage()
+        results.append(await backend.verify(local, destination, resend=False))
+        results.append(await backend.verify(local, destination))
+        return results
+
+    clean, damaged, resent = run_connected(open_backend(kind, standins), verify)
+    assert clean == []
+    assert sorted(map(str, damaged)) == [f"{destination}/DIR0/FILE2.DAT", f"{destination}/DIR1/FILE1.DAT"]
+    assert resent == []
+    assert same_tree(local, remote)
+
+    def no_md5(*args, **kwargs):
+        raise ValueError("no MD5 in the answer")
+
+    # Without md5.ps3 nor downloads nothing can be hashed, nothing is reported verified
+    monkeypatch.setattr(commands, "md5", no_md5)
+    damage()
+
+    async def unverified(backend):
+        return await backend.verify(local, destination, download_fallback=False)
+
+    # Every file comes back, the truncated one after being sent again
+    assert sorted(map(str, run_connected(open_backend(kind, standins), unverified))) == sorted(
+        f"{destination}/DIR{i % 2}/FILE{i}.DAT" for i in range(6)
+    )
+    assert (remote / "DIR1/FILE1.DAT").stat().st_size == 5001
+
+def test_verify_hash_errors(standins, tmp_path):
+    local = make_files(tmp_path / "local", {"A.DAT": 10, "B.DAT": 20})
+    destination = PS3Path("dev_hdd0/errors")
+    backend = open_backend("ftp", standins)
+    remote_md5 = backend._remote_md5
+
+    async def failing_md5(path, download_fallback=True):
+        if str(path).endswith("B.DAT"):
+            raise OSError("connection lost")
+        return await remote_md5(path, download_fallback)
+
+    backend._remote_md5 = failing_md5
+
+    async def send(backend):
+        return await backend.send_verified(local, destination, max_attempts=2)
+
+    # One file failing to hash does not stop the others, and it is not verified
+    assert list(map(str, run_connected(backend, send))) == [f"{destination}/B.DAT"]
+
+@pytest.mark.parametrize("kind", BACKENDS)
+def test_send_names_needing_quoting(standins, tmp_path, kind):
+    name = "A B&url=C%20.DAT"
+    local = make_files(tmp_path / "local", {name: 100})
+    destination = PS3Path(f"dev_hdd0/with space&to=x/{name}")
+    (standins.root / str(destination.parent)).mkdir()
+
+    async def send(backend):
+        await backend.send(local / name, destination)
+
+    run_connected(open_backend(kind, standins), send)
+    assert (standins.root / str(destination)).read_bytes() == (local / name).read_bytes()
+
+def test_http_pushes_capped_by_the_shared_limiter(standins, tmp_path):
+    local = make_files(tmp_path / "local", {f"FILE{i}.DAT": 100 for i in range(8)})
+    # Widens the limiter shared by the HTTP backends of the console
+    open_backend("http", standins, max_concurrent_downloads=8)
+    backend = open_backend("http", standins, max_concurrent_downloads=2)
+    limiter = backend.limiter
+    held = []
+    acquire = limiter.acquire
+
+    async def record(owner=None, cap=None):
+        await acquire(owner, cap)
+        held.append(limiter.active_by_owner[owner])
+
+    limiter.acquire = record
+    run_connected(backend, lambda backend: backend.send(local, PS3Path("dev_hdd0/capped")))
+    # Gated once, by the limiter alone
+    assert backend.downloads_semaphore is None
+    assert limiter.maximum == 8 and len(held) == 8
+    assert max(held) == 2
+    assert same_tree(local, standins.root / "dev_hdd0/capped")
+
+def test_robust_reconnect_reported_once(standins, tmp_path):
+    make_files(standins.root / "dev_hdd0/stat", {"FILE.DAT": 10})
+    backend = open_backend("robust", standins)
+    events = []
+    backend.monitor.on("retry", lambda error: events.append("retry"))
+    backend.monitor.on("reconnect", lambda error: events.append("reconnect"))
+
+    class DroppedHost:
+        def stat(self, path):
+            raise ftputil.error.FTPOSError("connection lost")
+
+        def close(self):
+            pass
+
+    async def stat(backend):
+        backend.host = DroppedHost()
+        return await backend.stat(PS3Path("dev_hdd0/stat/FILE.DAT"))
+
+    assert run_connected(backend, stat).st_size == 10
+    # A limiter watching the monitor sees a single failure
+    assert events == ["reconnect"]
+    summary = backend.monitor.summary()
+    assert summary["reconnects"] == 1 and summary["retries"] == 1
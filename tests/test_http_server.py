@@ -0,0 +1,81 @@
+import asyncio
+import os
+
+from ps3_lib.file_transfer.http_server import FileRoute, FileRouteResponse
+
+DATA = os.urandom(1000)
+
+def respond(route, range_header=None):
+    # One GET through the ASGI interface, as uvicorn runs it
+    headers = [(b"range", range_header.encode())] if range_header else []
+    scope = {"type": "http", "method": "GET", "path": "/", "headers": headers, "extensions": {}}
+    messages = []
+
+    async def receive():
+        # The client never hangs up
+        await asyncio.Event().wait()
+
+    async def send(message):
+        messages.append(message)
+
+    asyncio.run(FileRouteResponse(route, filename="file.bin")(scope, receive, send))
+    body = b"".join(message.get("body", b"") for message in messages[1:])
+    return messages[0]["status"], body
+
+def make_route(tmp_path):
+    path = tmp_path / "file.bin"
+    path.write_bytes(DATA)
+    return FileRoute("route", path)
+
+def test_done_once_every_byte_was_sent(tmp_path):
+    path = tmp_path / "file.bin"
+    path.write_bytes(bytes(1000))
+    route = FileRoute("route", path)
+    route.add_completed(0, 500)
+    route.add_completed(0, 500)
+    assert not route.done.is_set()
+    route.add_completed(400, 900)
+    assert route.completed == [(0, 900)]
+    assert not route.done.is_set()
+    route.add_completed(900, 1000)
+    assert route.done.is_set()
+
+def test_served_is_progress_only(tmp_path):
+    path = tmp_path / "file.bin"
+    path.write_bytes(bytes(1000))
+    progress = []
+    route = FileRoute("route", path, on_served=progress.append)
+    route.add_served(600)
+    route.add_served(600)
+    assert progress == [600, 600]
+    assert not route.done.is_set()
+
+def test_full_response(tmp_path):
+    route = make_route(tmp_path)
+    assert respond(route) == (200, DATA)
+    assert route.done.is_set()
+    assert route.served == len(DATA)
+
+def test_partial_responses(tmp_path):
+    route = make_route(tmp_path)
+    assert respond(route, "bytes=0-99") == (206, DATA[:100])
+    assert route.completed == [(0, 100)]
+    assert not route.done.is_set()
+    # The rest, like the parallel parts of a download
+    assert respond(route, "bytes=100-") == (206, DATA[100:])
+    assert route.done.is_set()
+
+def test_partial_response_of_the_whole_file(tmp_path):
+    route = make_route(tmp_path)
+    assert respond(route, "bytes=0-999") == (206, DATA)
+    assert route.done.is_set()
+
+def test_multipart_response(tmp_path):
+    route = make_route(tmp_path)
+    status, body = respond(route, "bytes=0-99,200-299")
+    assert status == 206
+    assert DATA[:100] in body and DATA[200:300] in body
+    assert route.completed == [(0, 100), (200, 300)]
+    assert not route.done.is_set()
+    respond(route, "bytes=100-199,300-999")
+    assert route.done.is_set()
@@ -0,0 +1,90 @@
+import os
+import asyncio
+
+from ps3_lib import PS3, commands
+
+from tools.benchmark_transfers import make_files
+
+from .common import make_registry
+
+def walk(ps3, top, prune=(), onerror=None):
+    async def collect():
+        found = {}
+        async for folder, folder_names, file_names in ps3.walk(top, onerror=onerror):
+            folder_names[:] = [name for name in folder_names if name not in prune]
+            found[str(folder)] = (sorted(folder_names), sorted(file_names))
+        return found
+
+    return asyncio.run(collect())
+
+def test_walk(standins, monkeypatch):
+    make_files(
+        standins.root / "dev_hdd0/home",
+        {"00000001/trophy/A/TROPUSR.DAT": 10, "00000001/trophy/B/TROPUSR.DAT": 10, "00000002/SKIP/FILE": 1},
+    )
+    ps3 = PS3(f"http://127.0.0.1:{standins.http_port}")
+    assert walk(ps3, "dev_hdd0/home", prune=["SKIP"]) == {
+        "dev_hdd0/home": (["00000001", "00000002"], []),
+        "dev_hdd0/home/00000001": (["trophy"], []),
+        "dev_hdd0/home/00000001/trophy": (["A", "B"], []),
+        "dev_hdd0/home/00000001/trophy/A": ([], ["TROPUSR.DAT"]),
+        "dev_hdd0/home/00000001/trophy/B": ([], ["TROPUSR.DAT"]),
+        "dev_hdd0/home/00000002": ([], []),
+    }
+
+    errors = []
+    assert walk(ps3, "dev_hdd0/missing", onerror=errors.append) == {}
+    # Not found, from raise_for_status
+    assert errors[0].response.status_code == 404
+
+    listdir_entries = commands.listdir_entries
+
+    def unreadable(url, path, *args, **kwargs):
+        if path.endswith("/A"):
+            raise ValueError("unreadable listing")
+        return listdir_entries(url, path, *args, **kwargs)
+
+    monkeypatch.setattr(commands, "listdir_entries", unreadable)
+    errors.clear()
+    found = walk(ps3, "dev_hdd0/home/00000001", onerror=errors.append)
+    assert "dev_hdd0/home/00000001/trophy/B" in found
+    assert "dev_hdd0/home/00000001/trophy/A" not in found
+    assert [str(error) for error in errors] == ["unreadable listing"]
+
+def test_registry_cache(standins, tmp_path, monkeypatch):
+    registry = standins.root / "dev_flash2/etc/xRegistry.sys"
+    registry.parent.mkdir(parents=True)
+    registry.write_bytes(make_registry(8))
+    downloads = []
+
+    def open_console():
+        ps3 = PS3(f"http://127.0.0.1:{standins.http_port}", registry_cache_folder=tmp_path / "cache")
+        get_file = ps3.get_file
+        ps3.get_file = lambda path: downloads.append(path) or get_file(path)
+        return ps3
+
+    ps3 = open_console()
+    assert ps3.get_account_id("00000003") == b"0000000000000003"
+    cached = ps3.registry[1]
+    assert ps3.get_account_id("00000005") == b"0000000000000005"
+    # Same MD5, kept in memory
+    assert ps3.registry[1] is cached and len(downloads) == 1
+    # Then on disk for the next session
+    assert len(open_console().get_account_ids()) == 8 and len(downloads) == 1
+
+    # Same size and timestamp, only the content tells
+    stat = registry.stat()
+    registry.write_bytes(make_registry(9))
+    os.utime(registry, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+    assert ps3.get_account_id("00000009") == b"0000000000000009"
+    assert len(downloads) == 2
+    assert len(open_console().get_account_ids()) == 9 and len(downloads) == 2
+
+    def no_md5(*args, **kwargs):
+        raise ValueError("no MD5 in the answer")
+
+    # The cache cannot be trusted without md5.ps3
+    monkeypatch.setattr(commands, "md5", no_md5)
+    ps3.get_account_id("00000001")
+    ps3.get_account_id("00000001")
+    assert len(downloads) == 4
@@ -0,0 +1,89 @@
+import io
+import os
+
+from ps3_lib import SFO, PS3RemoteFile, XRegistry
+
+from .common import make_registry
+
+DATA = os.urandom(100_000)
+
+def open_remote(data=DATA, **kwargs):
+    ranges = []
+
+    def read_range(offset, size):
+        ranges.append((offset, size))
+        return data[offset : offset + size]
+
+    return PS3RemoteFile(read_range, len(data), block_size=1024, **kwargs), ranges
+
+def test_reads():
+    remote, _ = open_remote()
+    assert remote.read(10) == DATA[:10]
+    remote.seek(50_000)
+    assert remote.read(3000) == DATA[50_000:53_000]
+    remote.seek(-5, io.SEEK_END)
+    assert remote.read() == DATA[-5:]
+    assert remote.read(10) == b""
+    remote.seek(0)
+    assert remote.readall() == DATA
+
+def test_blocks_are_cached():
+    remote, ranges = open_remote()
+    remote.seek(5000)
+    remote.read(100)
+    assert ranges == [(4 * 1024, 1024)]
+    remote.seek(4500)
+    remote.read(200)
+    # Same block, no request
+    assert len(ranges) == 1
+    # A read over several blocks is one request
+    remote.seek(20_000)
+    remote.read(4000)
+    assert ranges[1] == (19 * 1024, 5 * 1024)
+
+def test_sequential_readahead():
+    remote, ranges = open_remote(max_readahead_blocks=8)
+    for _ in range(40):
+        remote.read(1024)
+    # The window grows with sequential reads, far less than one request per block
+    assert len(ranges) < 10
+    assert max(size for _, size in ranges) == 9 * 1024
+    assert remote.bytes_fetched == sum(size for _, size in ranges)
+
+def test_cache_is_bounded():
+    remote, ranges = open_remote(cache_blocks=4)
+    for block in range(0, 90, 10):
+        remote.seek(block * 1024)
+        remote.read(1)
+    assert len(remote.blocks) <= 4
+    remote.seek(0)
+    remote.read(1)
+    # Evicted, fetched again
+    assert ranges[-1] == (0, 1024)
+
+def test_sfo_reads_only_what_it_uses():
+    sfo = SFO.new()
+    sfo.add("ACCOUNTID", b"0" * 16)
+    sfo.add("TITLE", b"title\x00", max_length=192 * 1024)
+    data = bytes(sfo)
+    remote, _ = open_remote(data)
+    parsed = SFO.from_buffer(remote)
+    assert parsed["TITLE"].value == b"title\x00"
+    assert parsed["ACCOUNTID"].value == b"0" * 16
+    # The header, the tables and the start of the values, not the padding
+    assert remote.bytes_fetched <= 2 * 1024 < len(data)
+    assert bytes(parsed) == data
+
+def test_registry_reads_only_what_it_uses():
+    data = make_registry(4)
+    remote, _ = open_remote(data)
+    registry = XRegistry.from_buffer(remote)
+    assert [(entry.key.key, entry.value.processed_value) for entry in registry] == [
+        (entry.key.key, entry.value.processed_value) for entry in XRegistry.from_bytes(data)
+    ]
+    assert remote.bytes_fetched <= 8 * 1024
+    remote, _ = open_remote(data)
+    key = "/setting/user/00000001/npaccount/accountid"
+    assert XRegistry.find_values(remote, [key]) == {key: b"0000000000000001"}
+    # The first key record block and the first chunk of values
+    assert remote.bytes_fetched <= 5 * 1024
@@ -3,8 +3,11 @@ from pathlib import Path
 
 import pytest
 from ps3_lib import SFO
+from ps3_lib.sfo import SFOHeader, SFOIndexTable
 
-from .common import get_dummy_npuserid, get_npuserid
+from tools.common import TROPHY_PARAMS
+
+from .common import get_dummy_npuserid, get_npuserid, make_sfo
 
 _test_params = pytest.mark.parametrize(
     "sfo_path", set(Path().glob("**/test_trophies/*/PARAM.SFO"))
@@ -31,5 +34,119 @@ def test_write(sfo_path):
     assert len(modified) == len(original)
     assert SFO.from_bytes(modified)["ACCOUNTID"].value == get_dummy_npuserid().encode()
 
+def test_round_trip():
+    data = make_sfo(7)
+    sfo = SFO.from_bytes(data)
+    assert bytes(sfo) == data
+    assert sfo["TITLE"].value == b"title 7\x00"
+    assert sfo["ATTRIBUTE"].value == (7).to_bytes(4, "little")
+    # Every value read, nothing changed
+    [param.value for param in sfo.params]
+    assert bytes(sfo) == data
+
+def test_update_keeps_layout():
+    data = make_sfo(1)
+    sfo = SFO.from_bytes(data)
+    sfo["ACCOUNTID"] = b"0123456789abcdef"
+    modified = bytes(sfo)
+    assert len(modified) == len(data)
+    assert SFO.from_bytes(modified)["ACCOUNTID"].value == b"0123456789abcdef"
+    with pytest.raises(AssertionError):
+        sfo["ACCOUNTID"] = b"0" * 17
+
+def test_tables_codec():
+    data = make_sfo(5)
+    sfo = SFO.from_bytes(data)
+    key_table_offset = sfo.header.key_table_offset
+    assert bytes(sfo.header) == data[:20]
+    assert bytes(sfo.index_table) == data[20:key_table_offset]
+    header = SFOHeader.from_bytes(bytes(sfo.header))
+    assert (header.num_entries, header.key_table_offset) == (len(TROPHY_PARAMS), key_table_offset)
+    index_table = SFOIndexTable.from_bytes(data[20:key_table_offset])
+    assert [entry.param_max_length for entry in index_table] == [length for _, _, length in TROPHY_PARAMS]
+    assert index_table[1].param_format == 0x0404
+
+def test_patch_file(tmp_path):
+    path = tmp_path / "PARAM.SFO"
+    path.write_bytes(make_sfo(3))
+    assert SFO.patch_file(path, {"ACCOUNTID": b"f" * 16, "TITLE": b"short\x00"}) == ["ACCOUNTID", "TITLE"]
+    # Unchanged values are not written
+    assert SFO.patch_file(path, {"ACCOUNTID": b"f" * 16}) == []
+    patched = path.read_bytes()
+    assert len(patched) == len(make_sfo(3))
+    sfo = SFO.from_bytes(patched)
+    assert sfo["ACCOUNTID"].value == b"f" * 16
+    assert sfo["TITLE"].value == b"short\x00"
+    # The stale end of the longer value is cleared
+    assert patched == bytes(sfo)
+
+def test_patch_file_too_long(tmp_path):
+    path = tmp_path / "PARAM.SFO"
+    path.write_bytes(make_sfo(3))
+    with pytest.raises(ValueError):
+        SFO.patch_file(path, {"TITLE": b"t\x00", "ACCOUNTID": b"f" * 17})
+    # Checked before anything is written
+    assert path.read_bytes() == make_sfo(3)
+
+def test_patch_needs_writable_buffer():
+    with pytest.raises(TypeError):
+        SFO.from_bytes(make_sfo(0)).patch({"ACCOUNTID": b"f" * 16})
+
+def test_release():
+    data = bytearray(make_sfo(4))
+    sfo = SFO.from_view(data)
+    sfo.release()
+    # Values never read before the release are still there
+    assert sfo["TITLEID000"].value == b"titleid000 4\x00"
+    assert bytes(sfo) == data
+
+def test_add_relayout():
+    sfo = SFO.from_bytes(make_sfo(2))
+    sfo.add("APP_VER", b"01.00\x00")
+    sfo.add("VERSION", b"01.00\x00")
+    with pytest.raises(KeyError):
+        sfo.add("TITLE", b"twice\x00")
+    parsed = SFO.from_bytes(bytes(sfo))
+    keys = [param.key for param in parsed.params]
+    assert keys == sorted(keys)
+    assert parsed["APP_VER"].value == b"01.00\x00"
+    assert parsed["VERSION"].value == b"01.00\x00"
+    assert parsed["TITLE"].value == b"title 2\x00"
+    assert parsed.header.key_table_offset % 4 == 0
+    assert parsed.header.data_table_offset % 4 == 0
+    assert all(entry.data_offset % 4 == 0 for entry in parsed.index_table)
+    # Laid out like the console, writing it again changes nothing
+    assert bytes(parsed) == bytes(sfo)
+
+def test_new():
+    sfo = SFO.new()
+    sfo.add("TITLE", b"title\x00")
+    sfo.add("ACCOUNTID", b"0" * 16)
+    parsed = SFO.from_bytes(bytes(sfo))
+    assert [param.key for param in parsed.params] == ["ACCOUNTID", "TITLE"]
+    assert parsed["ACCOUNTID"].value == b"0" * 16
+
+def test_merge():
+    target = SFO.from_bytes(make_sfo(1))
+    template = SFO.from_bytes(make_sfo(2))
+    template["PARAMS"] = b"p" * 32
+    merged = target.merge(template)
+    assert merged["ACCOUNTID"].value == template["ACCOUNTID"].value
+    assert merged["PARAMS"].value == b"p" * 32
+    assert merged["TITLE"].value == b"title 1\x00"
+    # The target itself is left alone
+    assert target["ACCOUNTID"].value == f"{1:016x}".encode()
+    assert target.merge(template, copy_title=True)["TITLE"].value == b"title 2\x00"
+
+def test_merge_grows_values():
+    target = SFO.from_bytes(make_sfo(1))
+    template = SFO.from_bytes(make_sfo(2))
+    template["DETAIL"].related_index_table_entry.param_max_length = 128
+    template["DETAIL"] = b"d" * 100 + b"\x00"
+    merged = SFO.from_bytes(bytes(target.merge(template, copy_detail=True)))
+    assert merged["DETAIL"].value == b"d" * 100 + b"\x00"
+    assert merged["DETAIL"].max_length >= 101
+    assert merged["TITLE"].value == b"title 1\x00"
+
 if __name__ == "__main__":
     pytest.main()
@@ -0,0 +1,24 @@
+from ps3_lib import scan_sfos
+
+from .common import make_sfo
+
+def test_scan_sfos(tmp_path):
+    for index in range(3):
+        folder = tmp_path / f"NPWR0000{index}_00"
+        folder.mkdir()
+        (folder / "PARAM.SFO").write_bytes(make_sfo(index))
+    corrupt = tmp_path / "CORRUPT" / "PARAM.SFO"
+    corrupt.parent.mkdir()
+    corrupt.write_bytes(b"not an sfo")
+    (tmp_path / "OTHER.SFO").write_bytes(make_sfo(9))
+
+    catalogue = scan_sfos(tmp_path, max_workers=0)
+    assert len(catalogue) == 4
+    assert len(catalogue.valid) == 3
+    errors = list(catalogue.errors.rows())
+    assert len(errors) == 1
+    assert errors[0]["path"] == str(corrupt)
+    assert errors[0]["error"].startswith("ValueError")
+    assert errors[0]["title_id"] == ""
+    assert sorted(catalogue.valid["title_id"].tolist()) == [f"titleid000 {index}" for index in range(3)]
+    assert sorted(catalogue.valid["account_id"].tolist()) == [f"{index:016x}" for index in range(3)]
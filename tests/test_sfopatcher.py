@@ -0,0 +1,32 @@
+import asyncio
+import shutil
+
+import pytest
+from ps3_lib import SFO
+from pfd_sfo_toolset import SFOPatcher
+
+from .common import make_sfo
+
+def build(patcher, tmp_path, name, **kwargs):
+    input_file = tmp_path / "PARAM.SFO"
+    tpl_file = tmp_path / "TEMPLATE.SFO"
+    input_file.write_bytes(make_sfo(1))
+    tpl_file.write_bytes(make_sfo(2))
+    output_file = tmp_path / name
+    asyncio.run(patcher.build(str(input_file), str(tpl_file), str(output_file), **kwargs))
+    return output_file.read_bytes()
+
+def test_default_is_the_binary():
+    assert SFOPatcher().binary_path == "sfopatcher"
+
+@pytest.mark.parametrize("copy_title", [False, True])
+def test_native_build(tmp_path, copy_title):
+    built = SFO.from_bytes(build(SFOPatcher(binary_path=None), tmp_path, "NATIVE.SFO", copy_title=copy_title))
+    assert built["ACCOUNTID"].value == f"{2:016x}".encode()
+    assert built["TITLE"].value == (b"title 2\x00" if copy_title else b"title 1\x00")
+
+@pytest.mark.skipif(shutil.which("sfopatcher") is None, reason="sfopatcher is not installed")
+@pytest.mark.parametrize("options", [{}, {"copy_title": True}, {"copy_title": True, "copy_detail": True}])
+def test_same_output_as_sfopatcher(tmp_path, options):
+    native = build(SFOPatcher(binary_path=None), tmp_path, "NATIVE.SFO", **options)
+    assert build(SFOPatcher(), tmp_path, "BINARY.SFO", **options) == native
@@ -0,0 +1,81 @@
+import io
+import subprocess
+
+import pytest
+from ps3_lib import XRegistry
+
+from tools.common import USER_SETTINGS, XREGISTRY_BASELINE, load_revision
+
+from .common import make_registry
+
+def load_legacy_xregistry():
+    # The slicing parser the cursor one replaced, as it is in the git history
+    try:
+        return load_revision(XREGISTRY_BASELINE, "ps3_lib/xregistry.py", "xregistry_slicing")
+    except (OSError, subprocess.CalledProcessError) as error:
+        pytest.skip(f"The slicing parser cannot be loaded from git: {error}")
+
+@pytest.mark.parametrize("users", [1, 4, 32])
+def test_same_entries_as_legacy(users):
+    data = make_registry(users)
+    legacy = load_legacy_xregistry().XRegistry.from_bytes(data)
+    registry = XRegistry.from_bytes(data)
+    assert len(registry) == len(USER_SETTINGS) * users
+    assert [(entry.key.key, entry.value.processed_value) for entry in registry.entries] == [
+        (entry.key.key, entry.value.processed_value) for entry in legacy.entries
+    ]
+
+def test_lookups():
+    registry = XRegistry.from_bytes(make_registry(4))
+    assert registry.get_value("/setting/user/00000002/npaccount/accountid") == b"0000000000000002"
+    assert registry.get_value("/setting/user/00000003/theme/color") == 3
+    assert registry.get_value("/setting/user/00000009/username", "missing") == "missing"
+    assert "/setting/user/00000001/username" in registry
+    assert registry.keys("/setting/user/00000004/npaccount/") == [
+        "/setting/user/00000004/npaccount/accountid",
+        "/setting/user/00000004/npaccount/autologin",
+        "/setting/user/00000004/npaccount/loginid",
+        "/setting/user/00000004/npaccount/password",
+    ]
+    assert registry.query("/setting/user/00000001/theme/") == {
+        "/setting/user/00000001/theme/color": 1,
+        "/setting/user/00000001/theme/wallpaper": b"theme/wallpaper 1",
+    }
+    assert registry.subtree("/setting/user/00000002/npaccount")["accountid"] == b"0000000000000002"
+    with pytest.raises(KeyError):
+        registry.subtree("/setting/user/00000009")
+
+def test_find_values():
+    data = make_registry(8)
+    registry = XRegistry.from_bytes(data)
+    keys = [
+        "/setting/user/00000001/npaccount/accountid",
+        "/setting/user/00000008/theme/color",
+        "/setting/user/00000009/username",
+    ]
+    expected = {key: registry.get_value(key) for key in keys[:2]}
+    assert XRegistry.find_values(data, keys) == expected
+    # From a file, read only as far as the keys
+    assert XRegistry.find_values(io.BytesIO(data), keys) == expected
+    source = io.BytesIO(data)
+    assert XRegistry.find_values(source, keys[:1], chunk_size=64) == {keys[0]: b"0000000000000001"}
+    assert source.tell() < len(data)
+
+def test_entries_write_back():
+    registry = XRegistry.from_bytes(make_registry(2))
+    entries = registry.entries
+    assert registry.entries is entries and len(entries) == 2 * len(USER_SETTINGS)
+    assert registry.get_value("/setting/user/00000002/theme/color") == 2
+    # In place
+    entries[registry.index["/setting/user/00000002/theme/color"]].value.value = (7).to_bytes(4, "big")
+    assert registry.get_value("/setting/user/00000002/theme/color") == 7
+    # Added and removed, the lookups follow
+    added = XRegistry.from_bytes(make_registry(3)).get_entry("/setting/user/00000003/username")
+    entries.append(added)
+    assert registry.get_value("/setting/user/00000003/username") == b"username 3"
+    assert registry.keys("/setting/user/00000003/") == ["/setting/user/00000003/username"]
+    del entries[0]
+    assert "/setting/user/00000001/npaccount/accountid" not in registry
+    assert len(registry) == 2 * len(USER_SETTINGS)
+    registry.entries = entries[:2]
+    assert len(registry) == 2 and len(registry.entries) == 2
@@ -0,0 +1,71 @@
+import io
+import random
+import zipfile
+
+import pytest
+from ps3_lib.file_transfer.zip_stream import ZipStreamExtractor
+
+FILES = {
+    # Does not compress, the archive is as long as the data
+    "dev_hdd0/save/a.txt": random.Random(0).randbytes(20_000),
+    "dev_hdd0/save/sub/b.txt": b"world",
+    "dev_hdd0/save/empty.txt": b"",
+}
+
+class Unseekable(io.RawIOBase):
+    # zipfile writes data descriptors when it cannot seek back to the local headers
+    def __init__(self):
+        self.data = bytearray()
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self.data += data
+        return len(data)
+
+def make_zip(seekable: bool) -> bytes:
+    output = io.BytesIO() if seekable else Unseekable()
+    with zipfile.ZipFile(output, "w", compression=zipfile.ZIP_DEFLATED) as zip_file:
+        for name, data in FILES.items():
+            zip_file.writestr(name, data)
+    return output.getvalue() if seekable else bytes(output.data)
+
+@pytest.mark.parametrize("seekable", [True, False], ids=["sizes", "data_descriptors"])
+def test_extract_in_chunks(tmp_path, seekable):
+    data = make_zip(seekable)
+    with zipfile.ZipFile(io.BytesIO(data)) as zip_file:
+        assert all(bool(info.flag_bits & 0x08) != seekable for info in zip_file.infolist())
+    extractor = ZipStreamExtractor(tmp_path, ("dev_hdd0/save/",))
+    for i in range(0, len(data), 7):
+        extractor.feed(data[i : i + 7])
+    extractor.close()
+    assert {path.relative_to(tmp_path).as_posix(): path.read_bytes() for path in extractor.extracted} == {
+        name[len("dev_hdd0/save/") :]: content for name, content in FILES.items()
+    }
+
+def test_truncated_archive(tmp_path):
+    data = make_zip(True)
+    extractor = ZipStreamExtractor(tmp_path, ("dev_hdd0/save/",))
+    extractor.feed(data[:10_000])
+    with pytest.raises(EOFError):
+        extractor.close()
+    # The member being written is closed and removed
+    assert extractor.member is None
+    assert not (tmp_path / "a.txt").exists()
+
+def test_corrupt_member(tmp_path):
+    data = bytearray(make_zip(True))
+    data[60] ^= 0xFF
+    extractor = ZipStreamExtractor(tmp_path, ("dev_hdd0/save/",))
+    with pytest.raises(Exception):
+        extractor.feed(bytes(data))
+    assert extractor.member is None
+    assert not (tmp_path / "a.txt").exists()
+
+def test_unsafe_path(tmp_path):
+    output = io.BytesIO()
+    with zipfile.ZipFile(output, "w") as zip_file:
+        zip_file.writestr("../escape.txt", b"x")
+    with pytest.raises(ValueError):
+        ZipStreamExtractor(tmp_path / "root").feed(output.getvalue())
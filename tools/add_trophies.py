@@ -12,7 +12,6 @@ from pfd_sfo_toolset import PFDTool
 from ps3_lib import (
     PS3,
     SFO,
-    XRegistry,
     PS3_LED_COLORS,
     PS3_LED_MODES,
     PS3_INPUT,
@@ -44,6 +43,9 @@ class PS3TrophyToolset:
             **file_transfer_backend_kwargs,
         }
         self.file_transfer = file_transfer_backend(**file_transfer_backend_kwargs)
+        self.file_transfer.monitor.on(
+            "reconnect", lambda error: print(f"Reconnected to the console after {error!r}")
+        )
 
     async def update_and_upload_trophy_folder(
         self, path: Path | str, account_id: bytes
@@ -83,8 +85,7 @@ class PS3TrophyToolset:
         title_id = sfo["TITLEID000"].value.decode()
         np_comm_id = sfo["NPCOMMID"].value.decode()
 
-        sfo["ACCOUNTID"] = account_id
-        sfo.to_file(sfo_path)
+        SFO.patch_file(sfo_path, {"ACCOUNTID": account_id})
 
         await pfd_tool.update(self.TEMP_TROPHY_DATA_SUFFIX, "PARAM.SFO", game=title_id)
         return np_comm_id
@@ -97,23 +98,18 @@ class PS3TrophyToolset:
             / "trophy"
             / np_comm_id
         )
-        await self.file_transfer.send(path, trophy_dir)
+        await self.file_transfer.send_batched(path, trophy_dir)
 
     def get_account_id(self) -> bytes:
         user_id = self.ps3.get_current_user_id()
-        registry = XRegistry.from_bytes(
-            self.ps3.get_file("/dev_flash2/etc/xRegistry.sys")
-        )
-        try:
-            account_id = registry.hierarchy["setting"]["user"][user_id]["npaccount"][
-                "accountid"
-            ]
-            if not account_id:
-                raise ValueError(
-                    f"The current account id is blank, the user {user_id} is not logged in"
-                )
-        except KeyError:
+        # Served from the local registry cache unless the console registry changed
+        account_id = self.ps3.get_account_id(user_id)
+        if account_id is None:
             raise ValueError("The current account id has no account id in the registry")
+        if not account_id:
+            raise ValueError(
+                f"The current account id is blank, the user {user_id} is not logged in"
+            )
 
         return account_id
 
@@ -159,6 +155,11 @@ class PS3TrophyToolset:
                 PS3Path("dev_hdd0") / "home" / self.ps3.get_current_user_id() / "trophy"
             )
             await self.update_and_upload_trophy_folder(trophy_folder, account_id)
+            summary = self.file_transfer.monitor.summary()
+            print(
+                f"Uploaded {summary['files']} files ({summary['bytes']} bytes) in {summary['seconds']:.2f}s, "
+                f"{summary['throughput'] / 1024:.1f} KiB/s, {summary['retries']} retries, {summary['reconnects']} reconnects"
+            )
             await self.ps3.rebuild_database()
 
         except Exception as e:
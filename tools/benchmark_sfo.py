@@ -0,0 +1,155 @@
+"""
+Benchmarks the SFO parser against the pydantic one it replaced, loaded from git history
+
+Synthetic trophy PARAM.SFO files are generated, then parsed by both implementations:
+parsing alone, reading a single key (what a catalogue scan does),
+reading every value, patching ACCOUNTID then serializing, and repeated key lookups.
+The current implementation is also timed over files on disk, mapped or read,
+and patched in place or rewritten.
+
+Results are written as JSON, one record per implementation and operation.
+"""
+import sys
+import json
+import mmap
+import tempfile
+from pathlib import Path
+
+import fire
+
+if __package__ in (None, ""):
+    # Run as a script, tools/ is on the path instead of the repository root
+    sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from ps3_lib import SFO
+
+from tools.common import SFO_BASELINE, TROPHY_PARAMS, load_revision, make_sfo, timed
+
+
+def operations(sfo_class, blobs: list[bytes]) -> dict:
+    account_id = b"0123456789abcdef"
+
+    def parse():
+        for blob in blobs:
+            sfo_class.from_bytes(blob)
+
+    def read_one():
+        for blob in blobs:
+            sfo_class.from_bytes(blob)["TITLEID000"].value
+
+    def read_all():
+        for blob in blobs:
+            for param in sfo_class.from_bytes(blob).params:
+                param.key, param.value
+
+    def patch():
+        for blob in blobs:
+            sfo = sfo_class.from_bytes(blob)
+            sfo["ACCOUNTID"] = account_id
+            bytes(sfo)
+
+    def lookups():
+        # Bulk patching jobs look the same keys up over and over
+        sfo = sfo_class.from_bytes(blobs[0])
+        for _ in blobs:
+            for key, _, _ in TROPHY_PARAMS:
+                key in sfo and sfo[key]
+
+    return {
+        "parse": parse,
+        "read_one": read_one,
+        "read_all": read_all,
+        "patch": patch,
+        "lookups": lookups,
+    }
+
+
+def main(count=5000, repeat=5, baseline=SFO_BASELINE, output=None):
+    """
+    baseline: git revision of the pydantic parser, the last one before the memoryview parser by default
+    """
+    blobs = [make_sfo(i) for i in range(count)]
+    implementations = {
+        "current": SFO,
+        "baseline": load_revision(baseline, "ps3_lib/sfo.py", "sfo_pydantic").SFO,
+    }
+    # Both must agree before their speed means anything
+    for blob in blobs[:10]:
+        assert [tuple(p) for p in implementations["current"].from_bytes(blob).params] == [
+            tuple(p) for p in implementations["baseline"].from_bytes(blob).params
+        ]
+    results = []
+    for name, sfo_class in implementations.items():
+        for operation, run in operations(sfo_class, blobs).items():
+            seconds = timed(run, repeat)
+            results.append(
+                {
+                    "implementation": name,
+                    "operation": operation,
+                    "seconds": seconds,
+                    "per_file_us": seconds / count * 1e6,
+                }
+            )
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        paths = []
+        for i, blob in enumerate(blobs):
+            path = Path(tmpdir) / f"{i}.SFO"
+            path.write_bytes(blob)
+            paths.append(path)
+
+        def read_mapped():
+            for path in paths:
+                with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                    sfo = SFO.from_view(mapped)
+                    sfo["TITLEID000"].value
+                    # The view has to go before the map can be closed
+                    del sfo
+
+        def read_files():
+            for path in paths:
+                SFO.from_file(path)["TITLEID000"].value
+
+        # Every run writes a new account id, unchanged values are skipped by patch_file
+        runs = iter(range(1, 2 * repeat + 1))
+
+        def patch_in_place():
+            account_id = f"{next(runs):016x}".encode()
+            for path in paths:
+                SFO.patch_file(path, {"ACCOUNTID": account_id})
+
+        def patch_rewrite():
+            account_id = f"{next(runs):016x}".encode()
+            for path in paths:
+                sfo = SFO.from_file(path)
+                sfo["ACCOUNTID"] = account_id
+                sfo.to_file(path)
+
+        for operation, run in (
+            ("read_one_mmap", read_mapped),
+            ("read_one_file", read_files),
+            ("patch_file_in_place", patch_in_place),
+            ("patch_file_rewrite", patch_rewrite),
+        ):
+            seconds = timed(run, repeat)
+            results.append(
+                {
+                    "implementation": "current",
+                    "operation": operation,
+                    "seconds": seconds,
+                    "per_file_us": seconds / count * 1e6,
+                }
+            )
+
+    report = json.dumps(
+        {"config": {"count": count, "repeat": repeat, "baseline": baseline}, "results": results},
+        indent=2,
+    )
+    if output:
+        Path(output).write_text(report)
+    else:
+        print(report)
+
+
+if __name__ == "__main__":
+    fire.Fire(main)
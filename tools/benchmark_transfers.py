@@ -0,0 +1,515 @@
+"""
+Benchmarks the file transfer backends against local stand-ins of the console
+
+The stand-ins are an aioftp server and a small webMAN look-alike (file serving with
+Range support, mkdir.ps3, delete.ps3, copy.ps3,
+move.ps3, md5.ps3, unzip.ps3, dozip.ps3 and download.ps3), both running on their own
+event loop thread so blocking backends (ftputil) cannot starve them.
+Latency is added to every FTP command and HTTP request, bandwidth is shared by
+all the connections of a stand-in.
+
+Results are written as JSON, one record per backend, workload and operation.
+"""
+import sys
+import json
+import time
+import logging
+import shutil
+import hashlib
+import asyncio
+import zipfile
+import tempfile
+import threading
+import tracemalloc
+from pathlib import Path, PurePosixPath
+
+import fire
+import aioftp
+import aiohttp
+import numpy as np
+from aiohttp import web
+
+if __package__ in (None, ""):
+    # Run as a script, tools/ is on the path instead of the repository root
+    sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from ps3_lib import PS3Path
+from ps3_lib.file_transfer import (
+    PS3FTPFileTransfer,
+    PS3HTTPFileTransfer,
+    PS3RobustFTPFileTransfer,
+)
+
+KIB = 1024
+MIB = 1024 * KIB
+
+
+class Throttle:
+    """
+    Shared link shaping, every chunk reserves its slot on the link
+    """
+
+    def __init__(self, bandwidth: int | None = None) -> None:
+        self.bandwidth = bandwidth
+        self.next_slot = 0.0
+
+    async def consume(self, size: int) -> None:
+        if not self.bandwidth:
+            return
+        loop = asyncio.get_running_loop()
+        start = max(loop.time(), self.next_slot)
+        self.next_slot = start + size / self.bandwidth
+        await asyncio.sleep(self.next_slot - loop.time())
+
+
+class LatencyFTPServer(aioftp.Server):
+    def __init__(self, *args, latency=0.0, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self.latency = latency
+
+    async def parse_command(self, stream, *args, **kwargs):
+        command = await super().parse_command(stream, *args, **kwargs)
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        return command
+
+
+class WebmanStandin:
+    chunk_size = 64 * KIB
+
+    def __init__(self, root: Path, latency=0.0, bandwidth=None) -> None:
+        self.root = Path(root)
+        self.latency = latency
+        self.throttle = Throttle(bandwidth)
+        self.session = None
+        self.runner = None
+
+    def local_path(self, path: str) -> Path:
+        return self.root / path.strip("/")
+
+    @web.middleware
+    async def latency_middleware(self, request, handler):
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        return await handler(request)
+
+    async def start(self, host: str, port: int) -> None:
+        self.session = aiohttp.ClientSession()
+        app = web.Application(middlewares=[self.latency_middleware])
+        app.router.add_get("/mkdir.ps3/{path:.*}", self.mkdir)
+        app.router.add_get("/delete.ps3/{path:.*}", self.delete)
+        app.router.add_get("/download.ps3", self.download)
+        app.router.add_get("/unzip.ps3/{path:.*}", self.unzip)
+        app.router.add_get("/dozip.ps3/{path:.*}", self.dozip)
+        app.router.add_get("/copy.ps3/{path:.*}", self.copy)
+        app.router.add_get("/move.ps3/{path:.*}", self.move)
+        app.router.add_get("/md5.ps3/{path:.*}", self.md5)
+        app.router.add_get("/{path:.*}", self.get)
+        self.runner = web.AppRunner(app, access_log=None)
+        await self.runner.setup()
+        await web.TCPSite(self.runner, host, port).start()
+
+    async def stop(self) -> None:
+        await self.runner.cleanup()
+        await self.session.close()
+
+    async def mkdir(self, request):
+        self.local_path(request.match_info["path"]).mkdir(parents=True, exist_ok=True)
+        return web.Response(text="ok")
+
+    async def delete(self, request):
+        path = self.local_path(request.match_info["path"])
+        if path.is_dir():
+            shutil.rmtree(path)
+        else:
+            path.unlink(missing_ok=True)
+        return web.Response(text="ok")
+
+    async def unzip(self, request):
+        # webMAN takes the destination after the path: /unzip.ps3/<archive>&to=<folder>
+        archive, _, folder = request.match_info["path"].partition("&to=")
+        with zipfile.ZipFile(self.local_path(archive)) as zip_file:
+            zip_file.extractall(self.local_path(folder))
+        return web.Response(text="ok")
+
+    async def dozip(self, request):
+        # Same shape as unzip: /dozip.ps3/<folder>&to=<archive>, members relative to the root
+        folder, _, archive = request.match_info["path"].partition("&to=")
+        folder, archive = self.local_path(folder), self.local_path(archive)
+        archive.parent.mkdir(parents=True, exist_ok=True)
+        with zipfile.ZipFile(archive, "w", compression=zipfile.ZIP_DEFLATED) as zip_file:
+            for path in sorted(folder.rglob("*")):
+                if path.is_file():
+                    zip_file.write(path, path.relative_to(self.root).as_posix())
+        return web.Response(text="ok")
+
+    async def copy(self, request):
+        source, _, destination = request.match_info["path"].partition("&to=")
+        source, destination = self.local_path(source), self.local_path(destination)
+        destination.parent.mkdir(parents=True, exist_ok=True)
+        if source.is_dir():
+            shutil.copytree(source, destination, dirs_exist_ok=True)
+        else:
+            shutil.copy2(source, destination)
+        return web.Response(text="ok")
+
+    async def move(self, request):
+        source, _, destination = request.match_info["path"].partition("&to=")
+        destination = self.local_path(destination)
+        destination.parent.mkdir(parents=True, exist_ok=True)
+        shutil.move(self.local_path(source), destination)
+        return web.Response(text="ok")
+
+    async def md5(self, request):
+        path = self.local_path(request.match_info["path"])
+        if not path.is_file():
+            raise web.HTTPNotFound()
+        digest = await asyncio.to_thread(lambda: hashlib.md5(path.read_bytes()).hexdigest())
+        return web.Response(text=f"<html><body>{path.name}<br>MD5: {digest}</body></html>", content_type="text/html")
+
+    async def download(self, request):
+        url = request.query["url"]
+        folder = self.local_path(request.query.get("to", "/dev_hdd0/packages"))
+        folder.mkdir(parents=True, exist_ok=True)
+        async with self.session.get(url) as response:
+            response.raise_for_status()
+            with open(folder / PurePosixPath(url).name, "wb") as f:
+                async for chunk in response.content.iter_chunked(self.chunk_size):
+                    await self.throttle.consume(len(chunk))
+                    f.write(chunk)
+        return web.Response(text="ok")
+
+    def listing(self, path: Path, request_path: str) -> str:
+        rows = ['<tr><td><a href="..">..</a></td></tr>']
+        for item in sorted(path.iterdir()):
+            href = f"{request_path.rstrip('/')}/{item.name}"
+            size = "&lt;dir&gt;" if item.is_dir() else str(item.stat().st_size)
+            mtime = time.strftime("%d-%b-%Y %H:%M", time.localtime(item.stat().st_mtime))
+            rows.append(
+                f'<tr><td><a href="{href}">{item.name}</a></td><td>{size}</td><td>{mtime}</td></tr>'
+            )
+        return f'<html><body><div id="content"><table id="files">{"".join(rows)}</table></div></body></html>'
+
+    async def get(self, request):
+        path = self.local_path(request.match_info["path"])
+        if path.is_dir():
+            return web.Response(
+                text=self.listing(path, request.path), content_type="text/html"
+            )
+        if not path.is_file():
+            raise web.HTTPNotFound()
+        size = path.stat().st_size
+        start, end = 0, size
+        status = 200
+        headers = {"Accept-Ranges": "bytes"}
+        if request.http_range.start is not None or request.http_range.stop is not None:
+            start, end, _ = request.http_range.indices(size)
+            if start >= end:
+                raise web.HTTPRequestRangeNotSatisfiable(
+                    headers={"Content-Range": f"bytes */{size}"}
+                )
+            status = 206
+            headers["Content-Range"] = f"bytes {start}-{end - 1}/{size}"
+        response = web.StreamResponse(status=status, headers=headers)
+        response.content_type = "application/octet-stream"
+        response.content_length = end - start
+        await response.prepare(request)
+        with open(path, "rb") as f:
+            f.seek(start)
+            remaining = end - start
+            while remaining:
+                chunk = f.read(min(self.chunk_size, remaining))
+                remaining -= len(chunk)
+                await self.throttle.consume(len(chunk))
+                await response.write(chunk)
+        await response.write_eof()
+        return response
+
+
+class Standins:
+    """
+    Runs the stand-in servers on a dedicated event loop thread
+    """
+
+    def __init__(self, root: Path, latency=0.0, bandwidth=None, ftp_port=2121, http_port=8080):
+        self.root = Path(root)
+        self.latency = latency
+        self.bandwidth = bandwidth
+        self.ftp_port = ftp_port
+        self.http_port = http_port
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self.loop.run_forever, daemon=True)
+        self.ftp_server = None
+        self.webman = None
+
+    def run(self, coroutine):
+        return asyncio.run_coroutine_threadsafe(coroutine, self.loop).result()
+
+    async def _start(self):
+        user = aioftp.User(base_path=self.root, home_path="/")
+        self.ftp_server = LatencyFTPServer(
+            [user],
+            latency=self.latency,
+            read_speed_limit=self.bandwidth,
+            write_speed_limit=self.bandwidth,
+        )
+        await self.ftp_server.start("127.0.0.1", self.ftp_port)
+        self.webman = WebmanStandin(self.root, self.latency, self.bandwidth)
+        await self.webman.start("127.0.0.1", self.http_port)
+
+    async def _stop(self):
+        await self.ftp_server.close()
+        await self.webman.stop()
+
+    def __enter__(self):
+        self.thread.start()
+        self.run(self._start())
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.run(self._stop())
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join()
+
+
+def make_files(root: Path, files: dict[str, int]) -> Path:
+    for relative_path, size in files.items():
+        path = root / relative_path
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(path, "wb") as f:
+            while size:
+                block = np.random.bytes(min(size, MIB))
+                f.write(block)
+                size -= len(block)
+    return root
+
+
+def tiny_files_workload(scale=1.0):
+    return {f"TINY{i:05d}.DAT": KIB for i in range(int(500 * scale))}
+
+
+def huge_files_workload(scale=1.0):
+    return {f"HUGE{i}.BIN": int(64 * MIB * scale) for i in range(3)}
+
+
+def deep_tree_workload(scale=1.0, depth=6, branching=2, files_per_folder=4):
+    files = {}
+    folders = [PurePosixPath("")]
+    for level in range(depth):
+        for folder in folders:
+            for i in range(files_per_folder):
+                files[str(folder / f"FILE{level}_{i}.DAT")] = int(16 * KIB * scale)
+        folders = [folder / f"DIR{i}" for folder in folders for i in range(branching)]
+    return files
+
+
+WORKLOADS = {
+    "tiny_files": tiny_files_workload,
+    "huge_files": huge_files_workload,
+    "deep_tree": deep_tree_workload,
+}
+
+BACKENDS = {
+    "ftp": lambda standins: PS3FTPFileTransfer(
+        "127.0.0.1", standins.ftp_port, webman_port=standins.http_port
+    ),
+    "robust": lambda standins: PS3RobustFTPFileTransfer(
+        "127.0.0.1", standins.ftp_port, webman_port=standins.http_port
+    ),
+    "http": lambda standins: PS3HTTPFileTransfer(
+        "127.0.0.1", standins.http_port, server_host="127.0.0.1"
+    ),
+}
+
+# The class names are accepted too
+BACKEND_ALIASES = {
+    "PS3FTPFileTransfer": "ftp",
+    "PS3RobustFTPFileTransfer": "robust",
+    "PS3HTTPFileTransfer": "http",
+}
+
+
+def summarize(backend, workload, operation, files, seconds, latencies, peak_memory, concurrency=None):
+    total_bytes = sum(files.values())
+    return {
+        "backend": backend,
+        "workload": workload,
+        "operation": operation,
+        "files": len(files),
+        "bytes": total_bytes,
+        "seconds": seconds,
+        "throughput_mib_s": total_bytes / MIB / seconds if seconds else None,
+        "latency_p50_ms": float(np.percentile(latencies, 50) * 1000) if latencies else None,
+        "latency_p99_ms": float(np.percentile(latencies, 99) * 1000) if latencies else None,
+        "peak_memory_bytes": peak_memory,
+        "concurrency": concurrency,
+    }
+
+
+async def makedirs(backend, path: PS3Path):
+    # Not every backend creates missing parents
+    parts = PurePosixPath(str(path)).parts
+    for i in range(1, len(parts) + 1):
+        await backend.mkdir(PS3Path("/".join(parts[:i])))
+
+
+async def timed_per_file(operation, paths, concurrency):
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+
+    async def run(path):
+        async with semaphore:
+            start = time.perf_counter()
+            await operation(path)
+            latencies.append(time.perf_counter() - start)
+
+    await asyncio.gather(*(run(path) for path in paths))
+    return latencies
+
+
+async def benchmark_backend(backend_name, backend, workload_name, files, local_root, scratch, concurrency):
+    remote_root = PS3Path("bench") / backend_name / workload_name
+    results = []
+
+    async def measure(operation, coroutine):
+        tracemalloc.reset_peak()
+        start = time.perf_counter()
+        latencies = await coroutine
+        seconds = time.perf_counter() - start
+        _, peak = tracemalloc.get_traced_memory()
+        results.append(
+            summarize(
+                backend_name,
+                workload_name,
+                operation,
+                files,
+                seconds,
+                latencies,
+                peak,
+                backend.concurrency,
+            )
+        )
+
+    async def upload_tree():
+        await backend.send(local_root, remote_root / "tree")
+        return []
+
+    async def upload_batched():
+        await backend.send_batched(local_root, remote_root / "batched")
+        return []
+
+    async def upload(relative_path):
+        await backend.send(local_root / relative_path, remote_root / "files" / relative_path)
+
+    async def download(relative_path):
+        to_path = scratch / relative_path
+        to_path.parent.mkdir(parents=True, exist_ok=True)
+        await backend.get(remote_root / "files" / relative_path, to_path)
+
+    async def download_tree():
+        await backend.get_tree(
+            remote_root / "files", scratch / "tree", max_concurrency=concurrency, zip_min_files=0
+        )
+        return []
+
+    async def download_zipped():
+        await backend.get_tree_zipped(remote_root / "files", scratch / "zipped")
+        return []
+
+    folders = sorted({str(PurePosixPath(path).parent) for path in files} - {"."})
+    await makedirs(backend, remote_root / "files")
+    for folder in folders:
+        await backend.mkdir(remote_root / "files" / folder)
+
+    await makedirs(backend, PS3Path("dev_hdd0/tmp"))
+    await measure("upload_tree", upload_tree())
+    await measure("upload_batched", upload_batched())
+    await measure("upload", timed_per_file(upload, files, concurrency))
+    await measure("download", timed_per_file(download, files, concurrency))
+    await measure("download_tree", download_tree())
+    await measure("download_zipped", download_zipped())
+    return results
+
+
+async def run_benchmarks(backends, workloads, latency, bandwidth, scale, concurrency):
+    results = []
+    with tempfile.TemporaryDirectory() as tmpdir:
+        tmpdir = Path(tmpdir)
+        remote_root = tmpdir / "console"
+        remote_root.mkdir()
+        with Standins(remote_root, latency=latency, bandwidth=bandwidth) as standins:
+            for workload_name in workloads:
+                files = WORKLOADS[workload_name](scale)
+                local_root = make_files(tmpdir / "local" / workload_name, files)
+                for backend_name in backends:
+                    scratch = tmpdir / "scratch" / backend_name / workload_name
+                    backend = BACKENDS[backend_name](standins)
+                    await backend.connect()
+                    try:
+                        results += await benchmark_backend(
+                            backend_name,
+                            backend,
+                            workload_name,
+                            files,
+                            local_root,
+                            scratch,
+                            concurrency,
+                        )
+                    finally:
+                        await backend.disconnect()
+                        shutil.rmtree(scratch, ignore_errors=True)
+                shutil.rmtree(local_root)
+    return results
+
+
+def main(
+    backends=",".join(BACKENDS),
+    workloads=",".join(WORKLOADS),
+    latency=0.0,
+    bandwidth=None,
+    scale=1.0,
+    concurrency=1,
+    output=None,
+):
+    """
+    backends: comma separated, among ftp, robust and http
+    latency: seconds added to every FTP command and HTTP request
+    bandwidth: bytes per second shared by all the connections of a stand-in
+    scale: multiplies the file counts (tiny files) or sizes (other workloads)
+    concurrency: per-file operations in flight, only raise it for backends that support it
+    output: JSON file to write, printed to stdout when omitted
+    """
+    backends = backends.split(",") if isinstance(backends, str) else list(backends)
+    backends = [BACKEND_ALIASES.get(name, name) for name in backends]
+    unknown = [name for name in backends if name not in BACKENDS]
+    assert not unknown, f"Unknown backends {unknown}, available backends are: {list(BACKENDS)}"
+    workloads = workloads.split(",") if isinstance(workloads, str) else list(workloads)
+    # The stand-in logs every client hanging up without QUIT
+    logging.getLogger("aioftp").setLevel(logging.CRITICAL)
+    tracemalloc.start()
+    try:
+        results = asyncio.run(
+            run_benchmarks(backends, workloads, latency, bandwidth, scale, concurrency)
+        )
+    finally:
+        tracemalloc.stop()
+    report = json.dumps(
+        {
+            "config": {
+                "latency": latency,
+                "bandwidth": bandwidth,
+                "scale": scale,
+                "concurrency": concurrency,
+            },
+            "results": results,
+        },
+        indent=2,
+    )
+    if output:
+        Path(output).write_text(report)
+    else:
+        print(report)
+
+
+if __name__ == "__main__":
+    fire.Fire(main)
@@ -0,0 +1,82 @@
+"""
+Benchmarks the xRegistry.sys parser against the slicing one it replaced, loaded from git history
+
+Synthetic registries with the console layout (a 64 KiB key region and a 64 KiB value region)
+are generated with a growing amount of users, so parse time, lookup time and the memory held
+by a parsed registry can be followed against the entry count.
+
+Results are written as JSON, one record per implementation and registry size.
+"""
+import sys
+import json
+import tracemalloc
+from pathlib import Path
+
+import fire
+
+if __package__ in (None, ""):
+    # Run as a script, tools/ is on the path instead of the repository root
+    sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from ps3_lib import XRegistry
+
+from tools.common import XREGISTRY_BASELINE, load_revision, make_registry, timed
+
+
+def main(users=(1, 16, 64, 128, 176), repeat=5, baseline=XREGISTRY_BASELINE, output=None):
+    """
+    baseline: git revision of the slicing parser, the last one before the cursor parser by default
+    """
+    implementations = {
+        "current": XRegistry,
+        "baseline": load_revision(baseline, "ps3_lib/xregistry.py", "xregistry_slicing").XRegistry,
+    }
+    results = []
+    for count in users:
+        data = make_registry(count)
+        # Both must agree before their speed means anything
+        parsed = {
+            name: [
+                (entry.key.key, entry.value.processed_value)
+                for entry in registry.from_bytes(data).entries
+            ]
+            for name, registry in implementations.items()
+        }
+        assert parsed["current"] == parsed["baseline"]
+        account_keys = [
+            f"/setting/user/{user:08d}/npaccount/accountid" for user in range(1, count + 1)
+        ]
+        for name, registry in implementations.items():
+            seconds = timed(lambda: registry.from_bytes(data), repeat)
+            tracemalloc.start()
+            parsed_registry = registry.from_bytes(data)
+            # What the parsed registry keeps alive, the data it was parsed from excluded
+            memory = tracemalloc.get_traced_memory()[0]
+            tracemalloc.stop()
+            lookup_seconds = timed(
+                lambda: [parsed_registry.get_entry(key) for key in account_keys], repeat
+            )
+            results.append(
+                {
+                    "implementation": name,
+                    "users": count,
+                    "entries": len(parsed[name]),
+                    "seconds": seconds,
+                    "per_entry_us": seconds / max(len(parsed[name]), 1) * 1e6,
+                    "lookup_us": lookup_seconds / count * 1e6,
+                    "memory_per_entry": memory / max(len(parsed[name]), 1),
+                }
+            )
+
+    report = json.dumps(
+        {"config": {"users": list(users), "repeat": repeat, "baseline": baseline}, "results": results},
+        indent=2,
+    )
+    if output:
+        Path(output).write_text(report)
+    else:
+        print(report)
+
+
+if __name__ == "__main__":
+    fire.Fire(main)
@@ -0,0 +1,137 @@
+"""
+Shared by the benchmarks and the tests: synthetic console files, timing,
+and the implementations the current ones are compared with, loaded from git history
+"""
+import gc
+import time
+import types
+import struct
+import subprocess
+from pathlib import Path
+
+from ps3_lib.sfo import SFO_MAGIC, SFO_VERSION
+from ps3_lib.xregistry import XREG_KEYS_OFFSET, XREG_VALUES_OFFSET, XREG_VALUES_END
+
+REPOSITORY = Path(__file__).resolve().parent.parent
+
+# The last revisions before the parsers were replaced, found by commit message rather than hash
+SFO_BASELINE = "HEAD^{/Parse SFOs lazily over a memoryview}~1"
+XREGISTRY_BASELINE = "HEAD^{/Parse xRegistry with a cursor}~1"
+
+# Format 0x0404 is an integer, 0x0204 a NUL terminated utf-8 string, 0x0004 raw bytes
+TROPHY_PARAMS = (
+    ("ACCOUNTID", 0x0004, 16),
+    ("ATTRIBUTE", 0x0404, 4),
+    ("CATEGORY", 0x0204, 4),
+    ("DETAIL", 0x0204, 1024),
+    ("NPCOMMID", 0x0204, 16),
+    ("PARAMS", 0x0004, 1024),
+    ("PARAMS2", 0x0004, 12),
+    ("PARENTAL_LEVEL", 0x0404, 4),
+    ("SAVEDATA_DIRECTORY", 0x0204, 64),
+    ("SAVEDATA_LIST_PARAM", 0x0204, 8),
+    ("SUB_TITLE", 0x0204, 128),
+    ("TITLE", 0x0204, 128),
+    ("TITLEID000", 0x0204, 16),
+)
+
+# Per user settings, value type 0 is a bool, 1 an integer and 2 a string
+USER_SETTINGS = (
+    ("npaccount/accountid", 2, 16),
+    ("npaccount/loginid", 2, 64),
+    ("npaccount/password", 2, 32),
+    ("npaccount/autologin", 0, 1),
+    ("username", 2, 64),
+    ("theme/color", 1, 4),
+    ("theme/wallpaper", 2, 64),
+    ("system/language", 1, 4),
+)
+
+XREG_MARK = b"\xbc\xad\xad\xbc"
+XREG_KEYS_SIZE = XREG_VALUES_OFFSET - XREG_KEYS_OFFSET
+XREG_VALUES_SIZE = XREG_VALUES_END - XREG_VALUES_OFFSET
+
+
+def make_sfo(index: int = 0) -> bytes:
+    # Laid out like the console writes them: keys sorted, tables and values aligned on 4 bytes
+    keys = b""
+    key_offsets = []
+    for key, _, _ in TROPHY_PARAMS:
+        key_offsets.append(len(keys))
+        keys += key.encode() + b"\x00"
+    keys += b"\x00" * (-len(keys) % 4)
+    key_table_offset = 20 + 16 * len(TROPHY_PARAMS)
+    data_table_offset = key_table_offset + len(keys)
+    index_table = b""
+    data = b""
+    for key_offset, (key, param_format, max_length) in zip(key_offsets, TROPHY_PARAMS):
+        if param_format == 0x0404:
+            value = (index & 0xFFFF).to_bytes(4, "little")
+        elif key == "ACCOUNTID":
+            value = f"{index:016x}".encode()
+        else:
+            value = f"{key.lower()} {index}".encode()[: max_length - 1] + b"\x00"
+        index_table += struct.pack(
+            "<HHIII", key_offset, param_format, len(value), max_length, len(data)
+        )
+        data += value + b"\x00" * (max_length - len(value))
+    header = struct.pack(
+        "<IIIII", SFO_MAGIC, SFO_VERSION, key_table_offset, data_table_offset, len(TROPHY_PARAMS)
+    )
+    return header + index_table + keys + data
+
+
+def make_registry(users: int = 4) -> bytes:
+    # A 64 KiB key region then a 64 KiB value region, ended by a value pointing to an empty key
+    keys = bytearray()
+    values = bytearray()
+    for user in range(1, users + 1):
+        for setting, value_type, length in USER_SETTINGS:
+            key = f"/setting/user/{user:08d}/{setting}".encode()
+            key_offset = len(keys)
+            keys += struct.pack(">2sHB", b"\x00\x00", len(key), 0) + key + b"\x00"
+            if value_type == 0:
+                value = bytes([user & 1])
+            elif value_type == 1:
+                value = user.to_bytes(length, "big")
+            elif setting == "npaccount/accountid":
+                value = f"{user:016x}".encode()
+            else:
+                value = f"{setting} {user}".encode().ljust(length, b"\x00")
+            values += struct.pack(">2sH2sHB", b"\x00\x00", key_offset, b"\x00\x00", len(value), value_type)
+            values += value + b"\x00"
+    end_key_offset = len(keys)
+    keys += struct.pack(">2sHB", b"\x00\x00", 0, 0) + b"\x00"
+    values += struct.pack(">2sH2sHB", b"\x00\x00", end_key_offset, b"\x00\x00", 0, 0) + b"\x00"
+    assert len(keys) <= XREG_KEYS_SIZE, "Too many users for the key region"
+    assert len(values) <= XREG_VALUES_SIZE, "Too many users for the value region"
+    header = XREG_MARK + b"\x00" * 8 + XREG_MARK
+    return header + keys.ljust(XREG_KEYS_SIZE, b"\x00") + values.ljust(XREG_VALUES_SIZE, b"\x00")
+
+
+def load_revision(ref: str, path: str, name: str | None = None) -> types.ModuleType:
+    """
+    Imports a module of the repository as it was at a git revision.
+    Raises CalledProcessError if the revision is not in the history, OSError without git
+    """
+    source = subprocess.run(
+        ["git", "show", f"{ref}:{path}"],
+        cwd=REPOSITORY,
+        capture_output=True,
+        check=True,
+        text=True,
+    ).stdout
+    module = types.ModuleType(name or Path(path).stem)
+    module.__file__ = f"{ref}:{path}"
+    exec(compile(source, module.__file__, "exec"), module.__dict__)
+    return module
+
+
+def timed(operation, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        gc.collect()
+        started = time.perf_counter()
+        operation()
+        best = min(best, time.perf_counter() - started)
+    return best